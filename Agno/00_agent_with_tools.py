@@ -1,8 +1,8 @@
 from agno.agent import Agent
-from agno.tools.visualization import VisualizationTools
-from agno.tools.pandas import PandasTools
-from agno.tools.csv_toolkit import CsvTools
 from agno.models.openrouter import OpenRouter
+from data_tools import CachedCsvTools, CachedPandasTools
+from eda_profile import DatasetProfileTools
+from chart_cache import CachedVisualizationTools
 
 instructions = """
 
@@ -31,9 +31,10 @@ agent = Agent(
     instructions=instructions,
     model=OpenRouter(id="z-ai/glm-4.6v"),
     tools=[
-        PandasTools(),
-        CsvTools(csvs=["./docs/Student_Performance.csv"]),
-        VisualizationTools(output_dir="visualizations"),
+        CachedPandasTools(csvs=["./docs/Student_Performance.csv"]),
+        CachedCsvTools(csvs=["./docs/Student_Performance.csv"]),
+        DatasetProfileTools(csvs=["./docs/Student_Performance.csv"]),
+        CachedVisualizationTools(output_dir="visualizations"),
     ],
     markdown=True,
 )
@@ -6,12 +6,12 @@ This module configures and launches a friendly storyteller agent using the Agno
 
 Key Components:
     - Agent: The main conversational agent, equipped with storytelling abilities and persistent memory.
-    - SqliteDb: Provides persistent storage for agent sessions and conversation history.
+    - CachedSqliteDb: Provides persistent storage for agent sessions and conversation history.
     - Knowledge: Connects the agent to the full text of 'Grandma's Bag of Stories'.
     - AgentOS: Orchestrates the agent and exposes it as an application interface.
 
 Attributes:
-    agent_db (SqliteDb): SQLite database instance for agent storage.
+    agent_db (CachedSqliteDb): SQLite database instance for agent storage.
     instructions (str): Multi-line string detailing the agent's storytelling responsibilities and workflow.
     agent (Agent): Configured agent instance for storytelling.
     agent_os (AgentOS): Operating system abstraction for managing the agent.
@@ -24,30 +24,35 @@ Notes:
     - The agent is intended for storytelling and book-based Q&A.
     - All story-related responses are sourced from the knowledge base (the book).
     - The agent maintains conversational context and session history using SQLite.
+    - Storage, search and ingestion use the helpers next to this file: history_cache.py,
+      search_cache.py, embedding_cache.py, lance_indexes.py and knowledge_sync.py.
 """
 
 # Import core Agno framework components and data science tools
 from agno.agent import Agent
-from agno.db.sqlite import SqliteDb
-from agno.knowledge.embedder.sentence_transformer import SentenceTransformerEmbedder
+from history_cache import CachedSqliteDb
 from agno.knowledge.knowledge import Knowledge
-from agno.vectordb.lancedb import LanceDb
 from agno.vectordb.search import SearchType
 from agno.models.openrouter import OpenRouter
 from agno.os import AgentOS
+from embedding_cache import CachedSentenceTransformerEmbedder
+from search_cache import CachedLanceDb
+from lance_indexes import LanceIndexManager
+from knowledge_sync import KnowledgeSync
 
 
 # Initialize persistent SQLite database for agent session and history storage
-agent_db = SqliteDb(db_file="tmp/agent_storage.db")
+agent_db = CachedSqliteDb(db_file="tmp/agent_storage.db")
 
 
 # Set up the vector database for semantic search over the book
-vector_db = LanceDb(
+vector_db = CachedLanceDb(
     name="story_embeddings",
-    embedder=SentenceTransformerEmbedder(),
+    embedder=CachedSentenceTransformerEmbedder(),
     search_type=SearchType.hybrid,
     uri="tmp/lancedb_story_embeddings",
     table_name="knowledge_embeddings",
+    index_manager=LanceIndexManager(),
 )
 
 
@@ -103,6 +108,7 @@ app_os = agent_os.get_app()
 
 
 if __name__ == "__main__":
-    knowledge.add_content(name="story_embeddings", path="./docs/story_book.pdf")
+    # Embed only the new or changed chunks of the book
+    KnowledgeSync(knowledge).sync("./docs/story_book.pdf", name="story_embeddings")
     # Start the agent service with hot-reloading enabled
     agent_os.serve(app="01_agent_with_knowledge_base:app_os", reload=True)
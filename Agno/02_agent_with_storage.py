@@ -5,15 +5,15 @@ agent_with_storage.py
 This module configures and launches a junior data scientist agent using the Agno framework. The agent is designed to assist users with beginner-friendly data analysis tasks, including loading, cleaning, exploring, visualizing, and modeling datasets, with a focus on CSV data.
 
 Key Components:
-    - Agent: The main conversational agent, equipped with data science tools and persistent memory.
-    - SqliteDb: Provides persistent storage for agent sessions and conversation history.
+    - BudgetedAgent: The main conversational agent, equipped with data science tools and persistent memory.
+    - CachedSqliteDb: Provides persistent storage for agent sessions and conversation history.
     - OpenRouter: Specifies the language model backend for the agent.
     - AgentOS: Orchestrates the agent and exposes it as an application interface.
 
 Attributes:
-    agent_db (SqliteDb): SQLite database instance for agent storage.
+    agent_db (CachedSqliteDb): SQLite database instance for agent storage.
     instructions (str): Multi-line string detailing the agent's responsibilities and workflow.
-    agent (Agent): Configured agent instance with tools for pandas, CSV, and visualization.
+    agent (BudgetedAgent): Configured agent instance with tools for pandas, CSV, and visualization.
     agent_os (AgentOS): Operating system abstraction for managing the agent.
     app_os: Application instance generated from the agent OS.
 
@@ -24,20 +24,22 @@ Notes:
     - The agent is intended for beginner-friendly data science tasks.
     - All data operations should utilize the provided tools (PandasTools, CsvTools, VisualizationTools).
     - The agent maintains conversational context and session history using SQLite.
+    - Storage, tools and history use the helpers next to this file: history_cache.py,
+      data_tools.py, eda_profile.py, chart_cache.py and history_compaction.py.
 """
 
 # Import core Agno framework components and data science tools
-from agno.agent import Agent
-from agno.tools.visualization import VisualizationTools
-from agno.tools.pandas import PandasTools
-from agno.tools.csv_toolkit import CsvTools
-from agno.db.sqlite import SqliteDb
+from history_cache import CachedSqliteDb
 from agno.models.openrouter import OpenRouter
 from agno.os import AgentOS
+from data_tools import CachedCsvTools, CachedPandasTools
+from eda_profile import DatasetProfileTools
+from chart_cache import CachedVisualizationTools
+from history_compaction import BudgetedAgent, HistoryBudget
 
 
 # Initialize persistent SQLite database for agent session and history storage
-agent_db = SqliteDb(db_file="tmp/agent_storage.db")
+agent_db = CachedSqliteDb(db_file="tmp/agent_storage.db")
 
 
 # Agent instructions: define the agent's workflow and responsibilities
@@ -64,20 +66,20 @@ Always use the provided tools (PandasTools, CsvTools, visualization) for your ta
 
 
 # Instantiate the data scientist agent with relevant tools and configuration
-agent = Agent(
+agent = BudgetedAgent(
     name="Junior Data Scientist Agent 2.0",  # Agent's display name
     instructions=instructions,  # Task instructions for the agent
     model=OpenRouter(id="z-ai/glm-4.6v"),  # Language model backend
     db=agent_db,  # Persistent storage for sessions/history
     tools=[
-        PandasTools(),  # Tool for pandas-based data operations
-        CsvTools(csvs=["./docs/Student_Performance.csv"]),  # Tool for CSV file operations
-        VisualizationTools(
-            output_dir="visualizations"
-        ),  # Tool for generating visualizations
+        CachedPandasTools(csvs=["./docs/Student_Performance.csv"]),  # Tool for pandas-based data operations
+        CachedCsvTools(csvs=["./docs/Student_Performance.csv"]),  # Tool for CSV file operations
+        DatasetProfileTools(csvs=["./docs/Student_Performance.csv"]),  # Precomputed dataset profile
+        CachedVisualizationTools(output_dir="visualizations"),  # Tool for generating visualizations
     ],
     add_history_to_context=True,  # Include conversation history in context
     num_history_runs=5,  # Number of previous runs to include
+    history_budget=HistoryBudget(max_tokens=6000),  # Token budget for the included history
     markdown=True,  # Format responses in Markdown
 )
 
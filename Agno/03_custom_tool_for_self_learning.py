@@ -1,22 +1,28 @@
+from contextlib import asynccontextmanager
+
 from agno.agent import Agent
-from agno.db.sqlite import SqliteDb
+from history_cache import CachedSqliteDb
 from agno.tools.hackernews import HackerNewsTools
 from agno.knowledge import Knowledge
 from agno.models.openrouter import OpenRouter
-from agno.vectordb.lancedb import LanceDb
 from agno.vectordb.search import SearchType
-from agno.knowledge.embedder.sentence_transformer import SentenceTransformerEmbedder
 from agno.os import AgentOS
+from embedding_cache import CachedSentenceTransformerEmbedder
+from search_cache import CachedLanceDb
+from lance_indexes import LanceIndexManager
+from learning_queue import LearningQueue
+from learning_dedup import LearningDeduplicator
 
 
-agent_db = SqliteDb(db_file="tmp/agent_storage.db")
+agent_db = CachedSqliteDb(db_file="tmp/agent_storage.db")
 
-vec_db = LanceDb(
+vec_db = CachedLanceDb(
     uri="tmp/lancedb_self_learning",
-    embedder=SentenceTransformerEmbedder(),
+    embedder=CachedSentenceTransformerEmbedder(),
     search_type=SearchType.hybrid,
     name="self_learning_embeddings",
     table_name="self_learning_table",
+    index_manager=LanceIndexManager(),
 )
 
 learning_kb = Knowledge(
@@ -27,11 +33,29 @@ learning_kb = Knowledge(
     contents_db=agent_db,
 )
 
+dedup = LearningDeduplicator(learning_kb)  # Merges near-duplicate learnings
+learnings = LearningQueue(learning_kb, dedup=dedup, start=False)  # Stores learnings in the background, in batches
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Started here rather than at import: with reload=True the module is also imported by the reloader process.
+    learnings.start()
+    dedup.start_compaction(interval_s=6 * 3600)
+    yield
+    dedup.stop_compaction()
+    learnings.close()
+
 
 def self_learning(title: str, learning: str):
     """Custom tool to save new learnings to the knowledge base."""
     content = f"Title: {title}\nLearning: {learning}"
-    learning_kb.add_content(name=title, text_content=content, skip_if_exists=True)
+    duplicate = dedup.lexical_duplicate(content)
+    if duplicate is not None:
+        dedup.resolve(duplicate, title)
+        outcome = "was merged into it" if dedup.action == "merge" else "was not saved"
+        return f"Learning titled '{title}' repeats the saved learning '{duplicate.name}' and {outcome}."
+    learnings.submit(name=title, text=content)
     return f"Learning titled '{title}' has been saved to the knowledge base."
 
 
@@ -98,6 +122,7 @@ agent_os = AgentOS(
     id="self_learning_os",  # Unique identifier for the OS
     description="A news reporter agent that learns and improves over time by saving and reusing insights.",
     agents=[agent],  # List of agents managed by this OS
+    lifespan=lifespan,  # Starts the learning queue and compaction in the serving process
 )
 
 app_os = agent_os.get_app()
@@ -7,31 +7,38 @@ persists user-level information: preferences, facts, context.
 
 Key concepts:
 - MemoryManager: Extracts and stores user memories from conversations
+- IndexedMemoryManager: puts only the memories relevant to the current message in the
+  prompt instead of all of them (memory_index.py)
 - enable_agentic_memory: Agent decides when to store/recall via tool calls (efficient)
 - enable_user_memories: Memory manager runs after every response (guaranteed capture)
+- MemoryWorker: runs the memory manager in the background instead, once per user after
+  they pause, for all their turns since (memory_worker.py)
 - user_id: Links memories to a specific user
+- CachedSqliteDb: pooled SQLite storage with a session cache (history_cache.py)
 
 
 """
 
-from agno.agent import Agent
-from agno.tools.visualization import VisualizationTools
-from agno.tools.pandas import PandasTools
-from agno.tools.csv_toolkit import CsvTools
 from agno.models.openrouter import OpenRouter
-from agno.db.sqlite import SqliteDb
-from agno.memory.manager import MemoryManager
+from history_cache import CachedSqliteDb
 from agno.os import AgentOS
 from rich.pretty import pprint
-
-agent_db = SqliteDb(db_file="tmp/agent_storage.db")
-memory_manager = MemoryManager(
+from data_tools import CachedCsvTools, CachedPandasTools
+from eda_profile import DatasetProfileTools
+from chart_cache import CachedVisualizationTools
+from history_compaction import BudgetedAgent, HistoryBudget
+from memory_worker import MemoryWorker
+from memory_index import IndexedMemoryManager, memory_query_hook
+
+agent_db = CachedSqliteDb(db_file="tmp/agent_storage.db")
+memory_manager = IndexedMemoryManager(
     model=OpenRouter(id="z-ai/glm-4.6v"),
     db=agent_db,
     additional_instructions="""
     Capture the user's behaviours, interests, their preferences, and their goals.
     """,
 )
+memory_worker = MemoryWorker(memory_manager)
 
 instructions = """
 
@@ -57,20 +64,24 @@ Always use the provided tools (PandasTools, CsvTools, visualization) for your ta
 
 user_id = "abc@example.com"
 
-agent = Agent(
+agent = BudgetedAgent(
     name="Junior Data Scientist Agent",
     instructions=instructions,
     model=OpenRouter(id="z-ai/glm-4.6v"),
     db=agent_db,
     memory_manager=memory_manager,
-    enable_user_memories=True,
+    enable_user_memories=False,
+    pre_hooks=[memory_query_hook],
+    post_hooks=[memory_worker.post_hook],
     tools=[
-        PandasTools(enable_create_pandas_dataframe=False),
-        CsvTools(csvs=["./docs/Student_Performance.csv"]),
-        VisualizationTools(output_dir="visualizations"),
+        CachedPandasTools(csvs=["./docs/Student_Performance.csv"], enable_create_pandas_dataframe=False),
+        CachedCsvTools(csvs=["./docs/Student_Performance.csv"]),
+        DatasetProfileTools(csvs=["./docs/Student_Performance.csv"]),
+        CachedVisualizationTools(output_dir="visualizations"),
     ],
     add_history_to_context=True,
     num_history_runs=5,
+    history_budget=HistoryBudget(max_tokens=6000),
     markdown=True,
 )
 
@@ -82,6 +93,7 @@ if __name__ == "__main__":
         stream=True,
     )
 
+    memory_worker.flush()
     # The agent now knows your preferences
     agent.print_response(
         "Can you show me a summary of the Student_Performance.csv dataset?",
@@ -89,6 +101,7 @@ if __name__ == "__main__":
         stream=True,
     )
 
+    memory_worker.flush()
     memories = agent.get_user_memories(user_id=user_id)
     print("\n" + "=" * 60)
     print("Stored Memories:")
@@ -15,6 +15,7 @@ Key concepts:
 - Team: A group of agents coordinated by a leader
 - Members: Specialized agents with distinct roles
 - The leader delegates, synthesizes, and produces final output
+- CachedSqliteDb: pooled SQLite storage with a session cache (history_cache.py)
 
 Example prompts to try:
 - "Should I invest in NVIDIA?"
@@ -23,7 +24,7 @@ Example prompts to try:
 """
 
 from agno.agent import Agent
-from agno.db.sqlite import SqliteDb
+from history_cache import CachedSqliteDb
 from agno.models.openrouter import OpenRouter
 from agno.team.team import Team
 from agno.tools.yfinance import YFinanceTools
@@ -31,7 +32,7 @@ from agno.tools.yfinance import YFinanceTools
 # ============================================================================
 # Storage Configuration
 # ============================================================================
-team_db = SqliteDb(db_file="tmp/agents.db")
+team_db = CachedSqliteDb(db_file="tmp/agents.db")
 
 # ============================================================================
 # Bull Agent — Makes the Case FOR
@@ -0,0 +1,168 @@
+"""
+bench_agents.py
+---------------
+
+Offline benchmark for the example agents. Every model an example uses
+(agent, team members, memory manager) is swapped for `FakeModel`, so no
+network access is needed and the numbers reflect the Agno orchestration
+around the model: prompt assembly, history and memory handling, tool
+execution, storage writes and knowledge search.
+
+For each example it reports:
+    - import_s:    time to import the module (embedders, DB setup, AgentOS app)
+    - turn_ms:     median wall time per run
+    - overhead_ms: median wall time per run minus the synthetic model time
+    - runs_per_s:  throughput with `--concurrency` sessions running via arun()
+    - peak_mib:    peak traced Python allocations during the runs
+
+Usage:
+    python bench_agents.py                          # all examples
+    python bench_agents.py 00_agent_with_tools 05_multi_agent_team --turns 20
+    python bench_agents.py --latency 0.5 --tokens-per-s 60 --json
+
+Run it from the Agno directory (the examples use paths relative to it).
+Sessions created by the benchmark are deleted afterwards.
+"""
+
+import argparse
+import asyncio
+import importlib
+import json
+import os
+import statistics
+import time
+import tracemalloc
+from uuid import uuid4
+
+from fake_model import FakeModel, use_fake_model
+
+# Telemetry posts to the network after every run; keep it out of the numbers.
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+CSV_TOOL_CALL = {"tool_calls": [{"name": "get_columns", "args": {"csv_name": "Student_Performance"}}]}
+SEARCH_CALL = {"tool_calls": [{"name": "search_knowledge_base", "args": {"query": "grandma's bag of stories"}}]}
+
+# module -> (attribute holding the agent/team, prompt, model script for one run)
+EXAMPLES = {
+    "00_agent_with_tools": (
+        "agent",
+        "Give me summary statistics for the subject wise performance of the students.",
+        [CSV_TOOL_CALL, "Here is a summary of the columns in the dataset."],
+    ),
+    "01_agent_with_knowledge_base": (
+        "agent",
+        "Narrate the first story in the book.",
+        [SEARCH_CALL, "Once upon a time, grandma opened her bag of stories."],
+    ),
+    "02_agent_with_storage": (
+        "agent",
+        "Which school type has maximum study hours?",
+        [CSV_TOOL_CALL, "Public schools report the most study hours."],
+    ),
+    "03_custom_tool_for_self_learning": (
+        "agent",
+        "What are the top stories on Hacker News about databases?",
+        [SEARCH_CALL, "Nothing saved on that yet; here is what I know."],
+    ),
+    "04_agent_with_memory": (
+        "agent",
+        "I prefer visualizations over tables. Summarize the dataset.",
+        [CSV_TOOL_CALL, "Here is a visual-first summary of the dataset."],
+    ),
+    "05_multi_agent_team": (
+        "multi_agent_team",
+        "Should I invest in NVIDIA (NVDA)?",
+        ["Recommendation: Hold, with moderate confidence."],
+    ),
+}
+
+
+def _cleanup(target, session_ids):
+    db = getattr(target, "db", None)
+    if db is None:
+        return
+    for session_id in session_ids:
+        try:
+            db.delete_session(session_id)
+        except Exception:
+            pass
+
+
+def bench_example(module_name: str, turns: int, concurrency: int,
+                  latency_s: float, tokens_per_s: float | None) -> dict:
+    attribute, prompt, script = EXAMPLES[module_name]
+
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    import_s = time.perf_counter() - start
+
+    target = getattr(module, attribute)
+    fakes = use_fake_model(
+        target,
+        lambda: FakeModel(script=list(script), latency_s=latency_s, tokens_per_s=tokens_per_s),
+        helper_factory=lambda: FakeModel(script=["No new memories."], latency_s=latency_s,
+                                         tokens_per_s=tokens_per_s),
+    )
+    user_id = "bench@example.com"
+    session_id = f"bench-{uuid4().hex[:8]}"
+    session_ids = [session_id]
+
+    tracemalloc.start()
+    turn_ms, overhead_ms = [], []
+    for _ in range(turns):
+        model_before = sum(f.model_time_s for f in fakes)
+        t0 = time.perf_counter()
+        target.run(prompt, session_id=session_id, user_id=user_id)
+        wall = time.perf_counter() - t0
+        model = sum(f.model_time_s for f in fakes) - model_before
+        turn_ms.append(wall * 1000)
+        overhead_ms.append((wall - model) * 1000)
+
+    async def run_concurrently():
+        sessions = [f"bench-{uuid4().hex[:8]}" for _ in range(concurrency)]
+        session_ids.extend(sessions)
+
+        async def one_session(sid):
+            for _ in range(turns):
+                await target.arun(prompt, session_id=sid, user_id=user_id)
+
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one_session(sid) for sid in sessions))
+        return concurrency * turns / (time.perf_counter() - t0)
+
+    runs_per_s = asyncio.run(run_concurrently())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    _cleanup(target, session_ids)
+    return {
+        "example": module_name,
+        "import_s": round(import_s, 3),
+        "turn_ms": round(statistics.median(turn_ms), 2),
+        "overhead_ms": round(statistics.median(overhead_ms), 2),
+        "runs_per_s": round(runs_per_s, 2),
+        "peak_mib": round(peak / 2**20, 1),
+        "model_calls": sum(f.calls for f in fakes),
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline benchmark for the Agno examples")
+    parser.add_argument("examples", nargs="*", default=list(EXAMPLES))
+    parser.add_argument("--turns", type=int, default=10, help="runs per session")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent sessions for runs_per_s")
+    parser.add_argument("--latency", type=float, default=0.0, help="synthetic seconds before the first token")
+    parser.add_argument("--tokens-per-s", type=float, default=None, help="synthetic output token rate")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per example")
+    args = parser.parse_args()
+
+    if not args.json:
+        print(f"{'example':<34} {'import_s':>8} {'turn_ms':>9} {'overhead_ms':>11} "
+              f"{'runs/s':>8} {'peak_mib':>8}")
+    for name in args.examples:
+        result = bench_example(name, args.turns, args.concurrency, args.latency, args.tokens_per_s)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(f"{name:<34} {result['import_s']:>8.2f} {result['turn_ms']:>9.2f} "
+                  f"{result['overhead_ms']:>11.2f} {result['runs_per_s']:>8.1f} {result['peak_mib']:>8.1f}")
@@ -0,0 +1,135 @@
+"""
+bench_charts.py
+---------------
+
+Chart rendering latency under concurrent tool calls, stock VisualizationTools
+vs. CachedVisualizationTools (chart_cache.py).
+
+`--requests` chart calls are issued concurrently from one event loop, as
+parallel tool calls in async agent runs are. Only `--distinct` of them are
+different charts, so a share of the calls repeat a chart.
+
+    - stock:        stock tools called on the loop (blocks it for every render)
+    - cached_cold:  async tools on an empty cache (renders in the process pool)
+    - cached_warm:  the same calls again, served from the cache
+
+For each: wall_s for all calls, p50_ms/p95_ms per call, and loop_lag_ms, the
+worst delay seen by a 10 ms ticker on the same loop (how long other sessions
+would have been stalled).
+
+Usage:
+    python bench_charts.py --requests 32 --distinct 8 --workers 4
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import statistics
+import tempfile
+import time
+
+from agno.tools.visualization import VisualizationTools
+
+from chart_cache import CachedVisualizationTools, get_render_pool
+
+CHART_TYPES = ["create_bar_chart", "create_line_chart", "create_pie_chart", "create_histogram"]
+
+
+def _requests(requests: int, distinct: int, points: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    charts = []
+    for i in range(distinct):
+        method = CHART_TYPES[i % len(CHART_TYPES)]
+        if method == "create_histogram":
+            args = {"data": [rng.gauss(60, 15) for _ in range(points * 20)], "title": f"Chart {i}"}
+        else:
+            args = {"data": {f"k{j}": rng.randint(1, 100) for j in range(points)}, "title": f"Chart {i}"}
+        charts.append((method, args))
+    return [charts[i % distinct] for i in range(requests)]
+
+
+async def _ticker(stop: asyncio.Event, lags: list, interval: float = 0.01) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(interval)
+        lags.append(time.perf_counter() - start - interval)
+
+
+async def _run(calls: list) -> dict:
+    stop, lags = asyncio.Event(), []
+    ticker = asyncio.create_task(_ticker(stop, lags))
+    await asyncio.sleep(0)
+    latencies = []
+
+    async def timed(call):
+        start = time.perf_counter()
+        await call()
+        latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(call) for call in calls))
+    wall = time.perf_counter() - start
+    stop.set()
+    await ticker
+    latencies.sort()
+    return {
+        "wall_s": wall,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))] * 1000,
+        "loop_lag_ms": max(lags, default=0.0) * 1000,
+    }
+
+
+def bench(requests: int, distinct: int, points: int, workers: int) -> dict:
+    specs = _requests(requests, distinct, points)
+    result = {}
+    with tempfile.TemporaryDirectory() as output_dir:
+        stock = VisualizationTools(output_dir=output_dir)
+
+        def stock_call(method, args):
+            async def call():
+                getattr(stock, method)(**args)
+
+            return call
+
+        result["stock"] = asyncio.run(_run([stock_call(m, a) for m, a in specs]))
+
+    # Start the workers up front so pool start-up is not counted as rendering.
+    pool = get_render_pool(workers)
+    list(pool.map(abs, range(workers)))
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        cached = CachedVisualizationTools(output_dir=output_dir, max_workers=workers)
+
+        def cached_call(method, args):
+            return lambda: getattr(cached, f"a{method}")(**args)
+
+        result["cached_cold"] = asyncio.run(_run([cached_call(m, a) for m, a in specs]))
+        result["cached_warm"] = asyncio.run(_run([cached_call(m, a) for m, a in specs]))
+        result["stats"] = dict(cached.stats)
+
+    return {
+        name: {k: round(v, 2) for k, v in values.items()} if name != "stats" else values
+        for name, values in result.items()
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chart rendering benchmark")
+    parser.add_argument("--requests", type=int, default=32, help="concurrent chart calls")
+    parser.add_argument("--distinct", type=int, default=8, help="different charts among them")
+    parser.add_argument("--points", type=int, default=12, help="categories per chart")
+    parser.add_argument("--workers", type=int, default=4, help="render processes")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    result = bench(args.requests, args.distinct, args.points, args.workers)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print(f"{'':<12} {'wall_s':>8} {'p50_ms':>10} {'p95_ms':>10} {'loop_lag_ms':>12}")
+        for name in ("stock", "cached_cold", "cached_warm"):
+            r = result[name]
+            print(f"{name:<12} {r['wall_s']:>8.2f} {r['p50_ms']:>10.1f} {r['p95_ms']:>10.1f} {r['loop_lag_ms']:>12.1f}")
+        print(f"renders={result['stats']['renders']} joined={result['stats']['joined']} hits={result['stats']['hits']}")
@@ -0,0 +1,98 @@
+"""
+bench_dataset.py
+----------------
+
+Compares loading the dataset the way the stock toolkits do (parse the CSV on
+every call) with the memory-mapped cache in dataset_cache.py:
+
+    - csv_parse_ms:   pandas.read_csv, i.e. what PandasTools/CsvTools pay per call
+    - cache_build_ms: first use ever (parse once + write the Arrow file)
+    - cache_map_ms:   first use in a new process (map the existing file)
+    - cache_hit_ms:   later calls in the same process
+    - worker_anon_mib / worker_file_mib: private vs. shared (file-backed)
+      resident memory of each of `--workers` processes holding the DataFrame
+
+Usage:
+    python bench_dataset.py ./docs/Student_Performance.csv --workers 4
+"""
+
+import argparse
+import json
+import multiprocessing as mp
+import statistics
+import tempfile
+import time
+
+import pandas as pd
+
+from dataset_cache import DatasetCache
+
+
+def _timed(fn, repeat: int = 1) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times) * 1000
+
+
+def _memory_mib() -> dict:
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            key, _, value = line.partition(":")
+            if key in ("RssAnon", "RssFile"):
+                fields[key] = int(value.split()[0]) / 1024
+    return fields
+
+
+def _worker(csv_path: str, cache_dir: str, results) -> None:
+    cache = DatasetCache(cache_dir)
+    start = time.perf_counter()
+    df = cache.dataframe(csv_path)
+    map_ms = (time.perf_counter() - start) * 1000
+    df.describe()  # touch every numeric column
+    results.put({"map_ms": map_ms, **_memory_mib()})
+
+
+def bench(csv_path: str, workers: int, repeat: int) -> dict:
+    result = {"csv_parse_ms": _timed(lambda: pd.read_csv(csv_path), repeat)}
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        result["cache_build_ms"] = _timed(lambda: DatasetCache(cache_dir).dataframe(csv_path))
+        result["cache_map_ms"] = _timed(lambda: DatasetCache(cache_dir).dataframe(csv_path), repeat)
+        cache = DatasetCache(cache_dir)
+        cache.dataframe(csv_path)
+        result["cache_hit_ms"] = _timed(lambda: cache.dataframe(csv_path), repeat)
+
+        if workers:
+            ctx = mp.get_context("spawn")
+            results = ctx.Queue()
+            procs = [ctx.Process(target=_worker, args=(csv_path, cache_dir, results)) for _ in range(workers)]
+            for proc in procs:
+                proc.start()
+            samples = [results.get() for _ in procs]
+            for proc in procs:
+                proc.join()
+            result["worker_map_ms"] = statistics.median(s["map_ms"] for s in samples)
+            result["worker_anon_mib"] = statistics.median(s.get("RssAnon", 0) for s in samples)
+            result["worker_file_mib"] = statistics.median(s.get("RssFile", 0) for s in samples)
+
+    return {key: round(value, 2) for key, value in result.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Dataset cache benchmark")
+    parser.add_argument("csv", nargs="?", default="./docs/Student_Performance.csv")
+    parser.add_argument("--workers", type=int, default=4, help="processes sharing the cached file")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    result = bench(args.csv, args.workers, args.repeat)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for key, value in result.items():
+            print(f"{key:<18} {value:>10.2f}")
@@ -0,0 +1,121 @@
+"""
+bench_history.py
+----------------
+
+Cost of loading a session for `add_history_to_context`, per run:
+
+    - pooled: PooledSqliteDb (sqlite_storage.py), reads SQLite every time
+    - cached: CachedSqliteDb (history_cache.py), write-through session cache
+
+`--sessions` sessions with `--runs` earlier runs each (`--run-bytes` of
+content and a user/assistant message pair per run) are written first. Then
+`--turns` rounds of chat go over all sessions: read the session, take the
+last `--history` runs' messages as the agent does, append a run, save. The
+report has p50/p95 of the read plus history assembly, the total per turn,
+and the cache hit rate.
+
+Usage:
+    python bench_history.py --sessions 20 --runs 50
+    python bench_history.py --sessions 500 --max-sessions 100 --json
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import time
+from typing import Dict, List
+
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+from agno.db.base import SessionType
+from agno.models.message import Message
+from agno.run.agent import RunOutput
+from agno.session import AgentSession
+
+from history_cache import CachedSqliteDb
+from sqlite_storage import PooledSqliteDb
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)] if values else 0.0
+
+
+def _run(session_id: str, index: int, run_bytes: int) -> RunOutput:
+    return RunOutput(
+        run_id=f"{session_id}-{index}",
+        agent_id="bench",
+        session_id=session_id,
+        content="x" * run_bytes,
+        messages=[
+            Message(role="user", content=f"question {index}"),
+            Message(role="assistant", content="x" * run_bytes),
+        ],
+    )
+
+
+def bench_variant(variant: str, args) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "agent_storage.db")
+        if variant == "cached":
+            db = CachedSqliteDb(db_file=db_file, max_sessions=args.max_sessions)
+        else:
+            db = PooledSqliteDb(db_file=db_file)
+        db.upsert_sessions(
+            [
+                AgentSession(
+                    session_id=f"session-{s}",
+                    agent_id="bench",
+                    created_at=int(time.time()),
+                    runs=[_run(f"session-{s}", r, args.run_bytes) for r in range(args.runs)],
+                )
+                for s in range(args.sessions)
+            ],
+            deserialize=False,
+        )
+        if isinstance(db, CachedSqliteDb):
+            db.clear_cache()  # start cold, as after a restart
+
+        reads: List[float] = []
+        turns: List[float] = []
+        for turn in range(args.turns):
+            for s in range(args.sessions):
+                session_id = f"session-{s}"
+                start = time.perf_counter()
+                session = db.get_session(session_id, SessionType.AGENT)
+                session.get_messages(last_n_runs=args.history)
+                read = time.perf_counter()
+                session.upsert_run(_run(session_id, args.runs + turn, args.run_bytes))
+                db.upsert_session(session)
+                end = time.perf_counter()
+                reads.append((read - start) * 1000)
+                turns.append((end - start) * 1000)
+        result = {
+            "read_p50_ms": round(_percentile(reads, 0.50), 3),
+            "read_p95_ms": round(_percentile(reads, 0.95), 3),
+            "turn_p50_ms": round(_percentile(turns, 0.50), 3),
+        }
+        if isinstance(db, CachedSqliteDb):
+            result["hit_rate"] = db.cache_info()["hit_rate"]
+        db.close()
+        return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Session/history load cost with and without the session cache")
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=50, help="earlier runs per session")
+    parser.add_argument("--run-bytes", type=int, default=1500)
+    parser.add_argument("--history", type=int, default=5, help="num_history_runs")
+    parser.add_argument("--turns", type=int, default=5, help="new runs per session")
+    parser.add_argument("--max-sessions", type=int, default=256, help="CachedSqliteDb max_sessions")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    result = {variant: bench_variant(variant, args) for variant in ("pooled", "cached")}
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for name, values in result.items():
+            print(f"{name:<8} " + "  ".join(f"{key}={value}" for key, value in values.items()))
@@ -0,0 +1,133 @@
+"""
+bench_indexes.py
+----------------
+
+Recall vs. latency of LanceDb vector search, by table size and index:
+
+    - flat:        no index, every row compared (what LanceDb does today)
+    - IVF_HNSW_SQ: LanceIndexManager's default
+    - IVF_PQ:      with and without re-ranking the candidates on the full
+                   vectors (refine_factor; LanceDb's search does not set it)
+
+Each index is queried with several `nprobes` (how many IVF partitions are
+searched). Recall@k is measured against the exact top-k computed with numpy,
+latency is per query (p50/p95, the table already open). Vectors are drawn
+around a few hundred centres, like embeddings of related texts, with the same
+dimensions as all-MiniLM-L6-v2 (384). The build time of each index is
+reported too; it is paid once per `rebuild_growth` growth of the table.
+
+Usage:
+    python bench_indexes.py --sizes 1000,10000,50000
+    python bench_indexes.py --sizes 100000 --dimensions 384 --queries 100 --json
+"""
+
+import argparse
+import json
+import os
+import statistics
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+import lancedb
+import numpy as np
+
+from lance_indexes import num_sub_vectors
+
+INDEXES = ("IVF_HNSW_SQ", "IVF_PQ")
+NPROBES = (5, 20, 50)
+
+
+def make_vectors(rows: int, dimensions: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((max(rows // 100, 8), dimensions)).astype(np.float32)
+    vectors = centres[rng.integers(len(centres), size=rows)] + 0.6 * rng.standard_normal((rows, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int) -> List[set]:
+    scores = queries @ vectors.T
+    return [set(np.argpartition(-row, k)[:k].tolist()) for row in scores]
+
+
+def _measure(table, queries: np.ndarray, truth: List[set], k: int, nprobes: Optional[int] = None,
+             refine_factor: Optional[int] = None, flat: bool = False) -> Dict[str, float]:
+    latencies, recalls = [], []
+    for query, expected in zip(queries, truth):
+        builder = table.search(query.tolist()).metric("cosine").limit(k)
+        if flat:
+            builder = builder.bypass_vector_index()
+        if nprobes:
+            builder = builder.nprobes(nprobes)
+        if refine_factor:
+            builder = builder.refine_factor(refine_factor)
+        start = time.perf_counter()
+        found = builder.to_list()
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len({row["id"] for row in found} & expected) / k)
+    latencies.sort()
+    return {
+        "recall": round(statistics.mean(recalls), 3),
+        "p50_ms": round(latencies[len(latencies) // 2], 2),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95)], 2),
+    }
+
+
+def bench_size(rows: int, dimensions: int, queries: int, k: int) -> List[Dict]:
+    vectors = make_vectors(rows, dimensions)
+    # Queries near stored vectors, as questions about stored learnings would be.
+    rng = np.random.default_rng(1)
+    picks = vectors[rng.integers(rows, size=queries)]
+    query_vectors = picks + 0.3 * rng.standard_normal(picks.shape).astype(np.float32) / np.sqrt(dimensions)
+    truth = exact_top_k(vectors, query_vectors, k)
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        table = lancedb.connect(tmp).create_table(
+            "bench", data=[{"id": i, "vector": vector.tolist()} for i, vector in enumerate(vectors)]
+        )
+        results.append({"rows": rows, "index": "flat", "build_s": 0.0,
+                        **_measure(table, query_vectors, truth, k, flat=True)})
+        for index_type in INDEXES:
+            if rows < 256:  # too few rows to train an index on
+                continue
+            options = {"num_sub_vectors": num_sub_vectors(dimensions)} if index_type == "IVF_PQ" else {}
+            start = time.perf_counter()
+            table.create_index(
+                metric="cosine",
+                vector_column_name="vector",
+                index_type=index_type,
+                num_partitions=max(1, round(np.sqrt(rows))) if index_type == "IVF_PQ" else None,
+                replace=True,
+                **options,
+            )
+            build_s = round(time.perf_counter() - start, 2)
+            for nprobes in NPROBES:
+                for refine_factor in ((None, 10) if index_type == "IVF_PQ" else (None,)):
+                    name = index_type + (f"+refine{refine_factor}" if refine_factor else "")
+                    results.append({"rows": rows, "index": name, "nprobes": nprobes, "build_s": build_s,
+                                    **_measure(table, query_vectors, truth, k, nprobes, refine_factor)})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="LanceDb vector index recall/latency benchmark")
+    parser.add_argument("--sizes", default="1000,10000,50000", help="comma-separated table sizes")
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("-k", type=int, default=10, help="results per query (recall@k)")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = []
+    for size in (int(s) for s in args.sizes.split(",")):
+        results.extend(bench_size(size, args.dimensions, args.queries, args.k))
+    if args.json:
+        print(json.dumps(results))
+    else:
+        print(f"{'rows':>8} {'index':<20} {'nprobes':>7} {'build_s':>8} {'recall':>7} {'p50_ms':>8} {'p95_ms':>8}")
+        for r in results:
+            print(f"{r['rows']:>8} {r['index']:<20} {r.get('nprobes', '-'):>7} {r['build_s']:>8} "
+                  f"{r['recall']:>7} {r['p50_ms']:>8} {r['p95_ms']:>8}")
@@ -0,0 +1,144 @@
+"""
+bench_ingest.py
+---------------
+
+Ingestion throughput and peak memory of a large PDF, stock vs. streaming:
+
+    - stock:     knowledge.add_content(path=...) (read all pages, chunk,
+                 embed one chunk at a time, insert)
+    - streaming: KnowledgeSync with IngestPipeline (knowledge_sync.py,
+                 ingest_pipeline.py)
+
+Each variant runs in a fresh process against an empty LanceDb table and
+reports pages/s, chunks/s and peak RSS. A synthetic PDF with `--pages` pages
+is generated unless a path is given. The default hash embedder keeps the
+numbers about parsing, chunking and writing; pass
+`--embedder sentence-transformer` to include real embedding.
+
+Usage:
+    python bench_ingest.py --pages 1000 --workers 4
+    python bench_ingest.py ./docs/story_book.pdf --embedder sentence-transformer
+"""
+
+import argparse
+import hashlib
+import json
+import multiprocessing as mp
+import os
+import resource
+import tempfile
+import time
+from typing import List, Optional
+
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+from agno.knowledge.embedder.base import Embedder
+
+
+class HashEmbedder(Embedder):
+    """Deterministic, model-free embeddings."""
+
+    dimensions: int = 64
+
+    def get_embedding(self, text) -> List[float]:
+        if isinstance(text, list):
+            return [self.get_embedding(t) for t in text]
+        digest = hashlib.shake_256(text.encode()).digest(self.dimensions)
+        return [b / 255 for b in digest]
+
+    def get_embedding_and_usage(self, text: str):
+        return self.get_embedding(text), None
+
+
+def make_pdf(path: str, pages: int, paragraphs: int = 6) -> None:
+    import matplotlib
+
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+
+    with PdfPages(path) as pdf:
+        for page in range(pages):
+            fig = plt.figure(figsize=(8.5, 11))
+            text = "\n\n".join(
+                f"Section {page}.{p}: the quick brown fox {page * p} jumps over the lazy dog near river {p}."
+                for p in range(paragraphs)
+            )
+            fig.text(0.05, 0.5, text, fontsize=8, va="center")
+            pdf.savefig(fig)
+            plt.close(fig)
+
+
+def _embedder(name: str) -> Embedder:
+    if name == "sentence-transformer":
+        from agno.knowledge.embedder.sentence_transformer import SentenceTransformerEmbedder
+
+        return SentenceTransformerEmbedder()
+    return HashEmbedder()
+
+
+def _run(variant: str, pdf_path: str, embedder: str, workers: int, results) -> None:
+    from agno.db.sqlite import SqliteDb
+    from agno.knowledge.knowledge import Knowledge
+    from agno.vectordb.lancedb import LanceDb
+
+    from ingest_pipeline import IngestPipeline
+    from knowledge_sync import KnowledgeSync
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        vector_db = LanceDb(uri=f"{work_dir}/lancedb", table_name="bench", embedder=_embedder(embedder))
+        knowledge = Knowledge(vector_db=vector_db, contents_db=SqliteDb(db_file=f"{work_dir}/contents.db"))
+        base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        start = time.perf_counter()
+        if variant == "stock":
+            knowledge.add_content(name="bench", path=pdf_path)
+        else:
+            KnowledgeSync(knowledge, IngestPipeline(workers=workers)).sync(pdf_path, name="bench")
+        seconds = time.perf_counter() - start
+        from pypdf import PdfReader
+
+        pages = len(PdfReader(pdf_path).pages)
+        chunks = vector_db.get_count()
+        results.put({
+            "seconds": seconds,
+            "pages_per_s": pages / seconds,
+            "chunks_per_s": chunks / seconds,
+            "chunks": chunks,
+            "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "rss_growth_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024 - base_rss,
+        })
+
+
+def bench(pdf_path: Optional[str], pages: int, embedder: str, workers: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        if pdf_path is None:
+            pdf_path = os.path.join(tmp, "bench.pdf")
+            make_pdf(pdf_path, pages)
+        ctx = mp.get_context("spawn")
+        result = {}
+        for variant in ("stock", "streaming"):
+            results = ctx.Queue()
+            proc = ctx.Process(target=_run, args=(variant, pdf_path, embedder, workers, results))
+            proc.start()
+            result[variant] = {k: round(v, 2) for k, v in results.get().items()}
+            proc.join()
+        return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="PDF ingestion benchmark")
+    parser.add_argument("pdf", nargs="?", help="PDF to ingest (default: a generated one)")
+    parser.add_argument("--pages", type=int, default=300, help="pages of the generated PDF")
+    parser.add_argument("--embedder", default="hash", help="hash or sentence-transformer")
+    parser.add_argument("--workers", type=int, default=4, help="parse processes")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    result = bench(args.pdf, args.pages, args.embedder, args.workers)
+    if args.json:
+        print(json.dumps(result))
+    else:
+        keys = list(result["stock"])
+        print(f"{'':<10} " + " ".join(f"{k:>15}" for k in keys))
+        for name, values in result.items():
+            print(f"{name:<10} " + " ".join(f"{values[k]:>15}" for k in keys))
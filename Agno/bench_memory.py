@@ -0,0 +1,156 @@
+"""
+bench_memory.py
+---------------
+
+Memories in the system prompt, all of them vs. the top-k from MemoryIndex
+(memory_index.py), as one user's memory count grows:
+
+    - all:     MemoryManager.get_user_memories, what the agent injects today
+    - indexed: IndexedMemoryManager during a run (top_k, hybrid ranking)
+
+For each size, memories are generated from templates about preferences,
+goals and facts; a few are planted with words that the queries use. The
+report has the lookup latency (p50/p95, per run), the size of the memories
+block in the system message (tokens, ~4 characters each), the time the
+first lookup takes to build the index (`cold_ms`), and hit@k: how often the
+planted memory for a query is among the memories sent.
+
+Embeddings come from a hash embedder by default, so the vector half of the
+score is noise and the ranking rests on its word overlap; pass `--model` to
+use CachedSentenceTransformerEmbedder (sentence-transformers installed).
+
+Usage:
+    python bench_memory.py --sizes 100,1000,10000
+    python bench_memory.py --sizes 10000 --top-k 20 --model --json
+"""
+
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import uuid
+from typing import Dict, List
+
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+from agno.db.base import UserMemory
+from agno.memory.manager import MemoryManager
+from agno.run.agent import RunInput
+
+from bench_ingest import HashEmbedder
+from memory_index import IndexedMemoryManager, memory_query_hook
+from sqlite_storage import PooledSqliteDb
+
+USER = "bench@example.com"
+SUBJECTS = ["charts", "tables", "python", "pandas", "statistics", "regression", "sql", "dashboards", "notebooks"]
+TEMPLATES = [
+    "The user prefers {a} over {b} when reviewing results",
+    "The user is learning {a} and wants beginner-friendly explanations of {b}",
+    "The user works on a project that combines {a} with {b}",
+    "The user dislikes long answers about {a}",
+    "The user's goal this quarter is to get better at {a} and {b}",
+]
+PLANTED = {
+    "Which colour palette should the violin plots use?": "The user wants violin plots drawn with a colourblind-safe palette",
+    "Remind me which currency my budget reports use": "The user's budget reports are always in Swiss francs",
+    "What timezone should the weekly summary assume?": "The user lives in Singapore and reads the weekly summary on Mondays in that timezone",
+}
+
+
+def _percentile(values: List[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)] if values else 0.0
+
+
+def _prompt_tokens(memories: List[UserMemory]) -> int:
+    return sum(len(f"\n- {m.memory}") for m in memories) // 4
+
+
+def make_memories(count: int, seed: int = 0) -> List[UserMemory]:
+    rng = random.Random(seed)
+    now = int(time.time())
+    memories = [
+        UserMemory(
+            memory_id=str(uuid.UUID(int=rng.getrandbits(128))),
+            memory=rng.choice(TEMPLATES).format(a=rng.choice(SUBJECTS), b=rng.choice(SUBJECTS)) + f" (note {i})",
+            user_id=USER,
+            created_at=now,
+        )
+        for i in range(max(count - len(PLANTED), 0))
+    ]
+    for text in PLANTED.values():
+        memories.insert(rng.randrange(len(memories) + 1), UserMemory(
+            memory_id=str(uuid.uuid4()), memory=text, user_id=USER, created_at=now
+        ))
+    return memories
+
+
+def bench_size(count: int, top_k: int, repeats: int, use_model: bool) -> Dict[str, Dict[str, float]]:
+    with tempfile.TemporaryDirectory() as tmp:
+        db = PooledSqliteDb(db_file=os.path.join(tmp, "agent_storage.db"))
+        db.upsert_memories(make_memories(count))
+
+        stock = MemoryManager(db=db)
+        latencies = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            memories = stock.get_user_memories(user_id=USER)
+            latencies.append((time.perf_counter() - start) * 1000)
+        result = {
+            "all": {
+                "p50_ms": round(_percentile(latencies, 0.5), 2),
+                "p95_ms": round(_percentile(latencies, 0.95), 2),
+                "memories_sent": len(memories),
+                "prompt_tokens": _prompt_tokens(memories),
+            }
+        }
+
+        embedder = None if use_model else HashEmbedder(dimensions=384)
+        indexed = IndexedMemoryManager(db=db, embedder=embedder, top_k=top_k)
+        queries = list(PLANTED)
+        latencies, hits, sent = [], 0, []
+        cold_ms = 0.0
+        for i in range(repeats):
+            query = queries[i % len(queries)]
+            memory_query_hook(RunInput(input_content=query))  # as the agent's pre-hook does
+            start = time.perf_counter()
+            memories = indexed.get_user_memories(user_id=USER)
+            elapsed = (time.perf_counter() - start) * 1000
+            if i == 0:
+                cold_ms = elapsed
+            else:
+                latencies.append(elapsed)
+            hits += any(m.memory == PLANTED[query] for m in memories)
+            sent.append(_prompt_tokens(memories))
+        result["indexed"] = {
+            "p50_ms": round(_percentile(latencies, 0.5), 2),
+            "p95_ms": round(_percentile(latencies, 0.95), 2),
+            "memories_sent": min(top_k, count),
+            "prompt_tokens": round(sum(sent) / len(sent)),
+            "cold_ms": round(cold_ms, 1),
+            "hit_at_k": round(hits / repeats, 2),
+        }
+        db.close()
+        return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="User memory retrieval: all memories vs. indexed top-k")
+    parser.add_argument("--sizes", default="100,1000,10000", help="memories per user, comma separated")
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=30, help="lookups per variant and size")
+    parser.add_argument("--model", action="store_true", help="embed with CachedSentenceTransformerEmbedder")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    results = {
+        int(size): bench_size(int(size), args.top_k, args.repeats, args.model) for size in args.sizes.split(",")
+    }
+    if args.json:
+        print(json.dumps(results))
+    else:
+        for size, variants in results.items():
+            for name, values in variants.items():
+                print(f"{size:>6} {name:<8} " + "  ".join(f"{key}={value}" for key, value in values.items()))
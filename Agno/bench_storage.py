@@ -0,0 +1,178 @@
+"""
+bench_storage.py
+----------------
+
+Session write contention on one SQLite file, stock vs. pooled:
+
+    - stock:  SqliteDb(db_file=...) (rollback journal, default pool)
+    - pooled: PooledSqliteDb (sqlite_storage.py: WAL, tuned pragmas,
+              BEGIN IMMEDIATE, group commit, busy retries)
+
+`--sessions` threads each play one chat session, like concurrent AgentOS
+requests: read the session, append a run of `--run-bytes` bytes, save it,
+`--runs` times. Every save is timed from the call to its return, i.e. until
+the session is committed. The report has writes/s over the whole run, p50
+and p99 commit latency, and how many saves failed (e.g. "database is
+locked"). Pass `--readers` to add threads that keep listing sessions
+meanwhile, as the AgentOS UI does.
+
+`--asyncio` plays the sessions as tasks on one event loop instead, like
+`arun` under AgentOS, which calls the synchronous `upsert_session` on the
+loop. That adds a third variant, pooled-async, whose sessions await
+`PooledSqliteDb.aupsert_session` and so share group commits.
+
+Usage:
+    python bench_storage.py --sessions 16 --runs 50
+    python bench_storage.py --sessions 64 --runs 20 --readers 4 --json
+    python bench_storage.py --sessions 64 --runs 20 --asyncio
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+os.environ.setdefault("AGNO_TELEMETRY", "false")
+
+from agno.db.base import SessionType
+from agno.db.sqlite import SqliteDb
+from agno.run.agent import RunOutput
+from agno.session import AgentSession
+
+from sqlite_storage import PooledSqliteDb
+
+
+def _percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(int(len(values) * q), len(values) - 1)]
+
+
+def _next_run(db, index: int, run: int, run_bytes: int) -> AgentSession:
+    session_id = f"session-{index}"
+    session = db.get_session(session_id, SessionType.AGENT)
+    if session is None:
+        session = AgentSession(
+            session_id=session_id, agent_id="bench", user_id=f"user-{index}", runs=[], created_at=int(time.time())
+        )
+    session.runs = (session.runs or []) + [
+        RunOutput(run_id=f"{session_id}-{run}", agent_id="bench", session_id=session_id, content="x" * run_bytes)
+    ]
+    return session
+
+
+def _session_worker(db, index: int, runs: int, run_bytes: int, latencies: List[float], errors: List[str]) -> None:
+    for run in range(runs):
+        try:
+            session = _next_run(db, index, run, run_bytes)
+            start = time.perf_counter()
+            db.upsert_session(session)
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            errors.append(type(e).__name__ + ": " + str(e).splitlines()[0])
+
+
+async def _session_task(db, index: int, runs: int, run_bytes: int, latencies: List[float], errors: List[str],
+                        awaits: bool) -> None:
+    for run in range(runs):
+        try:
+            session = _next_run(db, index, run, run_bytes)
+            start = time.perf_counter()
+            if awaits:
+                await db.aupsert_session(session)
+            else:
+                db.upsert_session(session)  # what agno's arun does with a synchronous db
+            latencies.append((time.perf_counter() - start) * 1000)
+        except Exception as e:
+            errors.append(type(e).__name__ + ": " + str(e).splitlines()[0])
+        await asyncio.sleep(0)  # the rest of the turn: let the other sessions run
+
+
+def _reader(db, stop: threading.Event, reads: List[int]) -> None:
+    while not stop.is_set():
+        try:
+            db.get_sessions(session_type=SessionType.AGENT, limit=20, deserialize=False)
+            reads[0] += 1
+        except Exception:
+            pass
+
+
+def bench_variant(variant: str, sessions: int, runs: int, run_bytes: int, readers: int,
+                  use_asyncio: bool = False) -> Dict[str, float]:
+    with tempfile.TemporaryDirectory() as tmp:
+        db_file = os.path.join(tmp, "agent_storage.db")
+        db = SqliteDb(db_file=db_file) if variant == "stock" else PooledSqliteDb(db_file=db_file)
+        db.get_session("warm-up", SessionType.AGENT)  # create the tables outside the timed part
+        db.upsert_session(AgentSession(session_id="warm-up", agent_id="bench", runs=[], created_at=int(time.time())))
+
+        latencies: List[float] = []
+        errors: List[str] = []
+        reads = [0]
+        stop = threading.Event()
+        reader_threads = [threading.Thread(target=_reader, args=(db, stop, reads)) for _ in range(readers)]
+        threads = [
+            threading.Thread(target=_session_worker, args=(db, i, runs, run_bytes, latencies, errors))
+            for i in range(sessions)
+        ]
+
+        async def play_sessions():
+            awaits = variant == "pooled-async"
+            await asyncio.gather(
+                *(_session_task(db, i, runs, run_bytes, latencies, errors, awaits) for i in range(sessions))
+            )
+
+        start = time.perf_counter()
+        for thread in reader_threads:
+            thread.start()
+        if use_asyncio:
+            asyncio.run(play_sessions())
+        else:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        seconds = time.perf_counter() - start
+        stop.set()
+        for thread in reader_threads:
+            thread.join()
+        result = {
+            "writes_per_s": round(len(latencies) / seconds, 1),
+            "p50_commit_ms": round(_percentile(latencies, 0.50), 2),
+            "p99_commit_ms": round(_percentile(latencies, 0.99), 2),
+            "errors": len(errors),
+            "reads_per_s": round(reads[0] / seconds, 1),
+        }
+        if isinstance(db, PooledSqliteDb):
+            result["sessions_per_commit"] = round(db.stats["grouped"] / max(db.stats["commits"], 1), 1)
+            result["retries"] = db.stats["retries"]
+        if errors:
+            result["first_error"] = errors[0]
+        db.close()
+        return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Concurrent session write benchmark for agent_storage.db")
+    parser.add_argument("--sessions", type=int, default=16, help="concurrent sessions (threads)")
+    parser.add_argument("--runs", type=int, default=50, help="runs saved per session")
+    parser.add_argument("--run-bytes", type=int, default=2000, help="size of each run's content")
+    parser.add_argument("--readers", type=int, default=0, help="threads listing sessions meanwhile")
+    parser.add_argument("--asyncio", action="store_true", help="play the sessions as tasks on one event loop")
+    parser.add_argument("--json", action="store_true")
+    args = parser.parse_args()
+
+    variants = ("stock", "pooled", "pooled-async") if args.asyncio else ("stock", "pooled")
+    result = {
+        variant: bench_variant(variant, args.sessions, args.runs, args.run_bytes, args.readers, args.asyncio)
+        for variant in variants
+    }
+    if args.json:
+        print(json.dumps(result))
+    else:
+        for name, values in result.items():
+            print(f"{name:<13} " + "  ".join(f"{key}={value}" for key, value in values.items()))
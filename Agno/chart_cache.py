@@ -0,0 +1,347 @@
+"""
+chart_cache.py
+--------------
+
+`CachedVisualizationTools`: VisualizationTools whose charts are rendered in a
+process pool and cached on disk.
+
+    - Rendering (matplotlib, ~0.3-1 s per chart at 300 dpi) runs in worker
+      processes. Async agent runs await it without blocking the event loop,
+      and sync runs only block their own thread.
+    - Charts are content-addressed: the file name is a hash of the chart type
+      and every argument that affects the image (including the data), e.g.
+      visualizations/bar_chart-3f2a....png. Asking for the same chart again
+      returns the existing file, and identical requests in flight at the same
+      time render once.
+    - The cache directory is kept under `max_bytes` by deleting the least
+      recently used charts.
+
+The tools keep the stock names, arguments and JSON results; results gain a
+"cached" flag. A requested `filename` is created as a hard link to the cached
+file (a copy where links are not supported, which counts against
+`max_bytes`), and is deleted together with the chart when it is evicted.
+
+Usage:
+    tools=[CachedVisualizationTools(output_dir="visualizations"), ...]
+"""
+
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import os
+import re
+import shutil
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from agno.tools.visualization import VisualizationTools
+from agno.utils.log import log_debug, log_info
+
+CHARTS = {
+    "create_bar_chart": "bar_chart",
+    "create_line_chart": "line_chart",
+    "create_pie_chart": "pie_chart",
+    "create_scatter_plot": "scatter_plot",
+    "create_histogram": "histogram",
+}
+_CHART_FILE = re.compile(r"^(%s)-[0-9a-f]{32}\.png$" % "|".join(CHARTS.values()))
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+
+def get_render_pool(max_workers: Optional[int] = None) -> ProcessPoolExecutor:
+    """The process pool shared by every CachedVisualizationTools in this process."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            import multiprocessing
+
+            # spawn: forking a process that already runs threads (AgentOS) is unsafe.
+            _pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return _pool
+
+
+def _discard_render_pool(pool: ProcessPoolExecutor) -> None:
+    """Forget a broken pool so the next get_render_pool() starts a fresh one."""
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+_worker_tools: Dict[str, VisualizationTools] = {}
+
+
+def render_chart(method: str, arguments: Dict[str, Any], output_dir: str, file_name: str) -> str:
+    """Runs in a pool worker: render with the stock toolkit, then move the file into place."""
+    tools = _worker_tools.get(output_dir)
+    if tools is None:
+        tools = _worker_tools[output_dir] = VisualizationTools(output_dir=output_dir)
+    tmp_name = f".{file_name}.{os.getpid()}.tmp.png"
+    result = json.loads(getattr(tools, method)(**arguments, filename=tmp_name))
+    if result.get("status") == "success":
+        final_path = os.path.join(output_dir, file_name)
+        os.replace(os.path.join(output_dir, tmp_name), final_path)
+        result["file_path"] = final_path
+    return json.dumps(result)
+
+
+class ChartStore:
+    """Size-bounded LRU index of the content-addressed chart files in a directory.
+
+    Named copies of a chart (the `filename` a caller asked for) are tracked
+    with it: `link` makes them, eviction deletes them.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self._files: "OrderedDict[str, int]" = OrderedDict()  # file name -> bytes, least recent first
+        self._named: Dict[str, Tuple[str, int]] = {}  # named file -> (chart file name, bytes of its own)
+        self._links: Dict[str, set] = {}  # chart file name -> named files
+        self.total_bytes = 0
+        self._lock = threading.Lock()
+        existing = sorted(
+            (p for p in self.directory.glob("*.png") if _CHART_FILE.match(p.name)),
+            key=lambda p: p.stat().st_mtime,
+        )
+        for path in existing:
+            self._files[path.name] = path.stat().st_size
+            self.total_bytes += self._files[path.name]
+        # Hard links made before a restart share their chart's inode.
+        inodes = {(self.directory / name).stat().st_ino: name for name in self._files}
+        for path in self.directory.glob("*.png"):
+            chart = inodes.get(path.stat().st_ino)
+            if chart is not None and chart != path.name:
+                self._named[path.name] = (chart, 0)
+                self._links.setdefault(chart, set()).add(path.name)
+        self._evict()
+
+    def touch(self, file_name: str) -> bool:
+        with self._lock:
+            if file_name not in self._files:
+                return False
+            self._files.move_to_end(file_name)
+        path = self.directory / file_name
+        try:
+            os.utime(path)  # keeps LRU order across restarts
+        except FileNotFoundError:
+            self._forget(file_name)
+            return False
+        return True
+
+    def add(self, file_name: str) -> None:
+        size = (self.directory / file_name).stat().st_size
+        with self._lock:
+            self.total_bytes += size - self._files.pop(file_name, 0)
+            self._files[file_name] = size
+            self._evict(keep=file_name)
+
+    def link(self, file_name: str, named: str) -> Optional[str]:
+        """Make `named` (relative to the directory) a copy of the chart; returns its path, or None if evicted."""
+        named_path = self.directory / named
+        with self._lock:
+            if file_name not in self._files:
+                return None
+            self._unname(named)
+            named_path.unlink(missing_ok=True)
+            try:
+                os.link(self.directory / file_name, named_path)
+                own_bytes = 0
+            except OSError:
+                shutil.copyfile(self.directory / file_name, named_path)
+                own_bytes = named_path.stat().st_size
+            self._named[named] = (file_name, own_bytes)
+            self._links.setdefault(file_name, set()).add(named)
+            self.total_bytes += own_bytes
+            self._files.move_to_end(file_name)
+            self._evict(keep=file_name)
+        return str(named_path)
+
+    def _unname(self, named: str) -> None:
+        previous = self._named.pop(named, None)
+        if previous is not None:
+            chart, own_bytes = previous
+            self.total_bytes -= own_bytes
+            self._links.get(chart, set()).discard(named)
+
+    def _forget(self, file_name: str) -> None:
+        with self._lock:
+            self.total_bytes -= self._files.pop(file_name, 0)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        for file_name in list(self._files):
+            if self.total_bytes <= self.max_bytes:
+                return
+            if file_name == keep:
+                continue
+            self.total_bytes -= self._files.pop(file_name)
+            for named in self._links.pop(file_name, set()):
+                self.total_bytes -= self._named.pop(named, (None, 0))[1]
+                (self.directory / named).unlink(missing_ok=True)
+            for path in (self.directory / file_name, (self.directory / file_name).with_suffix(".json")):
+                path.unlink(missing_ok=True)
+            log_debug(f"Evicted chart {file_name}")
+
+
+def _chart_method(method: str):
+    stock = getattr(VisualizationTools, method)
+
+    @functools.wraps(stock)
+    def create(self, *args, **kwargs) -> str:
+        return self._create(method, args, kwargs)
+
+    return create
+
+
+def _async_chart_method(method: str):
+    stock = getattr(VisualizationTools, method)
+
+    @functools.wraps(stock)
+    async def acreate(self, *args, **kwargs) -> str:
+        return await self._acreate(method, args, kwargs)
+
+    return acreate
+
+
+class CachedVisualizationTools(VisualizationTools):
+    create_bar_chart = _chart_method("create_bar_chart")
+    create_line_chart = _chart_method("create_line_chart")
+    create_pie_chart = _chart_method("create_pie_chart")
+    create_scatter_plot = _chart_method("create_scatter_plot")
+    create_histogram = _chart_method("create_histogram")
+
+    acreate_bar_chart = _async_chart_method("create_bar_chart")
+    acreate_line_chart = _async_chart_method("create_line_chart")
+    acreate_pie_chart = _async_chart_method("create_pie_chart")
+    acreate_scatter_plot = _async_chart_method("create_scatter_plot")
+    acreate_histogram = _async_chart_method("create_histogram")
+
+    def __init__(
+        self,
+        output_dir: str = "charts",
+        max_bytes: int = 256 * 2**20,
+        max_workers: Optional[int] = None,
+        **kwargs,
+    ):
+        kwargs.setdefault("async_tools", [(getattr(self, f"a{method}"), method) for method in CHARTS])
+        super().__init__(output_dir=output_dir, **kwargs)
+        # Only offer async variants of the tools that are enabled.
+        for name in list(self.async_functions):
+            if name not in self.functions:
+                del self.async_functions[name]
+        self.max_workers = max_workers
+        self.store = ChartStore(output_dir, max_bytes)
+        self._in_flight: Dict[str, Future] = {}
+        self._in_flight_lock = threading.Lock()
+        self.stats = {"hits": 0, "renders": 0, "joined": 0}
+
+    def _spec(self, method: str, args: tuple, kwargs: dict) -> Tuple[str, Dict[str, Any], Optional[str]]:
+        bound = inspect.signature(getattr(VisualizationTools, method)).bind(self, *args, **kwargs)
+        bound.apply_defaults()
+        arguments = {k: v for k, v in bound.arguments.items() if k != "self"}
+        filename = arguments.pop("filename", None)
+        digest = hashlib.blake2b(
+            json.dumps([method, arguments], sort_keys=True, default=str).encode(), digest_size=16
+        ).hexdigest()
+        return f"{CHARTS[method]}-{digest}.png", arguments, filename
+
+    def _lookup(self, file_name: str) -> Optional[str]:
+        if not self.store.touch(file_name):
+            return None
+        meta_path = (Path(self.output_dir) / file_name).with_suffix(".json")
+        try:
+            return meta_path.read_text()
+        except FileNotFoundError:
+            return None
+
+    def _submit(self, method: str, arguments: Dict[str, Any], file_name: str) -> Future:
+        """Start rendering, or join a render of the same chart that is already running.
+
+        The returned future completes only after the chart has been added to the
+        store, so a caller that sees the result also sees the cache entry.
+        """
+        with self._in_flight_lock:
+            future = self._in_flight.get(file_name)
+            if future is not None:
+                self.stats["joined"] += 1
+                return future
+            future = self._in_flight[file_name] = Future()
+            self.stats["renders"] += 1
+
+        pool = get_render_pool(self.max_workers)
+
+        def done(render: Future) -> None:
+            try:
+                result = render.result()
+                if json.loads(result).get("status") == "success":
+                    meta_path = (Path(self.output_dir) / file_name).with_suffix(".json")
+                    meta_path.write_text(result)
+                    self.store.add(file_name)
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool):
+                    _discard_render_pool(pool)
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                with self._in_flight_lock:
+                    self._in_flight.pop(file_name, None)
+
+        try:
+            render = pool.submit(render_chart, method, arguments, self.output_dir, file_name)
+        except Exception as e:
+            # A broken or shut-down pool: fail this render and every caller that joined it.
+            if isinstance(e, (BrokenProcessPool, RuntimeError)):
+                _discard_render_pool(pool)
+            with self._in_flight_lock:
+                self._in_flight.pop(file_name, None)
+            future.set_exception(e)
+            return future
+        render.add_done_callback(done)
+        return future
+
+    def _finish(self, result: str, cached: bool, filename: Optional[str]) -> str:
+        data = json.loads(result)
+        data["cached"] = cached
+        if filename and data.get("status") == "success":
+            named_path = os.path.join(self.output_dir, filename)
+            if os.path.abspath(named_path) != os.path.abspath(data["file_path"]):
+                # Evicted meanwhile (a tiny max_bytes): keep the path that was rendered.
+                named_path = self.store.link(Path(data["file_path"]).name, filename) or data["file_path"]
+            data["file_path"] = named_path
+        return json.dumps(data)
+
+    def _create(self, method: str, args: tuple, kwargs: dict) -> str:
+        try:
+            file_name, arguments, filename = self._spec(method, args, kwargs)
+        except TypeError as e:
+            return json.dumps({"chart_type": CHARTS[method], "error": str(e), "status": "error"})
+        cached = self._lookup(file_name)
+        if cached is not None:
+            self.stats["hits"] += 1
+            log_info(f"Chart served from cache: {file_name}")
+            return self._finish(cached, True, filename)
+        future = self._submit(method, arguments, file_name)
+        return self._finish(future.result(), False, filename)
+
+    async def _acreate(self, method: str, args: tuple, kwargs: dict) -> str:
+        try:
+            file_name, arguments, filename = self._spec(method, args, kwargs)
+        except TypeError as e:
+            return json.dumps({"chart_type": CHARTS[method], "error": str(e), "status": "error"})
+        cached = self._lookup(file_name)
+        if cached is not None:
+            self.stats["hits"] += 1
+            log_info(f"Chart served from cache: {file_name}")
+            return self._finish(cached, True, filename)
+        future = self._submit(method, arguments, file_name)
+        return self._finish(await asyncio.wrap_future(future), False, filename)
@@ -0,0 +1,277 @@
+"""
+data_tools.py
+-------------
+
+Drop-in replacements for `CsvTools` and `PandasTools` that read their
+datasets through `dataset_cache`, so a CSV is parsed once and then shared
+as a memory-mapped Arrow file instead of being re-read on every tool call.
+
+    - CachedCsvTools: same tools and arguments as CsvTools. Reads and column
+      lookups are served from the cached table, and SQL queries run in DuckDB
+      directly against it (no per-query CSV import).
+    - CachedPandasTools: same tools as PandasTools. The `csvs` it is given are
+      available as dataframes named after the file (e.g. "Student_Performance")
+      without a create step, and `read_csv` of a plain CSV path is served from
+      the cache. Dataframes are kept per session in the memory-bounded
+      FrameRegistry (frame_registry.py) rather than on the toolkit.
+
+Usage:
+    tools=[
+        CachedPandasTools(csvs=["./docs/Student_Performance.csv"]),
+        CachedCsvTools(csvs=["./docs/Student_Performance.csv"]),
+    ]
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import pandas as pd
+from agno.run import RunContext
+from agno.tools.csv_toolkit import CsvTools
+from agno.tools.pandas import PandasTools
+from agno.utils.log import log_debug, log_info, logger
+
+from dataset_cache import DatasetCache, default_cache
+from frame_registry import FrameRegistry, default_registry
+
+
+class CachedCsvTools(CsvTools):
+    def __init__(self, csvs: Optional[List[Union[str, Path]]] = None, cache: Optional[DatasetCache] = None, **kwargs):
+        self.cache = cache or default_cache
+        super().__init__(csvs=csvs, **kwargs)
+
+    def _csv_path(self, csv_name: str) -> Optional[Path]:
+        return next((_csv for _csv in self.csvs if _csv.stem == csv_name), None)
+
+    def read_csv_file(self, csv_name: str, row_limit: Optional[int] = None) -> str:
+        """Use this function to read the contents of a csv file `name` without the extension.
+
+        Args:
+            csv_name (str): The name of the csv file to read without the extension.
+            row_limit (Optional[int]): The number of rows to return. None returns all rows. Defaults to None.
+
+        Returns:
+            str: The contents of the csv file if successful, otherwise returns an error message.
+        """
+        try:
+            file_path = self._csv_path(csv_name)
+            if file_path is None:
+                return f"File: {csv_name} not found, please use one of {self.list_csv_files()}"
+
+            log_info(f"Reading file: {csv_name}")
+            return json.dumps(self.cache.rows(file_path, limit=row_limit or self.row_limit), default=str)
+        except Exception as e:
+            logger.error(f"Error reading csv: {e}")
+            return f"Error reading csv: {e}"
+
+    def get_columns(self, csv_name: str) -> str:
+        """Use this function to get the columns of the csv file `csv_name` without the extension.
+
+        Args:
+            csv_name (str): The name of the csv file to get the columns from without the extension.
+
+        Returns:
+            str: The columns of the csv file if successful, otherwise returns an error message.
+        """
+        try:
+            file_path = self._csv_path(csv_name)
+            if file_path is None:
+                return f"File: {csv_name} not found, please use one of {self.list_csv_files()}"
+
+            log_info(f"Reading columns from file: {csv_name}")
+            return json.dumps(self.cache.columns(file_path))
+        except Exception as e:
+            logger.error(f"Error getting columns: {e}")
+            return f"Error getting columns: {e}"
+
+    def query_csv_file(self, csv_name: str, sql_query: str) -> str:
+        """Use this function to run a SQL query on csv file `csv_name` without the extension.
+        The Table name is the name of the csv file without the extension.
+        The SQL Query should be a valid DuckDB SQL query.
+        Always wrap column names with double quotes if they contain spaces or special characters
+        Remember to escape the quotes in th e JSON string (use \")
+        Use single quotes for string values
+
+        Args:
+            csv_name (str): The name of the csv file to query
+            sql_query (str): The SQL Query to run on the csv file.
+
+        Returns:
+            str: The query results if successful, otherwise returns an error message.
+        """
+        try:
+            import duckdb
+
+            file_path = self._csv_path(csv_name)
+            if file_path is None:
+                return f"File: {csv_name} not found, please use one of {self.list_csv_files()}"
+
+            con = self.duckdb_connection or duckdb.connect(**(self.duckdb_kwargs or {}))
+            # DuckDB scans the Arrow table in place; registering is just a name binding.
+            con.register(csv_name, self.cache.table(file_path))
+
+            # Remove backticks and only run the first statement
+            formatted_sql = sql_query.replace("`", "").split(";")[0]
+            log_info(f"Running query: {formatted_sql}")
+            query_result = con.sql(formatted_sql)
+            result_output = "No output"
+            if query_result is not None:
+                result_rows = [
+                    str(row[0]) if len(row) == 1 else ",".join(str(x) for x in row)
+                    for row in query_result.fetchall()
+                ]
+                result_output = ",".join(query_result.columns) + "\n" + "\n".join(result_rows)
+
+            log_debug(f"Query result: {result_output}")
+            return result_output
+        except Exception as e:
+            logger.error(f"Error querying csv: {e}")
+            return f"Error querying csv: {e}"
+
+
+class CachedPandasTools(PandasTools):
+    """PandasTools whose dataframes live in a FrameRegistry, per session.
+
+    Frames are read from and written back to `registry` on every call instead
+    of the toolkit's own dict, so they count against the registry's memory
+    budget, are deduplicated across sessions and can be spilled to disk.
+    """
+
+    # Methods that change the frame without an `inplace` argument.
+    MUTATING_OPERATIONS = {"insert", "pop", "update", "__setitem__", "__delitem__"}
+
+    def __init__(
+        self,
+        csvs: Optional[List[Union[str, Path]]] = None,
+        cache: Optional[DatasetCache] = None,
+        registry: Optional[FrameRegistry] = None,
+        **kwargs,
+    ):
+        self.cache = cache or default_cache
+        self.registry = registry or default_registry
+        self.datasets: Dict[str, Path] = {Path(_csv).stem: Path(_csv) for _csv in csvs or []}
+        if self.datasets:
+            kwargs.setdefault(
+                "instructions",
+                "These dataframes are already loaded and can be used with run_dataframe_operation "
+                f"without creating them first: {', '.join(self.datasets)}.",
+            )
+            kwargs.setdefault("add_instructions", True)
+        super().__init__(**kwargs)
+
+    def _session(self, run_context: Optional[RunContext]) -> str:
+        return run_context.session_id if run_context is not None else "default"
+
+    def _put_dataset(self, session_id: str, dataframe_name: str, csv_path: Path) -> None:
+        # The mapped dataset is file-backed: registered without hashing or budget cost.
+        self.registry.put(
+            session_id,
+            dataframe_name,
+            self.cache.dataframe(csv_path),
+            shared=True,
+            key=f"dataset-{self.cache.digest(csv_path)}",
+        )
+
+    def _cached_csv(self, create_using_function: str, function_parameters: Dict[str, Any]) -> Optional[Path]:
+        # Only a bare read_csv of a local file is equivalent to the cached table.
+        if create_using_function != "read_csv" or set(function_parameters) != {"filepath_or_buffer"}:
+            return None
+        path = function_parameters["filepath_or_buffer"]
+        if not isinstance(path, str) or not path.endswith(".csv") or not Path(path).is_file():
+            return None
+        return Path(path)
+
+    def create_pandas_dataframe(
+        self,
+        dataframe_name: str,
+        create_using_function: str,
+        function_parameters: Dict[str, Any],
+        run_context: Optional[RunContext] = None,
+    ) -> str:
+        """Creates a pandas dataframe named `dataframe_name` by running a function `create_using_function` with the parameters `function_parameters`.
+        Returns the created dataframe name as a string if successful, otherwise returns an error message.
+
+        For Example:
+        - To create a dataframe `csv_data` by reading a CSV file, use: {"dataframe_name": "csv_data", "create_using_function": "read_csv", "function_parameters": {"filepath_or_buffer": "data.csv"}}
+        - To create a dataframe `json_data` by reading a JSON file, use: {"dataframe_name": "json_data", "create_using_function": "read_json", "function_parameters": {"path_or_buf": "data.json"}}
+
+        :param dataframe_name: The name of the dataframe to create.
+        :param create_using_function: The function to use to create the dataframe.
+        :param function_parameters: The parameters to pass to the function.
+        :return: The name of the created dataframe if successful, otherwise an error message.
+        """
+        try:
+            log_debug(f"Creating dataframe: {dataframe_name}")
+            session_id = self._session(run_context)
+            if (session_id, dataframe_name) in self.registry:
+                return f"Dataframe already exists: {dataframe_name}"
+
+            csv_path = self._cached_csv(create_using_function, function_parameters)
+            if csv_path is not None:
+                self._put_dataset(session_id, dataframe_name, csv_path)
+                log_debug(f"Created dataframe from cache: {dataframe_name}")
+                return dataframe_name
+
+            def create() -> pd.DataFrame:
+                dataframe = getattr(pd, create_using_function)(**function_parameters)
+                if not isinstance(dataframe, pd.DataFrame):
+                    raise ValueError(f"Error creating dataframe: {dataframe_name}")
+                if dataframe.empty:
+                    raise ValueError(f"Dataframe is empty: {dataframe_name}")
+                return dataframe
+
+            load_key = json.dumps([create_using_function, function_parameters], sort_keys=True, default=str)
+            self.registry.load(session_id, dataframe_name, load_key, create)
+            log_debug(f"Created dataframe: {dataframe_name}")
+            return dataframe_name
+        except ValueError as e:
+            return str(e)
+        except Exception as e:
+            logger.error(f"Error creating dataframe: {e}")
+            return f"Error creating dataframe: {e}"
+
+    def run_dataframe_operation(
+        self,
+        dataframe_name: str,
+        operation: str,
+        operation_parameters: Dict[str, Any],
+        run_context: Optional[RunContext] = None,
+    ) -> str:
+        """Runs an operation `operation` on a dataframe `dataframe_name` with the parameters `operation_parameters`.
+        Returns the result of the operation as a string if successful, otherwise returns an error message.
+
+        For Example:
+        - To get the first 5 rows of a dataframe `csv_data`, use: {"dataframe_name": "csv_data", "operation": "head", "operation_parameters": {"n": 5}}
+        - To get the last 5 rows of a dataframe `csv_data`, use: {"dataframe_name": "csv_data", "operation": "tail", "operation_parameters": {"n": 5}}
+
+        :param dataframe_name: The name of the dataframe to run the operation on.
+        :param operation: The operation to run on the dataframe.
+        :param operation_parameters: The parameters to pass to the operation.
+        :return: The result of the operation if successful, otherwise an error message.
+        """
+        try:
+            log_debug(f"Running operation: {operation} on dataframe: {dataframe_name}")
+            session_id = self._session(run_context)
+            dataframe = self.registry.get(session_id, dataframe_name)
+            if dataframe is None and dataframe_name in self.datasets:
+                self._put_dataset(session_id, dataframe_name, self.datasets[dataframe_name])
+                dataframe = self.registry.get(session_id, dataframe_name)
+            if dataframe is None:
+                return f"Dataframe not found: {dataframe_name}"
+
+            result = getattr(dataframe, operation)(**operation_parameters)
+            if operation_parameters.get("inplace") or operation in self.MUTATING_OPERATIONS:
+                self.registry.put(session_id, dataframe_name, dataframe)
+
+            log_debug(f"Ran operation: {operation}")
+            try:
+                try:
+                    return result.to_string()
+                except AttributeError:
+                    return str(result)
+            except Exception:
+                return "Operation ran successfully"
+        except Exception as e:
+            logger.error(f"Error running operation: {e}")
+            return f"Error running operation: {e}"
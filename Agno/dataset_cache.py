@@ -0,0 +1,175 @@
+"""
+dataset_cache.py
+----------------
+
+Columnar, memory-mapped cache for the CSV datasets used by the data science
+agents.
+
+The first time a CSV is requested it is parsed once with pyarrow and written
+next to the other cached datasets as an uncompressed Arrow IPC file. From then
+on every process maps that file instead of parsing the CSV again:
+
+    - Tables and row slices are zero-copy views of the mapped file, so the
+      operating system's page cache holds a single copy of the data no matter
+      how many AgentOS workers read it.
+    - DataFrames are cheap shallow copies of one per-process base frame. With
+      pandas' copy-on-write (the default from pandas 3) edits made by a tool
+      copy only the columns they touch, and never write to the mapping.
+
+A cached file is reused while the CSV's size and mtime are unchanged. If
+they change, the CSV is re-hashed, and the cache is rebuilt only when the
+content really changed (a `touch` or a copy with new timestamps costs one hash).
+
+Usage:
+    from dataset_cache import default_cache
+
+    df = default_cache.dataframe("./docs/Student_Performance.csv")
+    rows = default_cache.rows("./docs/Student_Performance.csv", offset=100, limit=20)
+"""
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pa_csv
+    import pyarrow.ipc as pa_ipc
+except ImportError:
+    raise ImportError("`pyarrow` not installed. Please install using `pip install pyarrow`.")
+
+import pandas as pd
+
+# pandas only guarantees that shallow copies never write through to shared
+# (here: read-only, memory-mapped) buffers when copy-on-write is on.
+_COPY_ON_WRITE = int(pd.__version__.split(".")[0]) >= 3 or bool(
+    getattr(pd.options.mode, "copy_on_write", False)
+)
+
+
+def file_digest(path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def shared_copy(frame: pd.DataFrame) -> pd.DataFrame:
+    """A copy of `frame` that can be modified without touching the original.
+
+    Shallow (sharing column buffers) under copy-on-write, deep otherwise.
+    """
+    return frame.copy(deep=not _COPY_ON_WRITE)
+
+
+@dataclass
+class _Entry:
+    stamp: tuple
+    digest: str
+    table: "pa.Table"
+    frame: Optional[pd.DataFrame] = None
+
+
+class DatasetCache:
+    def __init__(self, cache_dir: Union[str, Path] = "tmp/dataset_cache"):
+        self.cache_dir = Path(cache_dir)
+        self._entries: Dict[Path, _Entry] = {}
+        self._lock = threading.Lock()
+        # builds: CSV parses, rehashes: mtime changed but content did not,
+        # maps: cached files opened, hits: served from this process's memory.
+        self.stats = {"builds": 0, "rehashes": 0, "maps": 0, "hits": 0}
+
+    def _cache_paths(self, source: Path) -> tuple:
+        key = hashlib.blake2b(str(source).encode(), digest_size=8).hexdigest()
+        base = self.cache_dir / f"{source.stem}-{key}"
+        return base.with_suffix(".arrow"), base.with_suffix(".json")
+
+    def _build(self, source: Path, data_path: Path, meta_path: Path, stamp: tuple, digest: str) -> None:
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        table = pa_csv.read_csv(source)
+        # Write-then-rename so other processes never map a half-written file.
+        tmp_path = data_path.with_suffix(f".{os.getpid()}.tmp")
+        with pa_ipc.new_file(tmp_path, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, data_path)
+        self._write_meta(meta_path, source, stamp, digest, table.num_rows)
+        self.stats["builds"] += 1
+
+    def _write_meta(self, meta_path: Path, source: Path, stamp: tuple, digest: str, num_rows: int) -> None:
+        tmp_path = meta_path.with_suffix(f".{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({
+            "source": str(source),
+            "size": stamp[0],
+            "mtime_ns": stamp[1],
+            "digest": digest,
+            "num_rows": num_rows,
+        }))
+        os.replace(tmp_path, meta_path)
+
+    def _entry(self, path: Union[str, Path]) -> _Entry:
+        source = Path(path).resolve()
+        st = source.stat()
+        stamp = (st.st_size, st.st_mtime_ns)
+
+        with self._lock:
+            entry = self._entries.get(source)
+            if entry is not None and entry.stamp == stamp:
+                self.stats["hits"] += 1
+                return entry
+
+            data_path, meta_path = self._cache_paths(source)
+            meta = json.loads(meta_path.read_text()) if meta_path.exists() and data_path.exists() else None
+            if meta is not None and (meta["size"], meta["mtime_ns"]) == stamp:
+                digest = meta["digest"]
+            else:
+                digest = file_digest(source)
+                if meta is not None and meta["digest"] == digest:
+                    self._write_meta(meta_path, source, stamp, digest, meta["num_rows"])
+                    self.stats["rehashes"] += 1
+                elif entry is None or entry.digest != digest:
+                    self._build(source, data_path, meta_path, stamp, digest)
+
+            if entry is not None and entry.digest == digest:
+                entry.stamp = stamp
+                return entry
+
+            table = pa_ipc.open_file(pa.memory_map(str(data_path), "r")).read_all()
+            self.stats["maps"] += 1
+            entry = _Entry(stamp, digest, table)
+            self._entries[source] = entry
+            return entry
+
+    def table(self, path: Union[str, Path]) -> "pa.Table":
+        """The dataset as a memory-mapped Arrow table."""
+        return self._entry(path).table
+
+    def digest(self, path: Union[str, Path]) -> str:
+        """Content hash of the dataset version currently served."""
+        return self._entry(path).digest
+
+    def columns(self, path: Union[str, Path]) -> List[str]:
+        return self._entry(path).table.column_names
+
+    def rows(self, path: Union[str, Path], offset: int = 0, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rows `offset` to `offset + limit` as dicts, sliced without copying the table."""
+        return self._entry(path).table.slice(offset, limit).to_pylist()
+
+    def dataframe(self, path: Union[str, Path]) -> pd.DataFrame:
+        """A DataFrame of the dataset that callers may modify freely."""
+        entry = self._entry(path)
+        if entry.frame is None:
+            entry.frame = entry.table.to_pandas(split_blocks=True)
+        return shared_copy(entry.frame)
+
+    def clear(self) -> None:
+        """Drop this process's mapped tables; the files on disk are kept."""
+        with self._lock:
+            self._entries.clear()
+
+
+default_cache = DatasetCache()
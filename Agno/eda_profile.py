@@ -0,0 +1,196 @@
+"""
+eda_profile.py
+--------------
+
+Precomputed exploratory statistics for the cached datasets, exposed to the
+agents as one cheap tool call.
+
+Questions like "summary statistics for the subject wise performance of the
+students" otherwise make the model drive several PandasTools calls
+(describe, groupby, value_counts, ...) that recompute the same aggregates on
+every run. `build_profile` computes them once per dataset version:
+
+    - numeric columns: count, missing, mean, std, min/max, skew, kurtosis,
+      quantiles and a histogram
+    - categorical columns: distinct count, missing and value counts
+    - for every low-cardinality categorical column: count, mean and median of
+      each numeric column per group
+
+Profiles are keyed by the dataset's content hash (see dataset_cache.py), kept
+in memory and written next to the cached dataset, so other processes and
+later runs load them instead of recomputing.
+
+Usage:
+    tools=[DatasetProfileTools(csvs=["./docs/Student_Performance.csv"]), ...]
+"""
+
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+import pandas as pd
+from agno.tools import Toolkit
+from agno.utils.log import log_debug, logger
+
+from dataset_cache import DatasetCache, default_cache
+
+QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+def _round(value: Any, digits: int = 4) -> Any:
+    if value is None or pd.isna(value):
+        return None
+    return round(float(value), digits)
+
+
+def build_profile(df: pd.DataFrame, bins: int = 10, top_values: int = 20, max_groups: int = 20) -> Dict[str, Any]:
+    numeric = [c for c in df.columns if pd.api.types.is_numeric_dtype(df[c]) and not pd.api.types.is_bool_dtype(df[c])]
+    categorical = [c for c in df.columns if c not in numeric]
+
+    columns: Dict[str, Any] = {}
+    for name in numeric:
+        series = df[name].dropna()
+        counts, edges = (pd.Series(dtype=float), [])
+        if len(series):
+            cut = pd.cut(series, bins=min(bins, max(series.nunique(), 1)))
+            counts = cut.value_counts(sort=False)
+            edges = [_round(iv.left) for iv in counts.index] + [_round(counts.index[-1].right)]
+        columns[name] = {
+            "type": "numeric",
+            "count": int(series.count()),
+            "missing": int(df[name].isna().sum()),
+            "mean": _round(series.mean()),
+            "std": _round(series.std()),
+            "min": _round(series.min()),
+            "max": _round(series.max()),
+            "skew": _round(series.skew()),
+            "kurtosis": _round(series.kurt()),
+            "quantiles": {str(q): _round(v) for q, v in series.quantile(list(QUANTILES)).items()},
+            "histogram": {"edges": edges, "counts": [int(c) for c in counts]},
+        }
+
+    group_columns = []
+    for name in categorical:
+        series = df[name]
+        n_unique = int(series.nunique())
+        counts = series.value_counts().head(top_values)
+        columns[name] = {
+            "type": "categorical",
+            "count": int(series.count()),
+            "missing": int(series.isna().sum()),
+            "unique": n_unique,
+            "value_counts": {str(k): int(v) for k, v in counts.items()},
+        }
+        if 1 < n_unique <= max_groups:
+            group_columns.append(name)
+
+    group_by: Dict[str, Any] = {}
+    for name in group_columns:
+        grouped = df.groupby(name, observed=True)[numeric].agg(["count", "mean", "median"])
+        group_by[name] = {
+            str(group): {
+                column: {
+                    "count": int(row[(column, "count")]),
+                    "mean": _round(row[(column, "mean")]),
+                    "median": _round(row[(column, "median")]),
+                }
+                for column in numeric
+            }
+            for group, row in grouped.iterrows()
+        }
+
+    return {"rows": len(df), "columns": columns, "group_by": group_by}
+
+
+class ProfileIndex:
+    def __init__(self, cache: Optional[DatasetCache] = None):
+        self.cache = cache or default_cache
+        self._profiles: Dict[str, Dict[str, Any]] = {}
+
+    def _profile_path(self, source: Path, digest: str) -> Path:
+        return self.cache.cache_dir / f"{source.stem}-{digest}.profile.json"
+
+    def get(self, path: Union[str, Path]) -> Dict[str, Any]:
+        """Profile of the current version of the dataset at `path`."""
+        source = Path(path)
+        digest = self.cache.digest(source)
+        profile = self._profiles.get(digest)
+        if profile is not None:
+            return profile
+
+        profile_path = self._profile_path(source, digest)
+        if profile_path.exists():
+            profile = json.loads(profile_path.read_text())
+        else:
+            log_debug(f"Building profile for {source.name}")
+            profile = build_profile(self.cache.dataframe(source))
+            profile_path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = profile_path.with_suffix(".tmp")
+            tmp_path.write_text(json.dumps(profile))
+            tmp_path.replace(profile_path)
+        self._profiles[digest] = profile
+        return profile
+
+
+default_index = ProfileIndex()
+
+
+class DatasetProfileTools(Toolkit):
+    def __init__(self, csvs: Optional[List[Union[str, Path]]] = None, index: Optional[ProfileIndex] = None, **kwargs):
+        self.csvs: Dict[str, Path] = {Path(_csv).stem: Path(_csv) for _csv in csvs or []}
+        self.index = index or default_index
+        kwargs.setdefault(
+            "instructions",
+            "For summary statistics, distributions, value counts or per-group averages, call "
+            "get_dataset_profile first: it is precomputed and answers most EDA questions in one call.",
+        )
+        kwargs.setdefault("add_instructions", True)
+        super().__init__(name="dataset_profile_tools", tools=[self.get_dataset_profile], **kwargs)
+
+    def get_dataset_profile(
+        self,
+        csv_name: str,
+        columns: Optional[List[str]] = None,
+        group_by: Optional[str] = None,
+    ) -> str:
+        """Use this function to get precomputed summary statistics for the csv file `csv_name` (without the extension).
+
+        Numeric columns include count, missing, mean, std, min, max, skew, kurtosis, quantiles and a histogram.
+        Categorical columns include distinct and per-value counts.
+        With `group_by`, returns count, mean and median of every numeric column for each value of that categorical column instead.
+
+        Args:
+            csv_name (str): The name of the csv file without the extension.
+            columns (Optional[List[str]]): Only include these columns. Defaults to all columns.
+            group_by (Optional[str]): A categorical column to aggregate the numeric columns by.
+
+        Returns:
+            str: The statistics as JSON if successful, otherwise an error message.
+        """
+        try:
+            if csv_name not in self.csvs:
+                return f"File: {csv_name} not found, please use one of {json.dumps(list(self.csvs))}"
+            profile = self.index.get(self.csvs[csv_name])
+
+            if group_by is not None:
+                groups = profile["group_by"].get(group_by)
+                if groups is None:
+                    return f"Cannot group by {group_by}, please use one of {json.dumps(list(profile['group_by']))}"
+                if columns:
+                    groups = {g: {c: s for c, s in stats.items() if c in columns} for g, stats in groups.items()}
+                return json.dumps({"group_by": group_by, "groups": groups})
+
+            selected = profile["columns"]
+            if columns:
+                missing = [c for c in columns if c not in selected]
+                if missing:
+                    return f"Unknown columns {missing}, please use some of {json.dumps(list(selected))}"
+                selected = {c: selected[c] for c in columns}
+            return json.dumps({
+                "rows": profile["rows"],
+                "columns": selected,
+                "group_by_columns": list(profile["group_by"]),
+            })
+        except Exception as e:
+            logger.error(f"Error getting dataset profile: {e}")
+            return f"Error getting dataset profile: {e}"
@@ -0,0 +1,178 @@
+"""
+embedding_cache.py
+------------------
+
+One shared SentenceTransformer model per process, plus a persistent
+embedding cache.
+
+Every `SentenceTransformerEmbedder()` loads its own copy of the model (the
+storyteller and self-learning knowledge bases each load one). The embedder
+then re-encodes every chunk and query, even text it has embedded before,
+e.g. when a document is re-ingested or the same question is searched twice.
+
+    - shared_model(model_id): loads each model once per process and returns
+      the same instance to every caller.
+    - EmbeddingCache: an SQLite file of vectors keyed by (model key, text
+      hash). The model key covers the model id, the prompt and normalisation.
+      Lookups are done in bulk, and a small in-memory LRU sits in front for
+      repeated queries. WAL mode lets several processes (AgentOS reload
+      workers) share the file.
+    - CachedSentenceTransformerEmbedder: a drop-in SentenceTransformerEmbedder
+      that uses both. A list of texts is looked up in one query, and the misses
+      are encoded together in one batch.
+
+Usage:
+    embedder=CachedSentenceTransformerEmbedder()
+"""
+
+import hashlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Union
+
+import numpy as np
+from agno.knowledge.embedder.sentence_transformer import SentenceTransformer, SentenceTransformerEmbedder
+from agno.utils.log import log_debug
+
+_models: Dict[str, "SentenceTransformer"] = {}
+_models_lock = threading.Lock()
+
+
+def shared_model(model_id: str) -> "SentenceTransformer":
+    """The process-wide SentenceTransformer for `model_id`, loaded on first use."""
+    with _models_lock:
+        model = _models.get(model_id)
+        if model is None:
+            log_debug(f"Loading SentenceTransformer {model_id}")
+            model = _models[model_id] = SentenceTransformer(model_name_or_path=model_id)
+        return model
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode(), digest_size=16).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, path: Union[str, Path] = "tmp/embedding_cache.db", memory_items: int = 10_000):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, text_hash BLOB NOT NULL, vector BLOB NOT NULL,"
+            " PRIMARY KEY (model, text_hash)) WITHOUT ROWID"
+        )
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self.memory_items = memory_items
+        # memory_hits: in-process LRU, disk_hits: SQLite file, misses: had to be encoded.
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _remember(self, key: tuple, vector: np.ndarray) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_items:
+            self._memory.popitem(last=False)
+
+    def get_many(self, model: str, hashes: Sequence[bytes]) -> List[Optional[np.ndarray]]:
+        """Cached vectors for `hashes`, None where there is none."""
+        found: Dict[bytes, np.ndarray] = {}
+        with self._lock:
+            for h in hashes:
+                vector = self._memory.get((model, h))
+                if vector is not None:
+                    self._memory.move_to_end((model, h))
+                    found[h] = vector
+            self.stats["memory_hits"] += len(found)
+            missing = list({h for h in hashes if h not in found})
+            # SQLite allows at most 999 bound parameters per statement in older builds.
+            for start in range(0, len(missing), 900):
+                part = missing[start:start + 900]
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model = ? AND text_hash IN ({','.join('?' * len(part))})",
+                    [model, *part],
+                ).fetchall()
+                for h, blob in rows:
+                    vector = np.frombuffer(blob, dtype=np.float32)
+                    found[h] = vector
+                    self._remember((model, h), vector)
+                self.stats["disk_hits"] += len(rows)
+            self.stats["misses"] += len([h for h in missing if h not in found])
+        return [found.get(h) for h in hashes]
+
+    def put_many(self, model: str, hashes: Sequence[bytes], vectors: Sequence[np.ndarray]) -> None:
+        rows = []
+        with self._lock:
+            for h, vector in zip(hashes, vectors):
+                vector = np.asarray(vector, dtype=np.float32)
+                self._remember((model, h), vector)
+                rows.append((model, h, vector.tobytes()))
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany("INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)", rows)
+                self._conn.execute("COMMIT")
+            except BaseException:
+                # Otherwise the connection stays inside the failed transaction.
+                if self._conn.in_transaction:
+                    self._conn.execute("ROLLBACK")
+                raise
+
+    def __len__(self) -> int:
+        return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+_default_cache: Optional[EmbeddingCache] = None
+
+
+def default_cache() -> EmbeddingCache:
+    global _default_cache
+    with _models_lock:
+        if _default_cache is None:
+            _default_cache = EmbeddingCache()
+        return _default_cache
+
+
+@dataclass
+class CachedSentenceTransformerEmbedder(SentenceTransformerEmbedder):
+    cache: Optional[EmbeddingCache] = None
+
+    def __post_init__(self):
+        if self.sentence_transformer_client is None:
+            self.sentence_transformer_client = shared_model(self.id)
+        if self.cache is None:
+            self.cache = default_cache()
+
+    @property
+    def model_key(self) -> str:
+        return f"{self.id}|prompt={self.prompt or ''}|normalize={self.normalize_embeddings}"
+
+    def get_embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings for `texts`: cached ones in one lookup, the rest encoded in one batch."""
+        hashes = [text_hash(text) for text in texts]
+        vectors = self.cache.get_many(self.model_key, hashes)
+        missing = {}  # text hash -> text, each distinct text encoded once
+        for h, text, vector in zip(hashes, texts, vectors):
+            if vector is None:
+                missing.setdefault(h, text)
+        if missing:
+            encoded = self.sentence_transformer_client.encode(
+                list(missing.values()), prompt=self.prompt, normalize_embeddings=self.normalize_embeddings
+            )
+            self.cache.put_many(self.model_key, list(missing), encoded)
+            fresh = dict(zip(missing, (np.asarray(v, dtype=np.float32) for v in encoded)))
+            vectors = [v if v is not None else fresh[h] for h, v in zip(hashes, vectors)]
+        return [v.tolist() for v in vectors]
+
+    def get_embedding(self, text: Union[str, List[str]]) -> List[float]:
+        if isinstance(text, list):
+            return self.get_embeddings(text)  # type: ignore[return-value]
+        return self.get_embeddings([text])[0]
@@ -0,0 +1,233 @@
+"""
+fake_model.py
+-------------
+
+A deterministic, offline stand-in for `OpenRouter` so the example agents can
+run without network access. It implements the Agno `Model` interface, so it
+can be passed anywhere a model is expected (agents, team leaders, memory
+managers) and supports:
+
+    - Scripted replies, used in order and cycling, or a `respond` callback.
+      Every session keeps its own place in the script, so concurrent sessions
+      sharing one fake each see the whole script.
+    - Tool calls: a script entry like {"tool_calls": [{"name": "get_columns",
+      "args": {"csv_name": "Student_Performance"}}]} makes the agent run that tool.
+    - Structured output: when the agent asks for an output schema, the reply is
+      built from `structured[<schema name>]` (or placeholder values).
+    - Synthetic latency (`latency_s` before the first token) and a token rate
+      (`tokens_per_s`), in both blocking and streaming mode.
+
+Usage:
+    from fake_model import FakeModel, use_fake_model
+    use_fake_model(agent, lambda: FakeModel(script=["Hello!"], latency_s=0.2))
+
+The counters (`calls`, `model_time_s`, `input_tokens`, `output_tokens`) let
+benchmarks separate time spent "in the model" from orchestration overhead.
+"""
+
+import asyncio
+import json
+import re
+import time
+import types
+import typing
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+from uuid import uuid4
+
+from agno.models.base import Model
+from agno.models.message import Message
+from agno.models.response import ModelResponse
+from pydantic import BaseModel
+
+try:
+    from agno.metrics import MessageMetrics as Metrics
+except ImportError:  # agno < 2.5
+    from agno.models.metrics import Metrics
+
+
+def _tokens(text: str) -> List[str]:
+    return re.findall(r"\S+\s*", text) or ([text] if text else [])
+
+
+def _message_text(message: Message) -> str:
+    content = message.content
+    if content is None:
+        return ""
+    return content if isinstance(content, str) else json.dumps(content, default=str)
+
+
+def _default_value(annotation):
+    origin = typing.get_origin(annotation)
+    if origin is typing.Literal:
+        return typing.get_args(annotation)[0]
+    if origin in (list, tuple, set):
+        return []
+    if origin is dict:
+        return {}
+    if origin in (typing.Union, types.UnionType):
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        return _default_value(args[0]) if args else None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return default_data(annotation)
+    return {str: "", int: 0, float: 0.0, bool: False}.get(annotation)
+
+
+def default_data(schema: type[BaseModel]) -> Dict[str, Any]:
+    """Placeholder data that validates against `schema`."""
+    return {name: _default_value(f.annotation) for name, f in schema.model_fields.items()}
+
+
+@dataclass
+class FakeModel(Model):
+    id: str = "fake-model"
+    name: str = "FakeModel"
+    provider: str = "Fake"
+    # Makes Agno hand us the output schema class itself as `response_format`.
+    supports_native_structured_outputs: bool = True
+
+    script: List[Any] = field(default_factory=lambda: ["This is a scripted reply."])
+    respond: Optional[Callable[[List[Message]], Any]] = None
+    structured: Dict[str, Any] = field(default_factory=dict)
+    latency_s: float = 0.0
+    tokens_per_s: Optional[float] = None
+
+    # Totals across all calls, for benchmarks.
+    calls: int = 0
+    model_time_s: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+    # Script position per session id (None when Agno passes no run).
+    _cursors: Dict[Optional[str], int] = field(default_factory=dict)
+
+    def _next_item(self, messages: List[Message], session_id: Optional[str]) -> Any:
+        if self.respond is not None:
+            return self.respond(messages)
+        cursor = self._cursors.get(session_id, 0)
+        self._cursors[session_id] = cursor + 1
+        return self.script[cursor % len(self.script)]
+
+    def _build_response(self, messages: List[Message], response_format=None, run_response=None) -> ModelResponse:
+        response = ModelResponse(role="assistant")
+        if isinstance(response_format, type) and issubclass(response_format, BaseModel):
+            data = self.structured.get(response_format.__name__)
+            if callable(data):
+                data = data(messages)
+            if data is None:
+                data = default_data(response_format)
+            response.parsed = response_format.model_validate(data)
+            response.content = json.dumps(data)
+        else:
+            item = self._next_item(messages, getattr(run_response, "session_id", None))
+            if isinstance(item, dict):
+                response.content = item.get("content") or None
+                response.tool_calls = [
+                    {
+                        "id": call.get("id") or f"call_{uuid4().hex[:12]}",
+                        "type": "function",
+                        "function": {"name": call["name"], "arguments": json.dumps(call.get("args", {}))},
+                    }
+                    for call in item.get("tool_calls", [])
+                ]
+            else:
+                response.content = str(item)
+
+        input_tokens = sum(len(_tokens(_message_text(m))) for m in messages)
+        output_tokens = len(_tokens(response.content or "")) + 8 * len(response.tool_calls)
+        response.response_usage = Metrics(
+            input_tokens=input_tokens,
+            output_tokens=output_tokens,
+            total_tokens=input_tokens + output_tokens,
+        )
+        self.calls += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        return response
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_s if self.tokens_per_s else 0.0
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+        self.model_time_s += seconds
+
+    async def _asleep(self, seconds: float) -> None:
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+        self.model_time_s += seconds
+
+    def _deltas(self, response: ModelResponse) -> List[ModelResponse]:
+        deltas = [ModelResponse(role="assistant", content=t) for t in _tokens(response.content or "")]
+        deltas.append(ModelResponse(
+            role="assistant",
+            tool_calls=response.tool_calls,
+            response_usage=response.response_usage,
+        ))
+        return deltas
+
+    def invoke(self, messages: List[Message], assistant_message: Message = None,
+               response_format=None, **kwargs) -> ModelResponse:
+        response = self._build_response(messages, response_format, kwargs.get("run_response"))
+        self._sleep(self.latency_s + response.response_usage.output_tokens * self._token_delay())
+        return response
+
+    async def ainvoke(self, messages: List[Message], assistant_message: Message = None,
+                      response_format=None, **kwargs) -> ModelResponse:
+        response = self._build_response(messages, response_format, kwargs.get("run_response"))
+        await self._asleep(self.latency_s + response.response_usage.output_tokens * self._token_delay())
+        return response
+
+    def invoke_stream(self, messages: List[Message], assistant_message: Message = None,
+                      response_format=None, **kwargs) -> Iterator[ModelResponse]:
+        response = self._build_response(messages, response_format, kwargs.get("run_response"))
+        self._sleep(self.latency_s)
+        for delta in self._deltas(response):
+            if delta.content:
+                self._sleep(self._token_delay())
+            yield delta
+
+    async def ainvoke_stream(self, messages: List[Message], assistant_message: Message = None,
+                             response_format=None, **kwargs) -> AsyncIterator[ModelResponse]:
+        response = self._build_response(messages, response_format, kwargs.get("run_response"))
+        await self._asleep(self.latency_s)
+        for delta in self._deltas(response):
+            if delta.content:
+                await self._asleep(self._token_delay())
+            yield delta
+
+    def _parse_provider_response(self, response: Any, **kwargs) -> ModelResponse:
+        return response
+
+    def _parse_provider_response_delta(self, response: Any) -> ModelResponse:
+        return response
+
+
+def use_fake_model(
+    target,
+    model_factory: Callable[[], FakeModel],
+    helper_factory: Optional[Callable[[], FakeModel]] = None,
+) -> List[FakeModel]:
+    """Swap every model reachable from an Agent or Team for a fresh fake.
+
+    Covers the agent/team model and team members (`model_factory`) and the
+    memory manager's model (`helper_factory`, defaulting to `model_factory`).
+    Returns the fakes so their counters can be read afterwards.
+    """
+    helper_factory = helper_factory or model_factory
+    fakes = []
+
+    def swap(obj):
+        if getattr(obj, "model", None) is not None:
+            obj.model = model_factory()
+            fakes.append(obj.model)
+        memory_manager = getattr(obj, "memory_manager", None)
+        if memory_manager is not None and memory_manager.model is not None:
+            memory_manager.model = helper_factory()
+            fakes.append(memory_manager.model)
+        for member in getattr(obj, "members", None) or []:
+            swap(member)
+
+    swap(target)
+    return fakes
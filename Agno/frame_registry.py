@@ -0,0 +1,296 @@
+"""
+frame_registry.py
+-----------------
+
+Process-wide, memory-bounded store for the DataFrames agents create through
+PandasTools.
+
+Stock PandasTools keeps every DataFrame in a plain dict on the toolkit
+instance. Under AgentOS one instance serves every session, so frames pile up
+without limit, and sessions can also see each other's frames. The registry
+instead:
+
+    - names frames per session: (session_id, dataframe_name) -> content hash
+    - stores each distinct content once, however many sessions hold it, and
+      reuses the result of identical loads (same function, same parameters)
+      without running them again
+    - downcasts integer columns to the smallest type that holds their values
+      and turns low-cardinality text columns into categoricals when a frame
+      is added (`optimize=False` stores frames exactly as given)
+    - keeps resident frames under `budget_bytes`, spilling least-recently-used
+      ones to compressed Arrow files in `spill_dir`. They are read back on
+      next use with the same dtypes: the agent always sees the frame it made.
+    - forgets the frames of sessions unused for `session_ttl_s`, and of the
+      least recently used sessions past `max_sessions`
+
+Frames handed out by `get` are copies (shallow under pandas copy-on-write),
+so changes made by one session never leak into the stored frame or into
+other sessions; store the changed frame again with `put`.
+
+The budget defaults to FRAME_REGISTRY_BUDGET_MB (512 MB when unset), the
+session TTL to FRAME_REGISTRY_SESSION_TTL_S (one hour when unset), and
+`optimize` to FRAME_REGISTRY_OPTIMIZE (on unless set to 0).
+"""
+
+import atexit
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.ipc as pa_ipc
+from agno.utils.log import log_debug, log_warning
+
+from dataset_cache import shared_copy
+
+
+def frame_nbytes(frame: pd.DataFrame) -> int:
+    return int(frame.memory_usage(index=True, deep=True).sum())
+
+
+def content_hash(frame: pd.DataFrame) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(repr([(str(c), str(t)) for c, t in frame.dtypes.items()]).encode())
+    digest.update(pd.util.hash_pandas_object(frame, index=True).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+def optimize_dtypes(frame: pd.DataFrame, category_ratio: float = 0.5) -> pd.DataFrame:
+    """Smallest integer dtypes holding the same values, and categoricals for repetitive text columns."""
+    columns = {}
+    for name, column in frame.items():
+        if pd.api.types.is_integer_dtype(column) and not pd.api.types.is_bool_dtype(column):
+            column = pd.to_numeric(column, downcast="integer")
+        elif pd.api.types.is_object_dtype(column) or pd.api.types.is_string_dtype(column):
+            try:
+                if len(column) and column.nunique(dropna=True) <= category_ratio * len(column):
+                    column = column.astype("category")
+            except TypeError:  # unhashable values, e.g. lists
+                pass
+        columns[name] = column
+    return pd.DataFrame(columns, index=frame.index)
+
+
+@dataclass
+class _Frame:
+    nbytes: int
+    frame: Optional[pd.DataFrame] = None
+    spill_path: Optional[Path] = None
+    # (session_id, name) pairs currently pointing at this content.
+    holders: Set[Tuple[str, str]] = field(default_factory=set)
+    # File-backed frames (e.g. from dataset_cache) cost no private memory and are never spilled.
+    shared: bool = False
+    # Set when Arrow cannot hold the frame (e.g. mixed-type object columns); it then stays resident.
+    unspillable: bool = False
+
+
+class FrameRegistry:
+    def __init__(
+        self,
+        budget_bytes: Optional[int] = None,
+        spill_dir: Union[str, Path] = "tmp/frame_spill",
+        spill_compression: Optional[str] = "zstd",
+        session_ttl_s: Optional[float] = None,
+        max_sessions: int = 1024,
+        optimize: Optional[bool] = None,
+    ):
+        if budget_bytes is None:
+            budget_bytes = int(float(os.getenv("FRAME_REGISTRY_BUDGET_MB", "512")) * 2**20)
+        if session_ttl_s is None:
+            session_ttl_s = float(os.getenv("FRAME_REGISTRY_SESSION_TTL_S", "3600"))
+        if optimize is None:
+            optimize = os.getenv("FRAME_REGISTRY_OPTIMIZE", "1") != "0"
+        self.budget_bytes = budget_bytes
+        self.spill_dir = Path(spill_dir)
+        self.spill_compression = spill_compression
+        self.session_ttl_s = session_ttl_s
+        self.max_sessions = max_sessions
+        self.optimize = optimize
+        self._frames: "OrderedDict[str, _Frame]" = OrderedDict()  # least recently used first
+        self._names: Dict[Tuple[str, str], str] = {}
+        self._loads: Dict[str, str] = {}
+        self._sessions: "OrderedDict[str, float]" = OrderedDict()  # session_id -> last use, oldest first
+        self._resident_bytes = 0
+        self._lock = threading.RLock()
+        self.stats = {"hits": 0, "reloads": 0, "spills": 0, "dedup": 0, "load_reuses": 0, "expired_sessions": 0}
+        # Spill files are only meaningful to this process.
+        atexit.register(self.close)
+
+    @property
+    def resident_bytes(self) -> int:
+        return self._resident_bytes
+
+    def __contains__(self, key: Tuple[str, str]) -> bool:
+        return key in self._names
+
+    def names(self, session_id: str) -> List[str]:
+        return [name for session, name in self._names if session == session_id]
+
+    def put(self, session_id: str, name: str, frame: pd.DataFrame, shared: bool = False,
+            key: Optional[str] = None) -> str:
+        """Store `frame` as `name` for the session; returns its content key.
+
+        `key` skips hashing when the caller already knows the content's identity
+        (e.g. the dataset cache's file digest).
+        """
+        if self.optimize and not shared:
+            frame = optimize_dtypes(frame)
+        key = key or content_hash(frame)
+        with self._lock:
+            self._touch(session_id)
+            entry = self._frames.get(key)
+            if entry is None:
+                entry = _Frame(nbytes=frame_nbytes(frame), frame=frame, shared=shared)
+                self._frames[key] = entry
+                if not shared:
+                    self._resident_bytes += entry.nbytes
+            else:
+                self.stats["dedup"] += 1
+                self._frames.move_to_end(key)
+            self._bind(session_id, name, key)
+            self._evict(keep=key)
+        return key
+
+    def load(self, session_id: str, name: str, load_key: str, loader: Callable[[], pd.DataFrame]) -> str:
+        """Like put(loader()), but identical loads (same `load_key`) reuse the stored frame."""
+        with self._lock:
+            self._touch(session_id)
+            key = self._loads.get(load_key)
+            if key is not None and key in self._frames:
+                self.stats["load_reuses"] += 1
+                self._bind(session_id, name, key)
+                return key
+        key = self.put(session_id, name, loader())
+        with self._lock:
+            self._loads[load_key] = key
+        return key
+
+    def get(self, session_id: str, name: str) -> Optional[pd.DataFrame]:
+        """A private copy of the session's frame `name`, or None."""
+        with self._lock:
+            self._touch(session_id)
+            key = self._names.get((session_id, name))
+            if key is None:
+                return None
+            entry = self._frames[key]
+            self._frames.move_to_end(key)
+            if entry.frame is None:
+                entry.frame = self._read_spill(entry.spill_path)
+                self._resident_bytes += entry.nbytes
+                self.stats["reloads"] += 1
+                self._evict(keep=key)
+            else:
+                self.stats["hits"] += 1
+            return shared_copy(entry.frame)
+
+    def drop(self, session_id: str, name: str) -> None:
+        with self._lock:
+            key = self._names.pop((session_id, name), None)
+            if key is not None:
+                self._release(key, (session_id, name))
+
+    def drop_session(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            for name in self.names(session_id):
+                self.drop(session_id, name)
+
+    def expire_sessions(self, now: Optional[float] = None) -> int:
+        """Drop the sessions unused for `session_ttl_s`, and the oldest ones past `max_sessions`."""
+        now = time.monotonic() if now is None else now
+        expired = 0
+        with self._lock:
+            while self._sessions:
+                session_id, last_used = next(iter(self._sessions.items()))
+                if len(self._sessions) <= self.max_sessions and now - last_used <= self.session_ttl_s:
+                    break
+                self.drop_session(session_id)
+                expired += 1
+            self.stats["expired_sessions"] += expired
+        if expired:
+            log_debug(f"Dropped the dataframes of {expired} idle sessions")
+        return expired
+
+    def close(self) -> None:
+        """Forget every frame and delete this registry's spill files."""
+        with self._lock:
+            for entry in self._frames.values():
+                if entry.spill_path is not None:
+                    entry.spill_path.unlink(missing_ok=True)
+            self._frames.clear()
+            self._names.clear()
+            self._loads.clear()
+            self._sessions.clear()
+            self._resident_bytes = 0
+
+    def _touch(self, session_id: str) -> None:
+        now = time.monotonic()
+        self._sessions[session_id] = now
+        self._sessions.move_to_end(session_id)
+        self.expire_sessions(now)
+
+    def _bind(self, session_id: str, name: str, key: str) -> None:
+        holder = (session_id, name)
+        previous = self._names.get(holder)
+        self._names[holder] = key
+        self._frames[key].holders.add(holder)
+        if previous is not None and previous != key:
+            self._release(previous, holder)
+
+    def _release(self, key: str, holder: Tuple[str, str]) -> None:
+        entry = self._frames[key]
+        entry.holders.discard(holder)
+        if entry.holders:
+            return
+        del self._frames[key]
+        if entry.frame is not None and not entry.shared:
+            self._resident_bytes -= entry.nbytes
+        if entry.spill_path is not None:
+            entry.spill_path.unlink(missing_ok=True)
+        self._loads = {k: v for k, v in self._loads.items() if v != key}
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        for key in list(self._frames):
+            if self._resident_bytes <= self.budget_bytes:
+                return
+            entry = self._frames[key]
+            if key == keep or entry.shared or entry.unspillable or entry.frame is None:
+                continue
+            if entry.spill_path is None:
+                try:
+                    entry.spill_path = self._write_spill(key, entry.frame)
+                except (pa.ArrowException, OSError) as e:
+                    entry.unspillable = True
+                    log_warning(f"Keeping dataframe {key} in memory, spilling it failed: {e}")
+                    continue
+            entry.frame = None
+            self._resident_bytes -= entry.nbytes
+            self.stats["spills"] += 1
+            log_debug(f"Spilled dataframe {key} ({entry.nbytes} bytes)")
+
+    def _write_spill(self, key: str, frame: pd.DataFrame) -> Path:
+        self.spill_dir.mkdir(parents=True, exist_ok=True)
+        path = self.spill_dir / f"{os.getpid()}-{key}.arrow"
+        table = pa.Table.from_pandas(frame, preserve_index=True)
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        options = pa_ipc.IpcWriteOptions(compression=self.spill_compression)
+        try:
+            with pa_ipc.new_file(tmp_path, table.schema, options=options) as writer:
+                writer.write_table(table)
+            os.replace(tmp_path, path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+        return path
+
+    def _read_spill(self, path: Path) -> pd.DataFrame:
+        return pa_ipc.open_file(str(path)).read_all().to_pandas()
+
+
+default_registry = FrameRegistry()
@@ -0,0 +1,184 @@
+"""
+history_cache.py
+----------------
+
+`CachedSqliteDb`: PooledSqliteDb with a write-through LRU cache of sessions.
+
+With `add_history_to_context=True` every run starts with
+`db.get_session(...)`: SQLite reads the session row, then the JSON of all its
+runs is parsed and every run is rebuilt as a RunOutput, only to take the
+last `num_history_runs` of them. At the end of the run the session is saved
+again. `CachedSqliteDb` keeps the most recently used sessions, deserialized,
+in memory:
+
+    - `get_session` answers from the cache when it can (a hit), and otherwise
+      reads SQLite and caches the result (a miss)
+    - every session write goes to SQLite first; the session is cached only
+      once it is committed (write-through), as the database returned it, and
+      not at all if the write was refused. With group commit the cache is
+      updated by the writer thread, in commit order. Deletes and renames that
+      happened drop the session from the cache.
+    - each caller gets its own shallow copy (runs list and data dicts copied),
+      so a run appending to its session does not change the cached one or
+      another request's copy before it is saved
+    - at most `max_sessions` sessions are kept; the least recently used is
+      evicted first
+
+A whole session is cached rather than its last N runs, because saving a
+session rewrites all its runs: a trimmed session would drop the older ones on
+the next save. Sessions listed with `get_sessions` or read with
+`deserialize=False` (the AgentOS session pages) still come from SQLite.
+
+The cache belongs to one process. If another process writes the same file
+(a second AgentOS worker, a script), give it `max_sessions=0` or call
+`clear_cache()`. `stats` counts hits, misses and evictions next to
+PooledSqliteDb's counters.
+
+Usage:
+    agent_db = CachedSqliteDb(db_file="tmp/agent_storage.db", max_sessions=256)
+    ...
+    print(agent_db.cache_info())
+"""
+
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.db.base import SessionType
+from agno.session import AgentSession, TeamSession, WorkflowSession
+
+from sqlite_storage import PooledSqliteDb
+
+_SESSION_TYPES = {AgentSession: SessionType.AGENT, TeamSession: SessionType.TEAM, WorkflowSession: SessionType.WORKFLOW}
+
+
+def _detach(session):
+    """A copy of `session` that can be changed without changing `session`; runs themselves are shared."""
+    detached = copy.copy(session)
+    if getattr(session, "runs", None) is not None:
+        detached.runs = list(session.runs)
+    for name in ("session_data", "metadata", "agent_data", "team_data", "workflow_data"):
+        value = getattr(session, name, None)
+        if isinstance(value, dict):
+            setattr(detached, name, dict(value))
+    return detached
+
+
+class CachedSqliteDb(PooledSqliteDb):
+    def __init__(self, db_file: str = "agno.db", max_sessions: int = 256, **kwargs):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[str, Tuple[SessionType, Any]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._generation = 0  # bumped by every write, see get_session
+        super().__init__(db_file=db_file, **kwargs)
+        self.stats.update({"hits": 0, "misses": 0, "evictions": 0})
+
+    def _cache(self, session, read_at: Optional[int] = None) -> None:
+        session_type = _SESSION_TYPES.get(type(session))
+        if self.max_sessions <= 0 or session_type is None or not session.session_id:
+            return
+        snapshot = _detach(session)
+        with self._cache_lock:
+            if read_at is None:
+                self._generation += 1
+            elif read_at != self._generation:
+                return  # a write landed while this was being read; it may be older than the cache
+            self._sessions[session.session_id] = (session_type, snapshot)
+            self._sessions.move_to_end(session.session_id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+                self.stats["evictions"] += 1
+
+    def _cache_stored(self, stored) -> None:
+        """Cache a session as an upsert returned it (nothing if the write was refused)."""
+        if isinstance(stored, dict):
+            self._forget([stored.get("session_id")])  # serialized; read again on the next get_session
+        elif stored is not None:
+            self._cache(stored)
+
+    def _forget(self, session_ids: List[str]) -> None:
+        with self._cache_lock:
+            self._generation += 1
+            for session_id in session_ids:
+                self._sessions.pop(session_id, None)
+
+    def get_session(self, session_id: str, *args, **kwargs):
+        # (session_type, user_id, deserialize) in every SqliteDb version; session_type is optional in newer ones.
+        params = {**dict(zip(("session_type", "user_id", "deserialize"), args)), **kwargs}
+        session_type, user_id = params.get("session_type"), params.get("user_id")
+        if not params.get("deserialize", True):
+            return super().get_session(session_id, *args, **kwargs)
+        with self._cache_lock:
+            cached = self._sessions.get(session_id)
+            if cached is not None and session_type in (None, cached[0]):
+                self._sessions.move_to_end(session_id)
+                self.stats["hits"] += 1
+                session = cached[1]
+                # Same filter as the query: another user's session is not found.
+                return _detach(session) if user_id is None or session.user_id == user_id else None
+            self.stats["misses"] += 1
+            read_at = self._generation
+        session = super().get_session(session_id, *args, **kwargs)
+        # Read as another type than the cached one: answer, but keep the cached session.
+        if session is not None and cached is None:
+            self._cache(session, read_at=read_at)
+        return session
+
+    def upsert_session(self, session, deserialize: Optional[bool] = True):
+        stored = super().upsert_session(session, deserialize=deserialize)
+        if not self._group_commits():
+            # Not group-committed (with group commit, _upsert_grouped below cached it in commit order).
+            self._cache_stored(stored)
+        return stored
+
+    def _upsert_grouped(self, sessions: List[Any]) -> Dict[str, Any]:
+        stored = super()._upsert_grouped(sessions)
+        for session in stored.values():
+            self._cache_stored(session)
+        return stored
+
+    def upsert_sessions(self, sessions, *args, **kwargs):
+        stored = super().upsert_sessions(sessions, *args, **kwargs)
+        for session in stored or []:
+            self._cache_stored(session)
+        return stored
+
+    def delete_session(self, session_id: str, *args, **kwargs) -> bool:
+        deleted = super().delete_session(session_id, *args, **kwargs)
+        if deleted:  # False when not found, e.g. it belongs to another user_id
+            self._forget([session_id])
+        return deleted
+
+    def delete_sessions(self, session_ids: List[str], *args, **kwargs) -> None:
+        super().delete_sessions(session_ids, *args, **kwargs)
+        # Same filter as the delete: with a user_id, only that user's sessions are gone.
+        user_id = {**dict(zip(("user_id",), args)), **kwargs}.get("user_id")
+        with self._cache_lock:
+            cached = {session_id: self._sessions.get(session_id) for session_id in session_ids}
+        self._forget([
+            session_id for session_id, entry in cached.items()
+            if user_id is None or entry is None or entry[1].user_id == user_id
+        ])
+
+    def rename_session(self, session_id: str, *args, **kwargs):
+        renamed = super().rename_session(session_id, *args, **kwargs)
+        if renamed is not None:
+            self._forget([session_id])
+        return renamed
+
+    def clear_cache(self) -> None:
+        with self._cache_lock:
+            self._sessions.clear()
+
+    def cache_info(self) -> Dict[str, Any]:
+        with self._cache_lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                "sessions": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "hits": self.stats["hits"],
+                "misses": self.stats["misses"],
+                "evictions": self.stats["evictions"],
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+            }
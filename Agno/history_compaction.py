@@ -0,0 +1,349 @@
+"""
+history_compaction.py
+---------------------
+
+Token-budgeted chat history for long, tool-heavy sessions.
+
+With `add_history_to_context=True` and `num_history_runs=5` the agent sends
+the last five runs verbatim, whatever their size: five runs of DataFrame
+dumps from the pandas/CSV tools can be tens of thousands of input tokens,
+while everything before them is forgotten. `BudgetedAgent` assembles the
+history with a `HistoryBudget` instead:
+
+    - tool results longer than `tool_output_tokens` are cut to their head and
+      tail, with a marker saying how much was elided. The model saw the full
+      output in its own run; later runs rarely need more than its shape.
+    - the latest runs (at most `max_runs`, else the agent's
+      `num_history_runs`) are added, newest first, while they fit in
+      `max_tokens - summary_tokens`. If even the latest run does not fit, only
+      its question and final answer are kept, truncated.
+    - runs older than that are replaced by a rolling summary: one short
+      extractive digest per run (question, tools used, start of the answer),
+      computed once and stored in `session_data` under `history_digests`,
+      so it is saved with the session. The newest digests that fit in
+      `summary_tokens` are sent, oldest first, before the verbatim runs.
+      There is no model call on this path.
+
+Compacted runs are kept in a small LRU by run id, since a run does not
+change once it is finished. Each run reports what the stock history would
+have cost and what was sent, in `run_output.metadata["history_tokens"]` and
+in `HistoryBudget.stats`; `saved` can be negative for short sessions, where
+the summary adds context the stock history would have dropped.
+
+Tokens are counted with agno's `count_tokens` for the agent's model
+(tiktoken when installed, otherwise ~4 characters per token).
+
+`BudgetedAgent` only uses agno's public extension points, so it works
+across agno 2.x and 3.x: it turns the stock `add_history_to_context` off, a
+pre-hook assembles the budgeted history, and the agent's `additional_input`
+hands it to agno for that run only (agno places it where the stock history
+would go). Set `add_history_to_context` on the agent rather than per run, and
+do not run its hooks in the background, or the run has no history.
+
+Usage:
+    agent = BudgetedAgent(..., add_history_to_context=True, num_history_runs=5,
+                          history_budget=HistoryBudget(max_tokens=6000))
+"""
+
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from copy import deepcopy
+from dataclasses import dataclass
+from inspect import Parameter, signature
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from agno.agent import Agent
+from agno.models.message import Message
+from agno.run.base import RunStatus
+from agno.utils.log import log_debug
+from agno.utils.tokens import count_tokens
+
+# (agent, history, report) of the run in progress, set by BudgetedAgent's pre-hook.
+_NO_HISTORY: Tuple[Any, List[Message], Dict[str, Any]] = (None, [], {})
+_run_history: ContextVar[Tuple[Any, List[Message], Dict[str, Any]]] = ContextVar("run_history", default=_NO_HISTORY)
+DIGESTS_KEY = "history_digests"  # session_data key: [[run_id, digest], ...], oldest first
+_SKIP_STATUSES = (RunStatus.paused, RunStatus.cancelled, RunStatus.error)  # as AgentSession.get_messages
+
+
+@dataclass
+class _CompactRun:
+    messages: List[Message]  # compacted, tagged from_history
+    tokens: int  # of `messages`
+    raw_tokens: int  # of the run's messages as the stock history sends them
+
+
+def _text(message: Message) -> str:
+    content = message.content
+    return content if isinstance(content, str) else "" if content is None else str(content)
+
+
+def _clip(text: str, chars: int) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= chars else text[: chars - 1].rstrip() + "…"
+
+
+class HistoryBudget:
+    def __init__(
+        self,
+        max_tokens: int = 6000,
+        summary_tokens: int = 800,
+        tool_output_tokens: int = 400,
+        max_runs: Optional[int] = None,
+        max_digests: int = 200,
+        digest_chars: int = 300,
+        cache_runs: int = 1024,
+    ):
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        self.tool_output_tokens = tool_output_tokens
+        self.max_runs = max_runs
+        self.max_digests = max_digests
+        self.digest_chars = digest_chars
+        self.cache_runs = cache_runs
+        self.stats = {"runs": 0, "stock_tokens": 0, "history_tokens": 0, "summarized_runs": 0, "elided_outputs": 0}
+        self._runs: "OrderedDict[str, _CompactRun]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __copy__(self):
+        return self  # shared by the per-request copies AgentOS makes of an agent
+
+    def __deepcopy__(self, memo):
+        return self
+
+    # ---- per run ---------------------------------------------------------
+
+    def _count(self, messages: List[Message], model_id: str) -> int:
+        return count_tokens(messages, model_id=model_id) if messages else 0
+
+    def _elide(self, message: Message, model_id: str) -> Message:
+        text = _text(message)
+        tokens = self._count([message], model_id)
+        if message.role != "tool" or tokens <= self.tool_output_tokens:
+            return message
+        keep = max(int(len(text) * self.tool_output_tokens / tokens), 80)
+        head, tail = text[: keep * 2 // 3], text[-(keep // 3):]
+        elided = message.model_copy()
+        elided.content = f"{head}\n[... {len(text) - len(head) - len(tail)} characters of tool output elided ...]\n{tail}"
+        with self._lock:
+            self.stats["elided_outputs"] += 1
+        return elided
+
+    def _compact(self, run, skip_roles: List[str], model_id: str) -> _CompactRun:
+        with self._lock:
+            cached = self._runs.get(run.run_id)
+            if cached is not None:
+                self._runs.move_to_end(run.run_id)
+                return cached
+        raw = [
+            message
+            for message in run.messages or []
+            if not message.from_history and message.role != "system" and message.role not in skip_roles
+        ]
+        messages = []
+        for message in raw:
+            compacted = self._elide(message, model_id)
+            if compacted is message:
+                compacted = message.model_copy()
+            compacted.from_history = True
+            messages.append(compacted)
+        compact = _CompactRun(messages, self._count(messages, model_id), self._count(raw, model_id))
+        with self._lock:
+            self._runs[run.run_id] = compact
+            while len(self._runs) > self.cache_runs:
+                self._runs.popitem(last=False)
+        return compact
+
+    def _squeeze(self, compact: _CompactRun, budget: int, model_id: str) -> Tuple[List[Message], int]:
+        """The question and final answer of a run that does not fit, cut down to `budget` tokens."""
+        question = next((m for m in compact.messages if m.role == "user"), None)
+        answer = next((m for m in reversed(compact.messages) if m.role == "assistant" and _text(m)), None)
+        messages = [deepcopy(m) for m in (question, answer) if m is not None]
+        chars = max(budget, 1) * 4 // max(len(messages), 1)
+        for message in messages:
+            message.content = _clip(_text(message), chars)
+        return messages, self._count(messages, model_id)
+
+    def _digest(self, run) -> str:
+        question = next((m for m in run.messages or [] if m.role == "user" and not m.from_history), None)
+        tools = sorted({tool.tool_name for tool in run.tools or [] if getattr(tool, "tool_name", None)})
+        answer = run.content if isinstance(run.content, str) else str(run.content or "")
+        digest = f"User: {_clip(_text(question), self.digest_chars // 2)}" if question else "User: (no text)"
+        if tools:
+            digest += f" | tools: {', '.join(tools)}"
+        return digest + f" | Assistant: {_clip(answer, self.digest_chars)}"
+
+    # ---- assembly --------------------------------------------------------
+
+    def _summary(self, session, older: List[Any], model_id: str) -> Tuple[Optional[Message], int]:
+        if not older:
+            return None, 0
+        if session.session_data is None:
+            session.session_data = {}
+        digests = dict(session.session_data.get(DIGESTS_KEY) or [])
+        added = [run for run in older if run.run_id not in digests]
+        if added:
+            # Computed once per run; stored with the session when the agent saves it after this run.
+            stored = list(session.session_data.get(DIGESTS_KEY) or []) + [[r.run_id, self._digest(r)] for r in added]
+            session.session_data[DIGESTS_KEY] = stored[-self.max_digests:]
+            digests = dict(session.session_data[DIGESTS_KEY])
+        lines: List[str] = []
+        used = 0
+        for run in reversed(older):
+            digest = digests.get(run.run_id)
+            if digest is None:
+                break  # rolled out of max_digests
+            tokens = len(digest) // 4 + 1
+            if used + tokens > self.summary_tokens:
+                break
+            lines.append(f"- {digest}")
+            used += tokens
+        if not lines:
+            return None, 0
+        with self._lock:
+            self.stats["summarized_runs"] += len(lines)
+        header = f"Summary of the {len(lines)} earlier runs of this conversation (condensed, oldest first):"
+        message = Message(role="user", content=header + "\n" + "\n".join(reversed(lines)), from_history=True)
+        return message, self._count([message], model_id)
+
+    def assemble(
+        self,
+        session,
+        num_history_runs: Optional[int] = None,
+        agent_id: Optional[str] = None,
+        skip_roles: Optional[List[str]] = None,
+        model_id: str = "gpt-4o",
+    ) -> Tuple[List[Message], Dict[str, int]]:
+        """History messages for the next run of `session`, and a token report."""
+        runs = [
+            run
+            for run in session.runs or []
+            if run.parent_run_id is None
+            and getattr(run, "status", None) not in _SKIP_STATUSES
+            and (agent_id is None or getattr(run, "agent_id", None) == agent_id)
+        ]
+        limit = self.max_runs or num_history_runs or len(runs)
+        compacts = [self._compact(run, skip_roles or [], model_id) for run in runs[-limit:]]
+
+        window: List[List[Message]] = []
+        used = 0
+        budget = self.max_tokens - (self.summary_tokens if len(runs) > 1 else 0)
+        for compact in reversed(compacts):
+            if used + compact.tokens <= budget:
+                window.append([deepcopy(m) for m in compact.messages])
+                used += compact.tokens
+            elif not window:
+                squeezed, tokens = self._squeeze(compact, budget, model_id)
+                window.append(squeezed)
+                used += tokens
+            else:
+                break
+        older = runs[: len(runs) - len(window)]
+        summary, summary_used = self._summary(session, older, model_id)
+
+        history = ([summary] if summary is not None else []) + [m for messages in reversed(window) for m in messages]
+        stock = sum(compact.raw_tokens for compact in compacts[-(num_history_runs or len(compacts)):])
+        report = {
+            "stock": stock,
+            "sent": used + summary_used,
+            "saved": stock - used - summary_used,
+            "runs_verbatim": len(window),
+            "runs_summarized": len(older),
+        }
+        with self._lock:
+            self.stats["runs"] += 1
+            self.stats["stock_tokens"] += stock
+            self.stats["history_tokens"] += report["sent"]
+        return history, report
+
+    def report(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats)
+        stats["saved_tokens"] = stats["stock_tokens"] - stats["history_tokens"]
+        stats["saved_per_run"] = round(stats["saved_tokens"] / stats["runs"], 1) if stats["runs"] else 0.0
+        return stats
+
+
+def _budget_history(agent: Agent, session=None) -> None:
+    """Pre-hook of `BudgetedAgent`: assemble this run's history for `additional_input`."""
+    if not isinstance(agent, BudgetedAgent) or not agent.budgeted_history or agent.history_budget is None:
+        return
+    # Same role filter as the stock history.
+    role = agent.system_message_role
+    skip_role = role if role not in ["user", "assistant", "tool"] else None
+    history, report = agent.history_budget.assemble(
+        session,
+        num_history_runs=agent.num_history_runs,
+        agent_id=agent.id if agent.team_id is not None else None,
+        skip_roles=[skip_role] if skip_role else None,
+        model_id=agent.model.id if agent.model is not None else "gpt-4o",
+    )
+    _run_history.set((agent, history, report))
+    log_debug(
+        f"History: {report['sent']} tokens instead of {report['stock']} ({report['runs_verbatim']} runs verbatim, "
+        f"{report['runs_summarized']} summarized)"
+    )
+
+
+def _report_history(agent: Agent, run_output=None) -> None:
+    """Post-hook of `BudgetedAgent`: move the history report to the run's metadata."""
+    owner, history, report = _run_history.get()
+    if owner is not agent:
+        return
+    _run_history.set(_NO_HISTORY)
+    if run_output is None:
+        return
+    # agno copies additional_input to the run; the history is already in the session, so do not store it twice.
+    sent = {id(message) for message in history}
+    kept = [message for message in run_output.additional_input or [] if id(message) not in sent]
+    run_output.additional_input = kept or None
+    run_output.metadata = {**(run_output.metadata or {}), "history_tokens": report}
+
+
+@dataclass(init=False)
+class BudgetedAgent(Agent):
+    # Dataclass fields, so that Agent.deep_copy (used by AgentOS per request) carries them over.
+    history_budget: Optional[HistoryBudget] = None
+    budgeted_history: bool = False  # add_history_to_context as given; the stock flag is turned off
+
+    def __init__(
+        self, *args, history_budget: Optional[HistoryBudget] = None, budgeted_history: Optional[bool] = None, **kwargs
+    ):
+        if budgeted_history is None:
+            budgeted_history = bool(kwargs.get("add_history_to_context"))
+        kwargs["add_history_to_context"] = False
+        pre_hooks, post_hooks = list(kwargs.pop("pre_hooks", None) or []), list(kwargs.pop("post_hooks", None) or [])
+        # Last before the run, after any hook that rewrites the input; first after it, so later hooks see the report.
+        super().__init__(
+            *args,
+            pre_hooks=[hook for hook in pre_hooks if hook is not _budget_history] + [_budget_history],
+            post_hooks=[_report_history] + [hook for hook in post_hooks if hook is not _report_history],
+            **kwargs,
+        )
+        self.history_budget = history_budget or HistoryBudget()
+        self.budgeted_history = budgeted_history
+
+    # agno adds additional_input right after the system message, where the stock history would go. The
+    # configured messages live in _additional_input; the history is per run, so a shared agent can serve
+    # concurrent runs.
+    @property
+    def additional_input(self) -> Optional[List[Union[str, Dict, Message]]]:
+        owner, history, _ = _run_history.get()
+        configured = self.__dict__.get("_additional_input")
+        if owner is not self or not history:
+            return configured
+        return list(configured or []) + history
+
+    @additional_input.setter
+    def additional_input(self, value: Optional[List[Union[str, Dict, Message]]]) -> None:
+        self.__dict__["_additional_input"] = value
+
+
+# Agent.deep_copy in agno >=2.5 only passes the fields BudgetedAgent.__init__ names.
+BudgetedAgent.__init__.__signature__ = signature(Agent.__init__).replace(
+    parameters=[
+        *(p for p in signature(Agent.__init__).parameters.values() if p.kind is not Parameter.VAR_KEYWORD),
+        Parameter("history_budget", Parameter.KEYWORD_ONLY, default=None, annotation=Optional[HistoryBudget]),
+        Parameter("budgeted_history", Parameter.KEYWORD_ONLY, default=None, annotation=Optional[bool]),
+    ]
+)
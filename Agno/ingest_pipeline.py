@@ -0,0 +1,270 @@
+"""
+ingest_pipeline.py
+------------------
+
+Streaming parse -> chunk -> embed -> write pipeline for large documents.
+
+Reading a PDF with the stock `PDFReader` extracts the text of every page,
+then chunks and embeds all of it before anything is written, so memory grows
+with the document. `IngestPipeline` streams it instead:
+
+    - parse:  pages are extracted in a process pool, `pages_per_task` at a
+              time, with at most `window` tasks in flight. Pages come back in
+              order.
+    - chunk:  each page is chunked with the reader's chunking strategy as
+              soon as it arrives (the stock reader also chunks per page)
+    - embed:  chunks are embedded in batches of `embed_batch_size`, one
+              encode call per batch with SentenceTransformerEmbedder
+    - write:  rows are appended to the LanceDb table in bulk, by a writer
+              thread so that writes overlap with embedding
+
+At any time only the in-flight pages, one embedding batch and two pending
+appends are held in memory, whatever the size of the document. Pages are
+numbered from 1; the stock reader's detection of printed page numbers needs
+the whole document and is skipped.
+
+Other file types are read with their reader as usual and then go through the
+same embed/write stages.
+
+Usage (see knowledge_sync.py, which drives the pipeline):
+    pipeline = IngestPipeline(workers=4)
+    for document in pipeline.documents("./docs/manual.pdf", name="manual"):
+        ...
+    print(pipeline.stats.to_dict())
+"""
+
+import multiprocessing
+import os
+import queue
+import resource
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict, dataclass
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from agno.knowledge.document.base import Document
+from agno.knowledge.embedder.base import Embedder
+from agno.knowledge.reader import Reader
+from agno.knowledge.reader.reader_factory import ReaderFactory
+from agno.utils.log import log_debug
+
+_worker_pdfs: Dict[Tuple[str, int], Any] = {}
+
+
+def parse_pages(path: str, mtime_ns: int, start: int, stop: int, password: Optional[str] = None) -> List[str]:
+    """Runs in a pool worker: text of pages [start, stop). The opened PDF is kept for the next task."""
+    from pypdf import PdfReader
+
+    pdf = _worker_pdfs.get((path, mtime_ns))
+    if pdf is None:
+        _worker_pdfs.clear()
+        pdf = _worker_pdfs[(path, mtime_ns)] = PdfReader(path)
+        if pdf.is_encrypted:
+            pdf.decrypt(password or "")
+    return [pdf.pages[i].extract_text() for i in range(start, min(stop, len(pdf.pages)))]
+
+
+def page_count(path: str, password: Optional[str] = None) -> int:
+    from pypdf import PdfReader
+
+    pdf = PdfReader(path)
+    if pdf.is_encrypted:
+        pdf.decrypt(password or "")
+    return len(pdf.pages)
+
+
+def embed_batch(embedder: Embedder, texts: List[str]) -> List[Tuple[List[float], Optional[Dict]]]:
+    """Embeddings (and usage) for `texts`, in as few embedder calls as it allows."""
+    if getattr(embedder, "sentence_transformer_client", None) is not None:
+        # SentenceTransformerEmbedder.get_embedding encodes a list as one batch.
+        return [(vector, None) for vector in embedder.get_embedding(texts)]
+    return [embedder.get_embedding_and_usage(text) for text in texts]
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def _peak_rss_mib() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+@dataclass
+class PipelineStats:
+    pages: int = 0
+    chunks: int = 0
+    embedded: int = 0
+    written: int = 0
+    seconds: float = 0.0
+    peak_rss_mib: float = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["pages_per_s"] = self.pages / self.seconds if self.seconds else 0.0
+        data["chunks_per_s"] = self.chunks / self.seconds if self.seconds else 0.0
+        return data
+
+
+class BulkWriter:
+    """Appends rows to a LanceDb table in batches from a background thread.
+
+    With `upsert=True` rows are merged on the id column instead, so writing a
+    row that is already stored (e.g. retrying a failed sync) replaces it.
+    """
+
+    def __init__(self, vector_db, batch_size: int = 512, stats: Optional[PipelineStats] = None,
+                 upsert: bool = False):
+        self.vector_db = vector_db
+        self.batch_size = batch_size
+        self.upsert = upsert
+        self.stats = stats if stats is not None else PipelineStats()
+        self._rows: List[Dict[str, Any]] = []
+        self._queue: "queue.Queue[Optional[List[Dict[str, Any]]]]" = queue.Queue(maxsize=2)
+        self._error: Optional[BaseException] = None
+        self._thread = threading.Thread(target=self._run, name="lancedb-writer", daemon=True)
+        self._thread.start()
+
+    def _run(self) -> None:
+        while (rows := self._queue.get()) is not None:
+            if self._error is not None:
+                continue
+            try:
+                if self.upsert:
+                    (
+                        self.vector_db.table.merge_insert(self.vector_db._id)
+                        .when_matched_update_all()
+                        .when_not_matched_insert_all()
+                        .execute(rows)
+                    )
+                elif self.vector_db.on_bad_vectors is not None:
+                    self.vector_db.table.add(
+                        rows, on_bad_vectors=self.vector_db.on_bad_vectors, fill_value=self.vector_db.fill_value
+                    )
+                else:
+                    self.vector_db.table.add(rows)
+                self.stats.written += len(rows)
+                log_debug(f"Wrote {len(rows)} rows")
+                # Drop cached search results that predate the rows (search_cache.CachedLanceDb).
+                if hasattr(self.vector_db, "invalidate"):
+                    self.vector_db.invalidate()
+            except BaseException as e:
+                self._error = e
+
+    def add(self, rows: List[Dict[str, Any]]) -> None:
+        if self._error is not None:
+            raise self._error
+        self._rows.extend(rows)
+        while len(self._rows) >= self.batch_size:
+            self._queue.put(self._rows[: self.batch_size])
+            self._rows = self._rows[self.batch_size:]
+
+    def close(self) -> None:
+        """Write what is left and wait for every append to finish."""
+        if self._rows:
+            self._queue.put(self._rows)
+            self._rows = []
+        self._queue.put(None)
+        self._thread.join()
+        if self._error is not None:
+            raise self._error
+
+
+class IngestPipeline:
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        pages_per_task: int = 8,
+        window: Optional[int] = None,
+        embed_batch_size: int = 32,
+        write_batch_size: int = 512,
+    ):
+        self.workers = workers or min(4, os.cpu_count() or 1)
+        self.pages_per_task = pages_per_task
+        self.window = window or 2 * self.workers
+        self.embed_batch_size = embed_batch_size
+        self.write_batch_size = write_batch_size
+        self.stats = PipelineStats()
+        self._started = time.perf_counter()
+
+    def start(self) -> PipelineStats:
+        """Reset the stats; the clock runs until finish()."""
+        self.stats = PipelineStats()
+        self._started = time.perf_counter()
+        return self.stats
+
+    def finish(self) -> PipelineStats:
+        self.stats.seconds = time.perf_counter() - self._started
+        self.stats.peak_rss_mib = _peak_rss_mib()
+        return self.stats
+
+    def pages(self, path: Path, password: Optional[str] = None) -> Iterator[str]:
+        """Page texts in order, parsed ahead in the process pool."""
+        total = page_count(str(path), password)
+        if total == 0:
+            return
+        mtime_ns = path.stat().st_mtime_ns
+        if total <= self.pages_per_task or self.workers <= 1:
+            # Not worth starting worker processes for.
+            for start in range(0, total, self.pages_per_task):
+                for text in parse_pages(str(path), mtime_ns, start, start + self.pages_per_task, password):
+                    self.stats.pages += 1
+                    yield text
+            return
+        starts = iter(range(0, total, self.pages_per_task))
+        with ProcessPoolExecutor(
+            max_workers=min(self.workers, -(-total // self.pages_per_task)),
+            mp_context=multiprocessing.get_context("spawn"),
+        ) as pool:
+
+            def submit(count: int) -> None:
+                for start in islice(starts, count):
+                    in_flight.append(
+                        pool.submit(parse_pages, str(path), mtime_ns, start, start + self.pages_per_task, password)
+                    )
+
+            in_flight: deque = deque()
+            submit(self.window)
+            while in_flight:
+                texts = in_flight.popleft().result()
+                submit(1)
+                for text in texts:
+                    self.stats.pages += 1
+                    yield text
+
+    def documents(
+        self,
+        path: Path,
+        name: str,
+        reader: Optional[Reader] = None,
+        password: Optional[str] = None,
+    ) -> Iterator[Document]:
+        """Chunked documents of the file at `path`, produced as pages are parsed."""
+        path = Path(path)
+        reader = reader or ReaderFactory.get_reader_for_extension(path.suffix)
+        if path.suffix.lower() != ".pdf":
+            for document in reader.read(path, name=name):
+                self.stats.chunks += 1
+                yield document
+            return
+
+        for page_number, text in enumerate(self.pages(path, password), start=1):
+            page = Document(name=name, id=f"{name}_{page_number}", meta_data={"page": page_number}, content=text)
+            for document in reader.chunk_document(page) if reader.chunk else [page]:
+                self.stats.chunks += 1
+                yield document
+
+    def embed(self, embedder: Embedder, documents: List[Document]) -> None:
+        """Sets `embedding` and `usage` on each document, one batch call per `embed_batch_size`."""
+        for batch in batched(documents, self.embed_batch_size):
+            for document, (vector, usage) in zip(batch, embed_batch(embedder, [d.content for d in batch])):
+                document.embedding, document.usage = vector, usage
+            self.stats.embedded += len(batch)
+
+    def writer(self, vector_db, upsert: bool = False) -> BulkWriter:
+        return BulkWriter(vector_db, self.write_batch_size, self.stats, upsert=upsert)
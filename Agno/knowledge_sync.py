@@ -0,0 +1,304 @@
+"""
+knowledge_sync.py
+-----------------
+
+Incremental ingestion of a file into a `Knowledge` base backed by LanceDb.
+
+`knowledge.add_content(path=...)` parses the whole file and re-embeds every
+chunk each time it runs, i.e. on every start of the storyteller app. The PDF
+reader gives chunks random ids, so even the upsert path writes everything again.
+`KnowledgeSync` instead keeps a manifest of what is already in the vector
+table, as a row in the knowledge base's `contents_db`:
+
+    - the file's content hash. If it is unchanged and all recorded rows are
+      still present, the file is not even parsed. Otherwise only the recorded
+      rows that are actually in the table are trusted.
+    - one entry per chunk: a row id derived from the chunk's text and metadata,
+      plus a hash of the text alone.
+
+When the file did change, it is streamed through `IngestPipeline`
+(ingest_pipeline.py: pages parsed in a process pool, chunked as they arrive,
+embedded in batches and written in bulk). Then:
+
+    - unchanged chunks are left alone
+    - chunks whose text exists but whose metadata moved (e.g. new chunk
+      numbers after an insert) are rewritten with their stored vectors
+    - only chunks with new text are embedded
+    - rows for chunks that no longer exist are deleted after the new ones are
+      written, so searches never see a half-empty table
+
+Rows use the same payload layout, content id and content hash as
+`add_content`, so search, filters and content deletion in AgentOS behave the
+same. The first sync of a file that was previously added with `add_content`
+replaces those rows.
+
+Every sync, changed file or not, ends by scheduling index maintenance when
+the vector db has an index manager (lance_indexes.py).
+
+Usage:
+    report = KnowledgeSync(knowledge).sync("./docs/story_book.pdf", name="story_embeddings")
+"""
+
+import hashlib
+import json
+import time
+from dataclasses import asdict, dataclass
+from hashlib import md5
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+from agno.db.schemas.knowledge import KnowledgeRow
+from agno.knowledge.content import Content, ContentStatus
+from agno.knowledge.document.base import Document
+from agno.knowledge.knowledge import Knowledge
+from agno.knowledge.reader import Reader
+from agno.utils.log import log_info
+from agno.utils.string import generate_id
+
+from ingest_pipeline import IngestPipeline, batched
+
+MANIFEST_TYPE = "ingest_manifest"
+
+
+def _hash(data: Union[str, bytes]) -> str:
+    return hashlib.blake2b(data.encode() if isinstance(data, str) else data, digest_size=16).hexdigest()
+
+
+def file_hash(path: Union[str, Path], chunk_size: int = 1 << 20) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass
+class SyncReport:
+    content_id: str
+    parsed: bool = False
+    pages: int = 0
+    chunks: int = 0
+    kept: int = 0
+    embedded: int = 0
+    reused: int = 0  # rewritten with a stored vector
+    deleted: int = 0
+    seconds: float = 0.0
+    peak_rss_mib: float = 0.0
+
+    @property
+    def pages_per_s(self) -> float:
+        return self.pages / self.seconds if self.seconds else 0.0
+
+    @property
+    def chunks_per_s(self) -> float:
+        return self.chunks / self.seconds if self.seconds else 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {**asdict(self), "pages_per_s": self.pages_per_s, "chunks_per_s": self.chunks_per_s}
+
+
+class KnowledgeSync:
+    def __init__(self, knowledge: Knowledge, pipeline: Optional[IngestPipeline] = None):
+        if knowledge.contents_db is None:
+            raise ValueError("KnowledgeSync needs a knowledge base with a contents_db for its manifest")
+        if knowledge.vector_db is None:
+            raise ValueError("KnowledgeSync needs a knowledge base with a vector_db")
+        self.knowledge = knowledge
+        self.contents_db = knowledge.contents_db
+        self.vector_db = knowledge.vector_db
+        self.pipeline = pipeline or IngestPipeline()
+
+    def _manifest_id(self, content_id: str) -> str:
+        return f"{content_id}-manifest"
+
+    def _load_manifest(self, content_id: str) -> Optional[Dict[str, Any]]:
+        row = self.contents_db.get_knowledge_content(self._manifest_id(content_id))
+        return row.metadata if row is not None and row.type == MANIFEST_TYPE else None
+
+    def _save(self, content: Content, path: Path, manifest: Dict[str, Any]) -> None:
+        now = int(time.time())
+        existing = self.contents_db.get_knowledge_content(content.id)
+        # The file itself, as add_content would record it.
+        self.contents_db.upsert_knowledge_content(KnowledgeRow(
+            id=content.id,
+            name=content.name or "",
+            description=content.description or "",
+            metadata=content.metadata,
+            type=path.suffix,
+            size=path.stat().st_size,
+            linked_to=self.knowledge.name or "",
+            access_count=existing.access_count if existing else 0,
+            status=ContentStatus.COMPLETED,
+            status_message="",
+            created_at=existing.created_at if existing else now,
+            updated_at=now,
+        ))
+        self.contents_db.upsert_knowledge_content(KnowledgeRow(
+            id=self._manifest_id(content.id),
+            name=f"{content.name or path.name} (ingestion manifest)",
+            description=f"Chunks of {path} stored in the vector database",
+            metadata=manifest,
+            type=MANIFEST_TYPE,
+            status=ContentStatus.COMPLETED,
+            created_at=now,
+            updated_at=now,
+        ))
+
+    def _maintain_indexes(self) -> None:
+        # Rows are appended straight to the table, so the write hooks of CachedLanceDb do not see them.
+        if hasattr(self.vector_db, "maintain_indexes"):
+            self.vector_db.maintain_indexes()
+
+    def _id_filter(self, ids: List[str]) -> str:
+        return f"{self.vector_db._id} IN ({', '.join(repr(i) for i in ids)})"
+
+    def _rows_present(self, ids: List[str]) -> bool:
+        if self.vector_db.table is None:
+            return False
+        return not ids or self.vector_db.table.count_rows(self._id_filter(ids)) == len(ids)
+
+    def _present_ids(self, ids: List[str], batch_size: int = 1000) -> set:
+        present = set()
+        if self.vector_db.table is None:
+            return present
+        for batch in batched(ids, batch_size):
+            rows = (
+                self.vector_db.table.search()
+                .where(self._id_filter(batch))
+                .select([self.vector_db._id])
+                .limit(len(batch))
+                .to_list()
+            )
+            present.update(row[self.vector_db._id] for row in rows)
+        return present
+
+    def _stored_vectors(self, ids: List[str]) -> Dict[str, List[float]]:
+        if not ids:
+            return {}
+        rows = (
+            self.vector_db.table.search()
+            .where(self._id_filter(ids))
+            .select([self.vector_db._id, self.vector_db._vector_col])
+            .limit(len(ids))
+            .to_list()
+        )
+        return {row[self.vector_db._id]: list(row[self.vector_db._vector_col]) for row in rows}
+
+    def _row(self, row_id: str, document: Document, content_hash: str) -> Dict[str, Any]:
+        # Same layout as LanceDb.insert.
+        payload = {
+            "name": document.name,
+            "meta_data": document.meta_data,
+            "content": document.content,
+            "usage": document.usage,
+            "content_id": document.content_id,
+            "content_hash": content_hash,
+        }
+        return {
+            self.vector_db._id: row_id,
+            self.vector_db._vector_col: self.vector_db._prepare_vector(document.embedding),
+            "payload": json.dumps(payload),
+        }
+
+    def sync(
+        self,
+        path: Union[str, Path],
+        name: Optional[str] = None,
+        description: Optional[str] = None,
+        metadata: Optional[Dict[str, Any]] = None,
+        reader: Optional[Reader] = None,
+    ) -> SyncReport:
+        """Bring the vector table in line with the file at `path`, embedding only new chunks."""
+        start = time.perf_counter()
+        path = Path(path)
+        content = Content(name=name, description=description, path=str(path), metadata=metadata)
+        # Same identity as add_content, so the rows belong to the same content.
+        content.content_hash = self.knowledge._build_content_hash(content)
+        content.id = generate_id(content.content_hash)
+        report = SyncReport(content_id=content.id)
+
+        if self.vector_db.table is None:
+            self.vector_db.create()
+
+        manifest = self._load_manifest(content.id)
+        doc_hash = file_hash(path)
+        if manifest is not None and manifest["doc_hash"] == doc_hash and self._rows_present(list(manifest["chunks"])):
+            report.chunks = report.kept = len(manifest["chunks"])
+            report.seconds = time.perf_counter() - start
+            log_info(f"{path.name} unchanged, {report.kept} chunks already ingested")
+            self._maintain_indexes()
+            return report
+
+        if manifest is None:
+            # Rows from an earlier add_content of this file cannot be matched to chunks.
+            self.vector_db.delete_by_content_id(content.id)
+        old_chunks: Dict[str, str] = manifest["chunks"] if manifest else {}  # row id -> text hash
+        if old_chunks:
+            # The table may have lost rows the manifest lists (e.g. the lance directory was wiped while
+            # the contents db survived): only the rows still there count as kept or lend their vector.
+            present = self._present_ids(list(old_chunks))
+            old_chunks = {row_id: text for row_id, text in old_chunks.items() if row_id in present}
+
+        pipeline = self.pipeline
+        pipeline.start()
+        report.parsed = True
+        text_hashes: Dict[str, str] = {}  # row id -> text hash, for every current chunk
+        old_by_text = {text: row_id for row_id, text in old_chunks.items()}
+
+        def added() -> Iterator[Tuple[str, Document]]:
+            for document in pipeline.documents(path, name or path.name, reader):
+                document.content = document.content.replace("\x00", "\ufffd")
+                document.content_id = content.id
+                if metadata:
+                    document.meta_data.update(metadata)
+                chunk_hash = _hash(document.content + json.dumps(document.meta_data, sort_keys=True, default=str))
+                row_id = md5(f"{chunk_hash}_{content.content_hash}".encode()).hexdigest()
+                if row_id in text_hashes:
+                    continue
+                text_hashes[row_id] = _hash(document.content)
+                if row_id in old_chunks:
+                    report.kept += 1
+                else:
+                    yield row_id, document
+
+        # Upsert: a sync that failed after flushing some rows left them in the
+        # table without a manifest entry, and its retry writes them again.
+        writer = pipeline.writer(self.vector_db, upsert=True)
+        try:
+            for batch in batched(added(), pipeline.embed_batch_size):
+                # Chunks whose text is already stored under another row id reuse that vector.
+                reusable = {row_id: old_by_text.get(text_hashes[row_id]) for row_id, _ in batch}
+                vectors = self._stored_vectors(sorted({old for old in reusable.values() if old}))
+                to_embed = []
+                for row_id, document in batch:
+                    vector = vectors.get(reusable[row_id])
+                    if vector is not None:
+                        document.embedding = vector
+                        report.reused += 1
+                    else:
+                        to_embed.append(document)
+                pipeline.embed(self.vector_db.embedder, to_embed)
+                report.embedded += len(to_embed)
+                writer.add([self._row(row_id, document, content.content_hash) for row_id, document in batch])
+        finally:
+            writer.close()
+        report.chunks = len(text_hashes)
+
+        stale = [row_id for row_id in old_chunks if row_id not in text_hashes]
+        if stale:
+            self.vector_db.table.delete(self._id_filter(stale))
+            report.deleted = len(stale)
+            if hasattr(self.vector_db, "invalidate"):
+                self.vector_db.invalidate()
+
+        self._save(content, path, {"doc_hash": doc_hash, "chunks": text_hashes})
+        self._maintain_indexes()
+        stats = pipeline.finish()
+        report.pages, report.peak_rss_mib = stats.pages, stats.peak_rss_mib
+        report.seconds = time.perf_counter() - start
+        log_info(
+            f"Synced {path.name}: {report.kept} kept, {report.embedded} embedded, "
+            f"{report.reused} re-used, {report.deleted} deleted "
+            f"({report.pages_per_s:.1f} pages/s, {report.chunks_per_s:.1f} chunks/s)"
+        )
+        return report
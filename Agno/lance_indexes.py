@@ -0,0 +1,234 @@
+"""
+lance_indexes.py
+----------------
+
+Index lifecycle for the LanceDb tables behind the knowledge bases.
+
+`LanceDb` creates its tables without a vector index, so every vector search
+(and the vector half of every hybrid search) compares the query with every
+row. The FTS index is built once per process on the first keyword or hybrid
+search (with `replace=True`, i.e. rebuilt at every start) and rows added after
+that are never indexed. The `self_learning` tool makes things worse: each
+saved learning is a separate append, i.e. a separate small data file and a new
+table version. `LanceIndexManager` looks after all of it:
+
+    - vector index: built once the table has `ann_threshold` rows and
+      rebuilt when the table has grown `rebuild_growth` times since, so the
+      partitioning still fits the data. IVF_HNSW_SQ by default: IVF_PQ on its
+      own only finds about a third of the true top 10, and LanceDb's search
+      does not re-rank on the full vectors (bench_indexes.py)
+    - FTS index: created natively on `payload` when missing (the tantivy
+      variant no longer exists in recent lancedb releases), never rebuilt at
+      start-up
+    - rows not yet in an index are still searched, by brute force. Once there
+      are `reindex_rows` of them, or `compact_fragments` small data files,
+      `table.optimize()` merges the files, adds the new rows to every index
+      and drops table versions older than `cleanup_older_than`
+
+`maintain()` does whatever is due and is cheap when nothing is (a row count,
+the index list and the fragment stats). `schedule()` runs it on a background
+thread, so writes never wait for an index build; calls made while it runs are
+folded into one more pass. `CachedLanceDb(index_manager=...)` schedules it
+after every write (search_cache.py), and `KnowledgeSync` after every sync.
+
+See bench_indexes.py for recall and latency of the index types across table
+sizes.
+
+Usage:
+    vector_db = CachedLanceDb(..., index_manager=LanceIndexManager())
+    print(vector_db.index_manager.status(vector_db))
+"""
+
+import math
+import threading
+import time
+from datetime import timedelta
+from typing import Any, Dict, List, Optional
+
+from agno.utils.log import log_debug, log_info, log_warning
+from agno.vectordb.search import SearchType
+
+FTS_COLUMN = "payload"
+
+
+def num_sub_vectors(dimensions: int) -> int:
+    """PQ sub-vectors: 16 (or fewer) dimensions each, as long as they divide the vector evenly."""
+    for size in (16, 8, 4, 2):
+        if dimensions % size == 0:
+            return dimensions // size
+    return 1
+
+
+class LanceIndexManager:
+    def __init__(
+        self,
+        ann_threshold: int = 5_000,
+        index_type: str = "IVF_HNSW_SQ",
+        rebuild_growth: float = 2.0,
+        reindex_rows: int = 1_000,
+        compact_fragments: int = 16,
+        cleanup_older_than: timedelta = timedelta(hours=1),
+        fts: Optional[bool] = None,
+        max_retries: int = 3,
+    ):
+        self.ann_threshold = ann_threshold
+        self.index_type = index_type
+        self.rebuild_growth = rebuild_growth
+        self.reindex_rows = reindex_rows
+        self.compact_fragments = compact_fragments
+        self.cleanup_older_than = cleanup_older_than
+        self.fts = fts  # None: only for keyword and hybrid search
+        self.max_retries = max_retries
+        self.stats = {"ann_builds": 0, "fts_builds": 0, "optimizes": 0, "errors": 0, "seconds": 0.0}
+        self._built_rows: Optional[int] = None  # table size when the vector index was (re)built
+        self._lock = threading.Lock()  # one maintenance pass at a time
+        self._state_lock = threading.Lock()
+        self._pending = False
+        self._thread: Optional[threading.Thread] = None
+
+    def _wants_fts(self, vector_db) -> bool:
+        if self.fts is not None:
+            return self.fts
+        return vector_db.search_type in (SearchType.keyword, SearchType.hybrid)
+
+    def _indices(self, table) -> Dict[str, Any]:
+        """Index config per indexed column."""
+        return {config.columns[0]: config for config in table.list_indices()}
+
+    def _ensure_fts(self, vector_db, table, indices: Dict[str, Any], rows: int) -> bool:
+        """Create the FTS index if it is missing. Returns whether it was built."""
+        built = False
+        if self._wants_fts(vector_db) and FTS_COLUMN not in indices and rows:
+            table.create_fts_index(FTS_COLUMN, replace=True)  # native FTS, lancedb's default
+            self.stats["fts_builds"] += 1
+            built = True
+        # Otherwise the stock keyword/hybrid search rebuilds it from scratch.
+        vector_db.fts_index_exists = built or FTS_COLUMN in indices
+        return built
+
+    def ensure_fts(self, vector_db) -> None:
+        """Before the first search of the process: the FTS index only, never a (slow) vector index build."""
+        if not vector_db.exists():
+            return
+        table = vector_db.connection.open_table(name=vector_db.table_name)
+        if FTS_COLUMN in self._indices(table):
+            vector_db.fts_index_exists = True
+            return
+        with self._lock:
+            table = vector_db.connection.open_table(name=vector_db.table_name)
+            self._ensure_fts(vector_db, table, self._indices(table), table.count_rows())
+
+    def _build_vector_index(self, vector_db, table, rows: int) -> None:
+        index_type = self.index_type
+        started = time.perf_counter()
+        options: Dict[str, Any] = {}
+        if index_type.endswith("PQ"):
+            options["num_sub_vectors"] = num_sub_vectors(table.schema.field(vector_db._vector_col).type.list_size)
+        table.create_index(
+            metric=vector_db.distance.value,
+            vector_column_name=vector_db._vector_col,
+            index_type=index_type,
+            # About sqrt(rows) lists for IVF_PQ; lancedb sizes the HNSW variants by itself.
+            num_partitions=max(1, round(math.sqrt(rows))) if index_type == "IVF_PQ" else None,
+            replace=True,
+            **options,
+        )
+        self._built_rows = rows
+        self.stats["ann_builds"] += 1
+        log_info(f"Built {index_type} index on {vector_db.table_name} ({rows} rows, {time.perf_counter() - started:.1f}s)")
+
+    def maintain(self, vector_db) -> List[str]:
+        """Build, refresh or compact whatever is due. Returns what was done."""
+        if not vector_db.exists():
+            return []
+        started = time.perf_counter()
+        done: List[str] = []
+        with self._lock:
+            table = vector_db.connection.open_table(name=vector_db.table_name)
+            rows = table.count_rows()
+            indices = self._indices(table)
+
+            if self._ensure_fts(vector_db, table, indices, rows):
+                done.append("fts")
+
+            vector_index = indices.get(vector_db._vector_col)
+            if vector_index is None:
+                if rows >= self.ann_threshold:
+                    self._build_vector_index(vector_db, table, rows)
+                    done.append("ann")
+            else:
+                if self._built_rows is None:
+                    self._built_rows = table.index_stats(vector_index.name).num_indexed_rows
+                if rows >= self.rebuild_growth * max(self._built_rows, 1):
+                    self._build_vector_index(vector_db, table, rows)
+                    done.append("ann-rebuild")
+
+            unindexed = max(
+                (table.index_stats(config.name).num_unindexed_rows for config in self._indices(table).values()),
+                default=0,
+            )
+            small = table.stats()["fragment_stats"]["num_small_fragments"]
+            if unindexed >= self.reindex_rows or small >= self.compact_fragments:
+                table.optimize(cleanup_older_than=self.cleanup_older_than)
+                self.stats["optimizes"] += 1
+                done.append("optimize")
+                log_debug(f"Optimized {vector_db.table_name}: {small} small fragments, {unindexed} unindexed rows")
+        if done:
+            self.stats["seconds"] += time.perf_counter() - started
+        return done
+
+    def _run(self, vector_db) -> None:
+        failures = 0
+        while True:
+            with self._state_lock:
+                if not self._pending:
+                    self._thread = None
+                    return
+                self._pending = False
+            try:
+                self.maintain(vector_db)
+                failures = 0
+            except Exception as e:
+                # Usually a commit conflict with a concurrent write (e.g. upsert's delete); try again shortly.
+                self.stats["errors"] += 1
+                failures += 1
+                log_warning(f"Index maintenance of {vector_db.table_name} failed: {e}")
+                if failures < self.max_retries:
+                    time.sleep(0.5 * failures)
+                    with self._state_lock:
+                        self._pending = True
+
+    def schedule(self, vector_db) -> None:
+        """Run maintain() in the background; calls made while it runs are folded into one more pass."""
+        with self._state_lock:
+            self._pending = True
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, args=(vector_db,), name="lancedb-indexes", daemon=True)
+            self._thread.start()
+
+    def wait(self, timeout: Optional[float] = None) -> None:
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def status(self, vector_db) -> Dict[str, Any]:
+        """Rows, fragments and per-index coverage of the table."""
+        if not vector_db.exists():
+            return {"rows": 0, "indices": {}}
+        table = vector_db.connection.open_table(name=vector_db.table_name)
+        fragments = table.stats()["fragment_stats"]
+        indices = {}
+        for column, config in self._indices(table).items():
+            index_stats = table.index_stats(config.name)
+            indices[column] = {
+                "type": index_stats.index_type,
+                "indexed_rows": index_stats.num_indexed_rows,
+                "unindexed_rows": index_stats.num_unindexed_rows,
+            }
+        return {
+            "rows": table.count_rows(),
+            "fragments": fragments["num_fragments"],
+            "small_fragments": fragments["num_small_fragments"],
+            "indices": indices,
+        }
@@ -0,0 +1,415 @@
+"""
+learning_dedup.py
+-----------------
+
+Near-duplicate detection for saved learnings.
+
+`skip_if_exists=True` only catches a learning saved again under the same
+title. The agent paraphrases: "Tech P/E ratios typically range 20-35x" comes
+back as "P/E multiples for tech stocks are usually 20 to 35", under another
+title, and every copy takes a slot in the top 5 search results.
+`LearningDeduplicator` finds such repeats in two steps:
+
+    - lexical: a MinHash signature of the text's word 3-shingles, looked up
+      in LSH buckets held in memory, picks the stored learnings that share
+      most of its wording. Only these candidates are then compared by
+      vector, and only when there are any is the new learning embedded, so
+      the `self_learning` tool runs it before accepting a learning
+      (`lexical_duplicate`) and can tell the agent right away. Shared words
+      alone decide nothing: "Use Python 3.12 for new services" and "Do not
+      use Python 3.12 for new services" are near-identical to MinHash.
+    - semantic: when the learning queue flushes (learning_queue.py), the
+      learning's vector (already computed for the insert) is compared with
+      its nearest stored learning and with the rest of the batch.
+
+Either way, a cosine similarity of `similarity_threshold` or more between
+the two learnings' vectors is what makes a duplicate.
+
+A duplicate is then rejected (`action="reject"`) or merged into the
+learning it repeats (`action="merge"`, the default): that learning's content
+row lists the titles merged into it, so AgentOS shows how often an insight
+came up. Either way the duplicate gets no rows and no content row of its own.
+
+`compact()` applies the same test to everything already stored. It links
+every pair of learnings that are similar (by vector, all pairs, in blocks),
+keeps the longest learning of each connected group and deletes the rest in
+one delete. `start_compaction()` runs it periodically on a background
+thread.
+
+Usage:
+    dedup = LearningDeduplicator(learning_kb)
+    learnings = LearningQueue(learning_kb, dedup=dedup)
+    dedup.start_compaction(interval_s=6 * 3600)
+"""
+
+import hashlib
+import io
+import json
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+from agno.knowledge.knowledge import Knowledge
+from agno.utils.log import log_debug, log_info, log_warning
+
+from ingest_pipeline import embed_batch
+
+# The text reader may have turned the newline after the title into a space.
+_TITLE = re.compile(r"^\s*Title:.*?\bLearning:\s*", re.DOTALL)
+_WORDS = re.compile(r"[a-z0-9]+(?:[.'][a-z0-9]+)*")
+_PRIME = np.uint64((1 << 61) - 1)
+_MASK = np.uint64((1 << 32) - 1)
+
+
+def learning_text(text: str) -> str:
+    """The learning itself, without the "Title: ..." line the self_learning tool puts first."""
+    return _TITLE.sub("", text, count=1)
+
+
+def shingles(text: str, size: int = 3) -> Set[str]:
+    """Word `size`-grams of the lower-cased learning (the words themselves for very short ones)."""
+    words = _WORDS.findall(learning_text(text).lower())
+    if len(words) <= size:
+        return {" ".join(words)} if words else set()
+    return {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+class MinHasher:
+    def __init__(self, num_perm: int = 64, bands: int = 16, seed: int = 7):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        rng = np.random.default_rng(seed)
+        # h(x) = (a * x + b) mod p over 32-bit shingle hashes; a, b < 2^29 keeps a * x + b below 2^61.
+        self._a = rng.integers(1, 1 << 29, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 29, size=num_perm, dtype=np.uint64)
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+
+    def signature(self, text: str) -> np.ndarray:
+        grams = shingles(text)
+        if not grams:
+            return np.full(self.num_perm, _MASK, dtype=np.uint64)
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(g.encode(), digest_size=4).digest(), "little") for g in grams),
+            dtype=np.uint64,
+            count=len(grams),
+        )
+        return ((np.outer(hashes, self._a) + self._b) % _PRIME & _MASK).min(axis=0)
+
+    def band_keys(self, signature: np.ndarray) -> List[Tuple[int, bytes]]:
+        return [(band, signature[band * self.rows:(band + 1) * self.rows].tobytes()) for band in range(self.bands)]
+
+    @staticmethod
+    def jaccard(a: np.ndarray, b: np.ndarray) -> float:
+        """Estimated Jaccard similarity of the two shingle sets."""
+        return float(np.mean(a == b))
+
+
+@dataclass
+class Duplicate:
+    content_id: str  # the stored (or earlier in the batch) learning it repeats
+    name: str
+    score: float
+    how: str  # "lexical" or "semantic"
+
+
+@dataclass
+class CompactionReport:
+    learnings: int = 0
+    clusters: int = 0  # groups of two or more near-duplicates
+    removed: int = 0
+    seconds: float = 0.0
+
+
+@dataclass
+class _Learning:
+    name: str
+    text: str
+    row_ids: List[str] = field(default_factory=list)
+    vectors: List[Any] = field(default_factory=list)
+
+
+def unit_vector(vectors: Sequence[Any]) -> Optional[np.ndarray]:
+    """Normalised mean of a learning's chunk vectors (None if it has none)."""
+    vectors = [vector for vector in vectors if vector is not None]
+    if not vectors:
+        return None
+    vector = np.mean(np.asarray(vectors, dtype=np.float32), axis=0)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+
+class LearningDeduplicator:
+    def __init__(
+        self,
+        knowledge: Knowledge,
+        similarity_threshold: float = 0.9,
+        lexical_threshold: float = 0.7,
+        action: str = "merge",
+        minhash: Optional[MinHasher] = None,
+    ):
+        if action not in ("reject", "merge"):
+            raise ValueError(f"action must be 'reject' or 'merge', not {action!r}")
+        self.knowledge = knowledge
+        self.vector_db = knowledge.vector_db
+        self.contents_db = knowledge.contents_db
+        self.similarity_threshold = similarity_threshold
+        self.lexical_threshold = lexical_threshold
+        self.action = action
+        self.minhash = minhash or MinHasher()
+        self.stats = {"lexical": 0, "semantic": 0, "merged": 0, "rejected": 0, "compacted": 0}
+        self._lock = threading.RLock()
+        self._signatures: Optional[Dict[str, Tuple[str, np.ndarray]]] = None  # content id -> (name, signature)
+        self._vectors: Dict[str, np.ndarray] = {}  # content id -> unit vector
+        self._buckets: Dict[Tuple[int, bytes], Set[str]] = defaultdict(set)
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # Stored learnings
+
+    def _learnings(self, with_vectors: bool = False) -> Dict[str, _Learning]:
+        """Every learning in the vector table, by content id, chunks in row order."""
+        learnings: Dict[str, _Learning] = {}
+        if not self.vector_db.exists():
+            return learnings
+        table = self.vector_db.connection.open_table(name=self.vector_db.table_name)
+        columns = [self.vector_db._id, "payload"] + ([self.vector_db._vector_col] if with_vectors else [])
+        for row in table.to_arrow().select(columns).to_pylist():
+            payload = json.loads(row["payload"])
+            content_id = payload.get("content_id") or row[self.vector_db._id]
+            learning = learnings.get(content_id)
+            if learning is None:
+                learning = learnings[content_id] = _Learning(payload.get("name") or "", "")
+            learning.text = f"{learning.text}\n{payload['content']}" if learning.text else payload["content"]
+            learning.row_ids.append(row[self.vector_db._id])
+            if with_vectors:
+                learning.vectors.append(row[self.vector_db._vector_col])
+        return learnings
+
+    def _index(self, content_id: str, name: str, text: str, vector: Optional[np.ndarray]) -> None:
+        signature = self.minhash.signature(text)
+        self._signatures[content_id] = (name, signature)
+        if vector is not None:
+            self._vectors[content_id] = vector
+        for key in self.minhash.band_keys(signature):
+            self._buckets[key].add(content_id)
+
+    def _forget(self, content_id: str) -> None:
+        self._vectors.pop(content_id, None)
+        entry = self._signatures.pop(content_id, None)
+        if entry is not None:
+            for key in self.minhash.band_keys(entry[1]):
+                self._buckets[key].discard(content_id)
+
+    def _ensure_index(self) -> None:
+        if self._signatures is not None:
+            return
+        self._signatures = {}
+        self._vectors.clear()
+        self._buckets.clear()
+        for content_id, learning in self._learnings(with_vectors=True).items():
+            self._index(content_id, learning.name, learning.text, unit_vector(learning.vectors))
+        log_debug(f"Indexed {len(self._signatures)} learnings for near-duplicate checks")
+
+    # Checks
+
+    def _embed(self, text: str) -> Optional[np.ndarray]:
+        # Chunked by the text reader as the learning queue does, so it compares with the stored vectors.
+        chunks = self.knowledge._select_reader("Text").read(io.BytesIO(text.encode("utf-8", errors="replace")))
+        return unit_vector([vector for vector, _ in embed_batch(self.vector_db.embedder, [c.content for c in chunks])])
+
+    def lexical_duplicate(self, text: str, exclude: Optional[str] = None) -> Optional[Duplicate]:
+        """The stored learning `text` repeats, among those it nearly repeats word for word, if any.
+        No query; `text` is only embedded when there are such candidates."""
+        signature = self.minhash.signature(text)
+        with self._lock:
+            self._ensure_index()
+            candidates = set().union(*(self._buckets.get(key, ()) for key in self.minhash.band_keys(signature)))
+            near = {}  # content id -> (name, unit vector)
+            for content_id in candidates - {exclude}:
+                name, other = self._signatures[content_id]
+                vector = self._vectors.get(content_id)
+                if vector is not None and MinHasher.jaccard(signature, other) >= self.lexical_threshold:
+                    near[content_id] = (name, vector)
+        if not near:
+            return None
+        vector = self._embed(text)
+        if vector is None:
+            return None
+        best: Optional[Duplicate] = None
+        for content_id, (name, other) in near.items():
+            score = float(np.dot(vector, other))
+            if score >= self.similarity_threshold and (best is None or score > best.score):
+                best = Duplicate(content_id, name, score, "lexical")
+        if best is not None:
+            self.stats["lexical"] += 1
+        return best
+
+    def semantic_duplicate(
+        self, vectors: Sequence[Any], exclude: Optional[str] = None, batch: Optional[Dict[str, Tuple[str, np.ndarray]]] = None
+    ) -> Optional[Duplicate]:
+        """The stored learning (or learning of `batch`: content id -> (name, unit vector)) nearest to `vectors`,
+        if it is at least `similarity_threshold` similar."""
+        vector = unit_vector(vectors)
+        if vector is None:
+            return None
+        best: Optional[Duplicate] = None
+        for content_id, (name, other) in (batch or {}).items():
+            score = float(np.dot(vector, other))
+            if content_id != exclude and score >= self.similarity_threshold and (best is None or score > best.score):
+                best = Duplicate(content_id, name, score, "semantic")
+        if self.vector_db.exists():
+            table = self.vector_db.connection.open_table(name=self.vector_db.table_name)
+            rows = (
+                table.search(vector.tolist(), vector_column_name=self.vector_db._vector_col)
+                .metric("cosine")
+                .select(["payload"])
+                .limit(3)
+                .to_list()
+            )
+            for row in rows:
+                payload = json.loads(row["payload"])
+                score = 1.0 - float(row["_distance"])
+                content_id = payload.get("content_id")
+                if content_id and content_id != exclude and score >= self.similarity_threshold:
+                    if best is None or score > best.score:
+                        best = Duplicate(content_id, payload.get("name") or "", score, "semantic")
+                    break
+        if best is not None:
+            self.stats["semantic"] += 1
+        return best
+
+    def added(self, content_id: str, name: str, text: str, vectors: Sequence[Any]) -> None:
+        """A learning was written with chunk vectors `vectors`; later lexical checks should see it."""
+        with self._lock:
+            if self._signatures is not None:
+                self._forget(content_id)
+                self._index(content_id, name, text, unit_vector(vectors))
+
+    # Resolution
+
+    def _note_merged(self, content_id: str, names: Set[str]) -> None:
+        row = self.contents_db.get_knowledge_content(content_id) if self.contents_db is not None else None
+        if row is None or not names - {row.name}:
+            return
+        metadata = dict(row.metadata or {})
+        metadata["merged"] = sorted(set(metadata.get("merged", [])) | names - {row.name})
+        row.metadata = metadata
+        row.updated_at = int(time.time())
+        self.contents_db.upsert_knowledge_content(row)
+
+    def resolve(self, duplicate: Duplicate, name: str) -> None:
+        """Reject learning `name` as a repeat of `duplicate`, or merge it into `duplicate`."""
+        self.stats["merged" if self.action == "merge" else "rejected"] += 1
+        log_info(
+            f"Learning {name!r} repeats {duplicate.name!r} ({duplicate.how}, {duplicate.score:.2f}): "
+            + ("merged" if self.action == "merge" else "rejected")
+        )
+        if self.action == "merge":
+            self._note_merged(duplicate.content_id, {name})
+
+    # Compaction
+
+    def _similar_pairs(self, ids: List[str], vectors: np.ndarray, block: int = 1024) -> List[Tuple[int, int]]:
+        pairs = []
+        for start in range(0, len(ids), block):
+            scores = vectors[start:start + block] @ vectors.T
+            for i, j in zip(*np.nonzero(scores >= self.similarity_threshold)):
+                if start + i < j:
+                    pairs.append((start + i, int(j)))
+        return pairs
+
+    def compact(self) -> CompactionReport:
+        """Fold near-duplicate learnings into the longest learning each of them is similar to."""
+        started = time.perf_counter()
+        with self._lock:
+            learnings = self._learnings(with_vectors=True)
+            report = CompactionReport(learnings=len(learnings))
+            units = {content_id: unit_vector(learning.vectors) for content_id, learning in learnings.items()}
+            ids = [content_id for content_id, vector in units.items() if vector is not None]
+            if len(ids) < 2:
+                report.seconds = time.perf_counter() - started
+                return report
+            vectors = np.stack([units[content_id] for content_id in ids])
+            pairs = self._similar_pairs(ids, vectors)
+
+            neighbours: Dict[int, Set[int]] = defaultdict(set)
+            for a, b in pairs:
+                neighbours[a].add(b)
+                neighbours[b].add(a)
+
+            # Longest first: each learning kept absorbs the unclaimed learnings similar to it. Every
+            # removed learning is a near-duplicate of the one it is folded into, never just linked to it
+            # through a chain of others.
+            doomed_rows: List[str] = []
+            doomed: Dict[str, str] = {}  # removed content id -> kept content id
+            claimed: Set[int] = set()
+            for i in sorted(neighbours, key=lambda i: len(learnings[ids[i]].text), reverse=True):
+                if i in claimed:
+                    continue
+                members = neighbours[i] - claimed
+                if not members:
+                    continue
+                claimed.add(i)
+                claimed.update(members)
+                report.clusters += 1
+                for j in members:
+                    doomed[ids[j]] = ids[i]
+                    doomed_rows.extend(learnings[ids[j]].row_ids)
+
+            if doomed_rows:
+                table = self.vector_db.connection.open_table(name=self.vector_db.table_name)
+                table.delete(f"{self.vector_db._id} IN ({', '.join(repr(i) for i in doomed_rows)})")
+                if hasattr(self.vector_db, "invalidate"):
+                    self.vector_db.invalidate()
+                if hasattr(self.vector_db, "maintain_indexes"):
+                    self.vector_db.maintain_indexes()
+                merged: Dict[str, Set[str]] = defaultdict(set)
+                for content_id, keep in doomed.items():
+                    merged[keep].add(learnings[content_id].name)
+                    if self.contents_db is not None:
+                        # Titles merged into the removed learning now belong to the kept one.
+                        row = self.contents_db.get_knowledge_content(content_id)
+                        if row is not None:
+                            merged[keep].update((row.metadata or {}).get("merged", []))
+                        self.contents_db.delete_knowledge_content(content_id)
+                    if self._signatures is not None:
+                        self._forget(content_id)
+                for keep, names in merged.items():
+                    self._note_merged(keep, names)
+            report.removed = len(doomed)
+            self.stats["compacted"] += report.removed
+        report.seconds = time.perf_counter() - started
+        log_info(
+            f"Compacted learnings: {report.removed} of {report.learnings} removed "
+            f"from {report.clusters} groups in {report.seconds:.2f}s"
+        )
+        return report
+
+    def _compact_periodically(self, interval_s: float) -> None:
+        while not self._stop.wait(interval_s):
+            try:
+                self.compact()
+            except Exception as e:
+                log_warning(f"Learning compaction failed: {e}")
+
+    def start_compaction(self, interval_s: float = 6 * 3600) -> None:
+        """Run compact() every `interval_s` seconds on a background thread."""
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._compact_periodically, args=(interval_s,), name="learning-compaction", daemon=True
+        )
+        self._thread.start()
+
+    def stop_compaction(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
@@ -0,0 +1,338 @@
+"""
+learning_queue.py
+-----------------
+
+Write-behind ingestion of learnings for the `self_learning` tool.
+
+`learning_kb.add_content(...)` runs inside the tool call: it reads and chunks
+the text, embeds each chunk, writes the vector table and updates the content
+row (which, through `update_metadata`, rewrites the new rows once more). The
+agent's reply waits for all of it. `LearningQueue.submit()` instead:
+
+    - records the learning in `contents_db` as a PROCESSING content row that
+      carries its text, and returns. This is the durability point; from here
+      on the learning survives a crash or restart.
+    - a background thread collects submitted learnings and flushes them once
+      `max_batch` are waiting or the oldest has waited `max_delay_s`: one
+      embedding batch for all chunks, one append (merge on row id, so a
+      flush repeated after a crash does not duplicate rows), then each
+      content row is marked COMPLETED and its text dropped
+    - `close()` (registered with atexit) flushes whatever is left. Rows that
+      are still PROCESSING when a queue starts, e.g. after a crash, are queued
+      again.
+
+The queue starts at construction unless `start=False`; then `start()` does
+it, e.g. from an app lifespan so that only the serving process runs it.
+
+Learnings are chunked with the knowledge base's text reader and get the same
+content id, content hash and payload layout as `add_content`, so search and
+content deletion in AgentOS behave the same. As with `skip_if_exists=True`, a
+learning whose content (same title) is already saved is skipped. A learning
+becomes searchable once its batch is flushed, i.e. within `max_delay_s`.
+With `dedup` (learning_dedup.py), learnings that are near-duplicates of a
+stored learning or of an earlier learning in the same batch are merged or
+rejected at flush time instead of being written.
+
+Usage:
+    learnings = LearningQueue(learning_kb)
+    learnings.submit(name=title, text=content)
+"""
+
+import atexit
+import io
+import json
+import threading
+import time
+from dataclasses import dataclass, field
+from hashlib import md5
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.db.schemas.knowledge import KnowledgeRow
+from agno.knowledge.content import Content, ContentStatus, FileData
+from agno.knowledge.knowledge import Knowledge
+from agno.utils.log import log_debug, log_error, log_info, log_warning
+from agno.utils.string import generate_id
+
+from ingest_pipeline import embed_batch
+from learning_dedup import Duplicate, LearningDeduplicator, unit_vector
+
+PENDING_KEY = "pending_learning"  # content row metadata key holding the text until it is flushed
+
+
+@dataclass
+class _Pending:
+    content: Content
+    text: str
+    attempts: int = 0
+    queued_at: float = field(default_factory=time.monotonic)
+
+
+class LearningQueue:
+    def __init__(
+        self,
+        knowledge: Knowledge,
+        max_batch: int = 32,
+        max_delay_s: float = 2.0,
+        max_attempts: int = 3,
+        dedup: Optional[LearningDeduplicator] = None,
+        start: bool = True,
+    ):
+        if knowledge.contents_db is None:
+            raise ValueError("LearningQueue needs a knowledge base with a contents_db to keep pending learnings")
+        if knowledge.vector_db is None:
+            raise ValueError("LearningQueue needs a knowledge base with a vector_db")
+        self.knowledge = knowledge
+        self.contents_db = knowledge.contents_db
+        self.vector_db = knowledge.vector_db
+        self.max_batch = max_batch
+        self.max_delay_s = max_delay_s
+        self.max_attempts = max_attempts
+        self.dedup = dedup
+        self.stats = {
+            "submitted": 0, "skipped": 0, "recovered": 0, "flushed": 0, "duplicates": 0, "batches": 0, "failures": 0
+        }
+        self._pending: List[_Pending] = []
+        self._queued_ids: set = set()
+        self._busy = 0  # learnings taken by a flush that is still running
+        self._cond = threading.Condition()
+        self._closing = False
+        self._thread: Optional[threading.Thread] = None
+        if start:
+            self.start()
+
+    def start(self) -> None:
+        """Re-queue unflushed learnings and start the background thread."""
+        if self._thread is not None:
+            return
+        self._recover()
+        self._thread = threading.Thread(target=self._run, name="learning-queue", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def _content(self, name: str, text: str, description: Optional[str] = None) -> Content:
+        # Same identity as add_content(name=..., text_content=...).
+        content = Content(name=name, description=description, file_data=FileData(content=text, type="Text"))
+        content.content_hash = self.knowledge._build_content_hash(content)
+        content.id = generate_id(content.content_hash)
+        return content
+
+    def _record(
+        self, content: Content, status: ContentStatus, metadata: Optional[Dict[str, Any]] = None, status_message: str = ""
+    ) -> None:
+        now = int(time.time())
+        self.contents_db.upsert_knowledge_content(KnowledgeRow(
+            id=content.id,
+            name=content.name or "",
+            description=content.description or "",
+            metadata=metadata,
+            type="Text",
+            size=len(content.file_data.content) if content.file_data else None,
+            linked_to=self.knowledge.name or "",
+            access_count=0,
+            status=status,
+            status_message=status_message,
+            created_at=now,
+            updated_at=now,
+        ))
+
+    def _recover(self) -> None:
+        rows, _ = self.contents_db.get_knowledge_contents()
+        for row in rows:
+            if row.status != ContentStatus.PROCESSING or not row.metadata or PENDING_KEY not in row.metadata:
+                continue
+            text = row.metadata[PENDING_KEY]
+            content = self._content(row.name, text, row.description or None)
+            if content.id != row.id:
+                continue  # not written by this queue
+            self._pending.append(_Pending(content, text))
+            self._queued_ids.add(content.id)
+            self.stats["recovered"] += 1
+        if self._pending:
+            log_info(f"Re-queued {len(self._pending)} learnings that were not yet in the vector database")
+
+    def submit(self, name: str, text: str, description: Optional[str] = None) -> Optional[str]:
+        """Record the learning and queue it for embedding. Returns its content id, or None if it was skipped."""
+        content = self._content(name, text, description)
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("LearningQueue is closed")
+            if content.id in self._queued_ids:
+                self.stats["skipped"] += 1
+                return None
+        existing = self.contents_db.get_knowledge_content(content.id)
+        if existing is not None and existing.status == ContentStatus.COMPLETED:
+            log_debug(f"Learning {name!r} already saved, skipping")
+            self.stats["skipped"] += 1
+            return None
+        self._record(content, ContentStatus.PROCESSING, {PENDING_KEY: text})
+        with self._cond:
+            self._pending.append(_Pending(content, text))
+            self._queued_ids.add(content.id)
+            self.stats["submitted"] += 1
+            self._cond.notify()
+        return content.id
+
+    def _due(self) -> bool:
+        if not self._pending:
+            return False
+        if self._closing or len(self._pending) >= self.max_batch:
+            return True
+        return time.monotonic() - self._pending[0].queued_at >= self.max_delay_s
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._due():
+                    if self._closing and not self._pending:
+                        return
+                    timeout = None
+                    if self._pending:
+                        timeout = max(self.max_delay_s - (time.monotonic() - self._pending[0].queued_at), 0.0)
+                    self._cond.wait(timeout)
+                batch, self._pending = self._pending[: self.max_batch], self._pending[self.max_batch:]
+                self._busy = len(batch)
+            try:
+                self._flush(batch)
+            except Exception as e:
+                try:
+                    self._failed(batch, e)
+                except Exception as e:  # the thread must outlive it, or flush() and close() never return
+                    log_error(f"Handling a failed flush of {len(batch)} learnings failed: {e}")
+            with self._cond:
+                self._busy = 0
+                self._cond.notify_all()
+
+    def _documents(self, reader, item: _Pending):
+        documents = reader.read(io.BytesIO(item.text.encode("utf-8", errors="replace")), name=item.content.name)
+        return self.knowledge._prepare_documents_for_insert(documents, item.content.id)
+
+    def _row(self, document, content_hash: str) -> Dict[str, Any]:
+        # Same layout as LanceDb.insert; the id comes from the text, so a repeated flush overwrites the row.
+        cleaned = document.content.replace("\x00", "\ufffd")
+        payload = {
+            "name": document.name,
+            "meta_data": document.meta_data,
+            "content": cleaned,
+            "usage": document.usage,
+            "content_id": document.content_id,
+            "content_hash": content_hash,
+        }
+        return {
+            self.vector_db._id: md5(f"{md5(cleaned.encode()).hexdigest()}_{content_hash}".encode()).hexdigest(),
+            self.vector_db._vector_col: self.vector_db._prepare_vector(document.embedding),
+            "payload": json.dumps(payload),
+        }
+
+    def _deduplicate(
+        self, batch: List[_Pending], documents: Dict[int, List[Any]]
+    ) -> Tuple[List[_Pending], List[Tuple[Duplicate, _Pending]]]:
+        """The learnings of `batch` that repeat neither a stored learning nor an earlier one of the batch,
+        and the (duplicate, learning) pairs to resolve once those are written."""
+        kept: List[_Pending] = []
+        repeats: List[Tuple[Duplicate, _Pending]] = []
+        seen: Dict[str, Tuple[str, Any]] = {}  # content id -> (name, unit vector) of the kept learnings
+        for item in batch:
+            vectors = [document.embedding for document in documents[id(item)]]
+            duplicate = self.dedup.semantic_duplicate(vectors, exclude=item.content.id, batch=seen)
+            if duplicate is None:
+                kept.append(item)
+                seen[item.content.id] = (item.content.name, unit_vector(vectors))
+                continue
+            repeats.append((duplicate, item))
+        return kept, repeats
+
+    def _flush(self, batch: List[_Pending]) -> None:
+        started = time.perf_counter()
+        reader = self.knowledge._select_reader("Text")
+        documents = {id(item): self._documents(reader, item) for item in batch}
+        chunks = [document for item in batch for document in documents[id(item)]]
+        for document, (vector, usage) in zip(chunks, embed_batch(self.vector_db.embedder, [d.content for d in chunks])):
+            document.embedding, document.usage = vector, usage
+        kept, repeats = batch, []
+        if self.dedup is not None:
+            kept, repeats = self._deduplicate(batch, documents)
+        rows = [self._row(document, item.content.content_hash) for item in kept for document in documents[id(item)]]
+
+        if self.vector_db.table is None:
+            self.vector_db.create()
+        if rows:
+            (
+                self.vector_db.table.merge_insert(self.vector_db._id)
+                .when_matched_update_all()
+                .when_not_matched_insert_all()
+                .execute(rows)
+            )
+        # Rows went straight to the table: drop cached searches, let the index manager catch up.
+        if hasattr(self.vector_db, "invalidate"):
+            self.vector_db.invalidate()
+        if hasattr(self.vector_db, "maintain_indexes"):
+            self.vector_db.maintain_indexes()
+
+        for item in kept:
+            # An empty dict, not None: the upsert keeps fields that are None.
+            self._record(item.content, ContentStatus.COMPLETED, {})
+            if self.dedup is not None:
+                self.dedup.added(
+                    item.content.id, item.content.name, item.text, [document.embedding for document in documents[id(item)]]
+                )
+        # After the content rows above, which a merge into a learning of this batch annotates. A repeat's
+        # own (pending) content row goes last: until then a failed flush retries it with the rest.
+        for duplicate, item in repeats:
+            self.dedup.resolve(duplicate, item.content.name)
+            self.contents_db.delete_knowledge_content(item.content.id)
+        with self._cond:
+            self._queued_ids.difference_update(item.content.id for item in batch)
+            self.stats["flushed"] += len(kept)
+            self.stats["duplicates"] += len(repeats)
+            self.stats["batches"] += 1
+        log_debug(f"Flushed {len(kept)} learnings ({len(rows)} chunks) in {time.perf_counter() - started:.2f}s")
+
+    def _failed(self, batch: List[_Pending], error: Exception) -> None:
+        self.stats["failures"] += 1
+        retry = []
+        for item in batch:
+            item.attempts += 1
+            if item.attempts < self.max_attempts:
+                retry.append(item)
+            else:
+                log_error(f"Could not save learning {item.content.name!r}: {error}")
+                with self._cond:
+                    self._queued_ids.discard(item.content.id)
+                try:
+                    self._record(item.content, ContentStatus.FAILED, {PENDING_KEY: item.text}, status_message=str(error))
+                except Exception as e:
+                    # Still PROCESSING in the contents db, so the next start re-queues it.
+                    log_error(f"Could not mark learning {item.content.name!r} as failed: {e}")
+        if retry:
+            log_warning(f"Flushing {len(batch)} learnings failed, retrying: {error}")
+            time.sleep(min(0.5 * retry[0].attempts, 5.0))
+            with self._cond:
+                self._pending[:0] = retry
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Write everything queued so far and wait for it. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            for item in self._pending:
+                item.queued_at = 0.0  # due now
+            self._cond.notify_all()
+            while self._pending or self._busy:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Flush what is left and stop the background thread."""
+        with self._cond:
+            if self._closing or self._thread is None:
+                return
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        atexit.unregister(self.close)
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._pending) + self._busy
@@ -0,0 +1,234 @@
+"""
+memory_index.py
+---------------
+
+Top-k retrieval of user memories for the system prompt.
+
+With `add_memories_to_context`, every run loads ALL of the user's memories
+from the memories table and writes every one of them into the system
+message. A user with hundreds of memories pays for all of them on every
+turn, relevant or not. `IndexedMemoryManager` answers the agent's
+`get_user_memories(user_id)` during a run with only the `top_k` memories
+most relevant to the current message:
+
+    - `memory_query_hook`, an agent pre-hook, hands the run's input to the
+      manager. Only the next lookup in that run (the one that builds the
+      system message) is ranked; `agent.get_user_memories(...)` outside a run
+      still returns every memory.
+    - `MemoryIndex` keeps one in-memory index per user over the memories
+      table: a matrix of normalised embeddings plus an inverted index of the
+      words in each memory. The score is cosine similarity plus
+      `lexical_weight` times the share of the query's words the memory
+      contains (hybrid), and the best `top_k` are returned in their stored
+      order. Users with at most `top_k` memories get all of them, unranked.
+    - before each search one aggregate query (count, latest updated_at,
+      total length of the user's memories) tells whether the memories
+      changed. Only then are they reloaded, and only new or edited memories
+      are embedded, in one batch. With CachedSentenceTransformerEmbedder
+      (embedding_cache.py) these embeddings are also cached on disk, so a
+      restart re-embeds nothing.
+
+The indexes of the `max_users` most recently served users are kept.
+
+See bench_memory.py for retrieval latency and prompt size up to 10k
+memories.
+
+Usage:
+    memory_manager = IndexedMemoryManager(model=..., db=agent_db, top_k=10)
+    agent = Agent(..., memory_manager=memory_manager, pre_hooks=[memory_query_hook])
+"""
+
+import re
+import threading
+from collections import OrderedDict
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from agno.db.base import UserMemory
+from agno.knowledge.embedder.base import Embedder
+from agno.memory.manager import MemoryManager
+from agno.run.agent import RunInput
+from agno.utils.log import log_debug
+from sqlalchemy import func, select
+
+from ingest_pipeline import embed_batch
+
+_query: ContextVar[Optional[str]] = ContextVar("memory_query", default=None)
+
+_STOPWORDS = frozenset(
+    "the and for are but not you your with this that have has had was were what when where which who how why "
+    "can could would should will about from into over than then them they their there these those its it's "
+    "our out all any some more most very just also like".split()
+)
+
+
+def words(text: str) -> Set[str]:
+    return {w for w in re.findall(r"[a-z0-9]+", text.lower()) if len(w) > 2 and w not in _STOPWORDS}
+
+
+def memory_query_hook(run_input: RunInput) -> None:
+    """Agent pre-hook: rank this run's memory lookup against the run's input."""
+    _query.set(run_input.input_content_string())
+
+
+@dataclass
+class _UserIndex:
+    version: Tuple = ()
+    memories: List[UserMemory] = field(default_factory=list)
+    texts: Dict[str, str] = field(default_factory=dict)  # memory_id -> text the vector was made from
+    vectors: Optional[np.ndarray] = None  # (n, d), rows normalised, in the order of `memories`
+    postings: Dict[str, np.ndarray] = field(default_factory=dict)  # word -> rows containing it
+
+
+class MemoryIndex:
+    def __init__(
+        self,
+        db,
+        embedder: Optional[Embedder] = None,
+        top_k: int = 10,
+        lexical_weight: float = 0.3,
+        max_users: int = 256,
+    ):
+        self.db = db
+        self.embedder = embedder
+        self.top_k = top_k
+        self.lexical_weight = lexical_weight
+        self.max_users = max_users
+        self.stats = {"searches": 0, "refreshes": 0, "embedded": 0, "reused": 0}
+        self._users: "OrderedDict[str, _UserIndex]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _version(self, user_id: str) -> Tuple:
+        table = self.db._get_table(table_type="memories")
+        if table is None:
+            return (0,)
+        query = select(
+            func.count(), func.max(table.c.updated_at), func.total(func.length(table.c.memory))
+        ).where(table.c.user_id == user_id)
+        with self.db.Session() as sess:
+            return tuple(sess.execute(query).one())
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray([vector for vector, _ in embed_batch(self.embedder, texts)], dtype=np.float32)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.where(norms == 0, 1, norms)
+
+    def _refresh(self, user_id: str, previous: Optional[_UserIndex], version: Tuple) -> _UserIndex:
+        memories = [m for m in self.db.get_user_memories(user_id=user_id) or [] if m.memory_id and m.memory]
+        index = _UserIndex(version=version, memories=memories)
+        if self.embedder is not None and memories:
+            # Rows of the previous index whose text is unchanged keep their vector.
+            old_rows = {}
+            if previous is not None and previous.vectors is not None:
+                old_rows = {m.memory_id: row for row, m in enumerate(previous.memories)}
+            reuse, fresh = [], []
+            for row, memory in enumerate(memories):
+                old = old_rows.get(memory.memory_id)
+                if old is not None and previous.texts.get(memory.memory_id) == memory.memory:
+                    reuse.append((row, old))
+                else:
+                    fresh.append(row)
+            dimensions = previous.vectors.shape[1] if reuse else None
+            embedded = self._embed([memories[row].memory for row in fresh]) if fresh else None
+            dimensions = dimensions or embedded.shape[1]
+            index.vectors = np.zeros((len(memories), dimensions), dtype=np.float32)
+            for row, old in reuse:
+                index.vectors[row] = previous.vectors[old]
+            if fresh:
+                index.vectors[fresh] = embedded
+            index.texts = {m.memory_id: m.memory for m in memories}
+            self.stats["embedded"] += len(fresh)
+            self.stats["reused"] += len(reuse)
+        postings: Dict[str, List[int]] = {}
+        for row, memory in enumerate(memories):
+            for word in words(memory.memory):
+                postings.setdefault(word, []).append(row)
+        index.postings = {word: np.asarray(rows, dtype=np.int64) for word, rows in postings.items()}
+        self.stats["refreshes"] += 1
+        log_debug(f"Memory index for {user_id}: {len(memories)} memories")
+        return index
+
+    def _index(self, user_id: str) -> _UserIndex:
+        version = self._version(user_id)
+        with self._lock:
+            index = self._users.get(user_id)
+            if index is None or index.version != version:
+                index = self._users[user_id] = self._refresh(user_id, index, version)
+            self._users.move_to_end(user_id)
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+            return index
+
+    def search(self, user_id: str, query: str, top_k: Optional[int] = None) -> List[UserMemory]:
+        """The `top_k` memories of `user_id` most relevant to `query`, in stored order."""
+        top_k = top_k or self.top_k
+        index = self._index(user_id)
+        self.stats["searches"] += 1
+        memories = index.memories
+        if len(memories) <= top_k:
+            return list(memories)
+        scores = np.zeros(len(memories), dtype=np.float32)
+        if index.vectors is not None:
+            scores += index.vectors @ self._embed([query])[0]
+        query_words = words(query)
+        if query_words:
+            hits = np.zeros(len(memories), dtype=np.float32)
+            for word in query_words:
+                rows = index.postings.get(word)
+                if rows is not None:
+                    hits[rows] += 1
+            scores += self.lexical_weight * hits / len(query_words)
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        return [memories[row] for row in sorted(best)]
+
+    def forget(self, user_id: Optional[str] = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._users.clear()
+            else:
+                self._users.pop(user_id, None)
+
+
+class IndexedMemoryManager(MemoryManager):
+    def __init__(
+        self,
+        *args,
+        embedder: Optional[Embedder] = None,
+        top_k: int = 10,
+        lexical_weight: float = 0.3,
+        **kwargs,
+    ):
+        super().__init__(*args, **kwargs)
+        if embedder is None:
+            from embedding_cache import CachedSentenceTransformerEmbedder
+
+            embedder = CachedSentenceTransformerEmbedder()
+        self.embedder = embedder
+        self.top_k = top_k
+        self.lexical_weight = lexical_weight
+        self._memory_index: Optional[MemoryIndex] = None
+
+    @property
+    def memory_index(self) -> MemoryIndex:
+        # Built on first use: the agent may only assign its db to the manager after __init__.
+        if self._memory_index is None or self._memory_index.db is not self.db:
+            self._memory_index = MemoryIndex(
+                self.db, embedder=self.embedder, top_k=self.top_k, lexical_weight=self.lexical_weight
+            )
+        return self._memory_index
+
+    def get_user_memories(self, user_id: Optional[str] = None) -> Optional[List[UserMemory]]:
+        query = _query.get()
+        if query is None or self.db is None:
+            return super().get_user_memories(user_id=user_id)
+        _query.set(None)  # only the lookup for this run's system message is ranked
+        return self.memory_index.search(user_id or "default", query)
+
+    async def aget_user_memories(self, user_id: Optional[str] = None) -> Optional[List[UserMemory]]:
+        query = _query.get()
+        if query is None or self.db is None:
+            return await super().aget_user_memories(user_id=user_id)
+        _query.set(None)
+        return self.memory_index.search(user_id or "default", query)
@@ -0,0 +1,241 @@
+"""
+memory_worker.py
+----------------
+
+Debounced, batched user-memory extraction outside the agent run.
+
+With `enable_user_memories=True` the agent starts `MemoryManager`'s
+extraction call alongside every run and waits for it before returning:
+each turn costs a second model call and the response is only as fast as the
+slower of the two. `MemoryWorker` takes extraction off that path:
+
+    - the agent runs with `enable_user_memories=False` (memories are still
+      added to the context, since it keeps its `memory_manager`) and
+      `post_hooks=[worker.post_hook]`, which queues the run's user messages
+      under its user_id and returns at once
+    - a background thread waits until a user has been quiet for
+      `debounce_s`, or their oldest queued run has waited `max_wait_s`, or
+      `max_messages` are queued, and then makes ONE extraction call for all
+      of that user's queued messages, against the memories stored so far
+    - the memory tools of that call write into a buffer; the new, updated
+      and deleted memories are then written in one `upsert_memories` and one
+      `delete_user_memories` call
+
+So a chat of ten quick turns costs one extraction, not ten. Memories from a
+turn show up once its user has paused, not in the next turn. Queued runs
+are kept in memory only: `close()` (registered with atexit) extracts what is
+left, but a crash loses the pending batch; the conversation itself is still
+in the session table.
+
+Usage:
+    worker = MemoryWorker(memory_manager)
+    agent = Agent(..., memory_manager=memory_manager, post_hooks=[worker.post_hook])
+"""
+
+import atexit
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+from agno.db.base import UserMemory
+from agno.memory.manager import MemoryManager
+from agno.models.message import Message
+from agno.run.agent import RunOutput
+from agno.utils.log import log_debug, log_error, log_warning
+
+
+@dataclass
+class _UserBatch:
+    messages: List[Message] = field(default_factory=list)
+    agent_id: Optional[str] = None
+    team_id: Optional[str] = None
+    runs: int = 0
+    attempts: int = 0
+    first_at: float = field(default_factory=time.monotonic)
+    last_at: float = field(default_factory=time.monotonic)
+
+
+class _BufferedMemoryDb:
+    """Stands in for the db in MemoryManager's memory tools and collects their writes for one batch."""
+
+    def __init__(self, db):
+        self.db = db
+        self.upserts: Dict[str, UserMemory] = {}
+        self.deletes: set = set()
+
+    def upsert_user_memory(self, memory: UserMemory, deserialize: Optional[bool] = True):
+        self.deletes.discard(memory.memory_id)
+        self.upserts[memory.memory_id] = memory
+        return memory
+
+    def delete_user_memory(self, memory_id: str, user_id: Optional[str] = None) -> None:
+        self.upserts.pop(memory_id, None)
+        self.deletes.add(memory_id)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.db, name)  # reads and anything else go to the real db
+
+    def commit(self, user_id: str) -> None:
+        if self.upserts:
+            now = int(time.time())
+            for memory in self.upserts.values():
+                memory.created_at = memory.created_at or now
+            self.db.upsert_memories(list(self.upserts.values()))
+        if self.deletes:
+            self.db.delete_user_memories(list(self.deletes), user_id=user_id)
+
+
+class MemoryWorker:
+    def __init__(
+        self,
+        memory_manager: MemoryManager,
+        debounce_s: float = 20.0,
+        max_wait_s: float = 120.0,
+        max_messages: int = 40,
+        max_attempts: int = 3,
+    ):
+        self.memory_manager = memory_manager
+        self.debounce_s = debounce_s
+        self.max_wait_s = max_wait_s
+        self.max_messages = max_messages
+        self.max_attempts = max_attempts
+        self.stats = {"runs": 0, "extractions": 0, "upserts": 0, "deletes": 0, "failures": 0}
+        self._batches: Dict[str, _UserBatch] = {}
+        self._busy = 0
+        self._cond = threading.Condition()
+        self._closing = False
+        self._flushing = False
+        self._thread = threading.Thread(target=self._run, name="memory-worker", daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+
+    def __deepcopy__(self, memo):
+        return self  # Agent.deep_copy copies post_hooks; every copy must feed this one worker
+
+    def submit(
+        self,
+        user_id: Optional[str],
+        messages: List[Message],
+        agent_id: Optional[str] = None,
+        team_id: Optional[str] = None,
+    ) -> None:
+        """Queue one run's messages for `user_id`'s next extraction."""
+        messages = [m for m in messages if m.role == "user" and m.get_content_string().strip()]
+        if not messages:
+            return
+        with self._cond:
+            if self._closing:
+                raise RuntimeError("MemoryWorker is closed")
+            batch = self._batches.setdefault(user_id or "default", _UserBatch())
+            batch.messages.extend(messages)
+            batch.agent_id, batch.team_id = agent_id or batch.agent_id, team_id or batch.team_id
+            batch.runs += 1
+            batch.last_at = time.monotonic()
+            self.stats["runs"] += 1
+            self._cond.notify()
+
+    def post_hook(self, run_output: RunOutput, user_id: Optional[str] = None) -> None:
+        """Agent post-hook: queue the user messages of the run that just finished."""
+        messages = [m for m in run_output.messages or [] if not m.from_history]
+        self.submit(user_id or run_output.user_id, messages, agent_id=run_output.agent_id)
+
+    def _due_in(self, batch: _UserBatch, now: float) -> float:
+        if self._closing or self._flushing or len(batch.messages) >= self.max_messages:
+            return 0.0
+        return max(min(batch.last_at + self.debounce_s, batch.first_at + self.max_wait_s) - now, 0.0)
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while True:
+                    now = time.monotonic()
+                    waits = {user_id: self._due_in(batch, now) for user_id, batch in self._batches.items()}
+                    due = [user_id for user_id, wait in waits.items() if wait <= 0]
+                    if due:
+                        break
+                    if self._closing:
+                        return
+                    self._cond.wait(min(waits.values()) if waits else None)
+                batches = {user_id: self._batches.pop(user_id) for user_id in due}
+                self._busy = len(batches)
+            for user_id, batch in batches.items():
+                try:
+                    self._extract(user_id, batch)
+                except Exception as e:
+                    self._failed(user_id, batch, e)
+                with self._cond:
+                    self._busy -= 1
+                    self._cond.notify_all()
+
+    def _extract(self, user_id: str, batch: _UserBatch) -> None:
+        started = time.perf_counter()
+        manager = self.memory_manager
+        db = manager.db
+        stored = db.get_user_memories(user_id=user_id) or []
+        writes = _BufferedMemoryDb(db)
+        manager.create_or_update_memories(
+            messages=batch.messages,
+            existing_memories=[{"memory_id": m.memory_id, "memory": m.memory} for m in stored],
+            user_id=user_id,
+            agent_id=batch.agent_id,
+            team_id=batch.team_id,
+            db=writes,
+            update_memories=manager.update_memories,
+            add_memories=manager.add_memories,
+        )
+        writes.commit(user_id)
+        with self._cond:
+            self.stats["extractions"] += 1
+            self.stats["upserts"] += len(writes.upserts)
+            self.stats["deletes"] += len(writes.deletes)
+        log_debug(
+            f"Memories for {user_id}: {batch.runs} runs in one extraction, {len(writes.upserts)} written, "
+            f"{len(writes.deletes)} deleted in {time.perf_counter() - started:.2f}s"
+        )
+
+    def _failed(self, user_id: str, batch: _UserBatch, error: Exception) -> None:
+        with self._cond:
+            self.stats["failures"] += 1
+            batch.attempts += 1
+            if batch.attempts >= self.max_attempts:
+                log_error(f"Dropping memory extraction for {user_id} after {batch.attempts} attempts: {error}")
+                return
+            log_warning(f"Memory extraction for {user_id} failed, retrying: {error}")
+            # Runs queued meanwhile go into the same retry.
+            newer = self._batches.pop(user_id, None)
+            if newer is not None:
+                batch.messages.extend(newer.messages)
+                batch.runs += newer.runs
+            batch.first_at = batch.last_at = time.monotonic()  # retried after another debounce_s
+            self._batches[user_id] = batch
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Extract everything queued so far and wait for it. Returns False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._flushing = True
+            self._cond.notify_all()
+            try:
+                while self._batches or self._busy:
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        return False
+                    self._cond.wait(remaining)
+            finally:
+                self._flushing = False
+        return True
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """Extract what is left and stop the background thread."""
+        with self._cond:
+            if self._closing:
+                return
+            self._closing = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
+        atexit.unregister(self.close)
+
+    def __len__(self) -> int:
+        with self._cond:
+            return sum(batch.runs for batch in self._batches.values())
@@ -0,0 +1,266 @@
+"""
+search_cache.py
+---------------
+
+`CachedLanceDb`: LanceDb with a cache of search results.
+
+With `search_knowledge=True` every run searches the knowledge base, and users
+ask the same questions about the same stories over and over. Each stock
+search reopens the table, embeds the query and runs a hybrid (vector + full
+text) query. The cache keeps the fused results per query instead:
+
+    - Queries are matched after normalisation (case, whitespace, trailing
+      punctuation). With `similarity_threshold`, a query whose embedding is
+      at least that similar to a cached query's embedding also hits (same
+      limit, filters and user only). On a miss, that embedding is also the
+      one LanceDb searches with, so the query is embedded once.
+    - Invalidation is write-driven: every write made through this object
+      (insert, upsert, deletes, metadata updates, drop; i.e. everything
+      add_content and content removal do) empties the cache. Writes made
+      straight to the table (knowledge_sync.py) call `invalidate()`. Writes
+      from other processes are picked up by checking the table version at
+      most every `version_check_s` seconds.
+    - `stats` counts hits, misses and invalidations, and adds up the search
+      time saved (the original search latency minus the hit latency).
+    - With `index_manager` (lance_indexes.py), every write also schedules
+      index maintenance in the background, and the first search makes sure
+      the FTS index exists instead of letting LanceDb rebuild it.
+
+Hits copy the cached Documents, so callers can modify them.
+
+Usage:
+    vector_db = CachedLanceDb(uri=..., table_name=..., embedder=..., search_type=SearchType.hybrid)
+    vector_db = CachedLanceDb(..., index_manager=LanceIndexManager())
+"""
+
+import copy
+import functools
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from agno.knowledge.document.base import Document
+from agno.utils.log import log_debug
+from agno.vectordb.lancedb import LanceDb
+
+from lance_indexes import LanceIndexManager
+
+_SPACES = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    return _SPACES.sub(" ", query).strip().rstrip("?!.").strip().lower()
+
+
+@dataclass
+class _Entry:
+    documents: List[Document]
+    seconds: float
+    embedding: Optional[np.ndarray] = None
+
+
+class _QueryEmbedder:
+    """Stands in for the embedder during one search and answers its query with the embedding already made."""
+
+    def __init__(self, embedder, query: str, embedding):
+        self.embedder = embedder
+        self.query = query
+        self.embedding = embedding
+
+    def get_embedding(self, text):
+        return self.embedding if text == self.query else self.embedder.get_embedding(text)
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.embedder, name)
+
+
+def _invalidates(method):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self.invalidate()
+            self.maintain_indexes()
+
+    return wrapper
+
+
+def _async_invalidates(method):
+    @functools.wraps(method)
+    async def wrapper(self, *args, **kwargs):
+        try:
+            return await method(self, *args, **kwargs)
+        finally:
+            self.invalidate()
+            self.maintain_indexes()
+
+    return wrapper
+
+
+class CachedLanceDb(LanceDb):
+    insert = _invalidates(LanceDb.insert)
+    upsert = _invalidates(LanceDb.upsert)
+    drop = _invalidates(LanceDb.drop)
+    delete = _invalidates(LanceDb.delete)
+    delete_by_id = _invalidates(LanceDb.delete_by_id)
+    delete_by_name = _invalidates(LanceDb.delete_by_name)
+    delete_by_metadata = _invalidates(LanceDb.delete_by_metadata)
+    delete_by_content_id = _invalidates(LanceDb.delete_by_content_id)
+    _delete_by_content_hash = _invalidates(LanceDb._delete_by_content_hash)
+    update_metadata = _invalidates(LanceDb.update_metadata)
+    async_insert = _async_invalidates(LanceDb.async_insert)
+    async_upsert = _async_invalidates(LanceDb.async_upsert)
+    async_drop = _async_invalidates(LanceDb.async_drop)
+
+    def __init__(
+        self,
+        *args,
+        max_entries: int = 1024,
+        similarity_threshold: Optional[float] = 0.97,
+        version_check_s: float = 1.0,
+        index_manager: Optional[LanceIndexManager] = None,
+        **kwargs,
+    ):
+        self._cache: "OrderedDict[Tuple, _Entry]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self.max_entries = max_entries
+        self.similarity_threshold = similarity_threshold
+        self.version_check_s = version_check_s
+        self.index_manager = index_manager
+        self.stats = {"hits": 0, "similar_hits": 0, "misses": 0, "invalidations": 0, "saved_s": 0.0}
+        self._generation = 0  # bumped by every invalidation
+        self._version: Optional[int] = None
+        self._version_checked = 0.0
+        self._searching = threading.local()
+        super().__init__(*args, **kwargs)
+
+    @property
+    def embedder(self):
+        # During a cache miss, LanceDb's search gets the query embedding made for the cache lookup.
+        return getattr(self._searching, "embedder", None) or self._embedder
+
+    @embedder.setter
+    def embedder(self, embedder) -> None:
+        self._embedder = embedder
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def invalidate(self) -> None:
+        """Forget every cached result (the table changed)."""
+        with self._cache_lock:
+            self._generation += 1
+            if self._cache:
+                self._cache.clear()
+                self.stats["invalidations"] += 1
+
+    def maintain_indexes(self) -> None:
+        """Let the index manager, if any, build or refresh indexes in the background."""
+        if self.index_manager is not None:
+            self.index_manager.schedule(self)
+
+    def _check_version(self) -> None:
+        now = time.monotonic()
+        if now - self._version_checked < self.version_check_s:
+            return
+        self._version_checked = now
+        try:
+            version = self.connection.open_table(name=self.table_name).version
+        except Exception:
+            return
+        if self._version is not None and version != self._version:
+            log_debug(f"Table {self.table_name} changed to version {version}, clearing search cache")
+            self.invalidate()
+        self._version = version
+
+    def _key(self, query: str, limit: int, filters: Optional[Any], user_id: Optional[str], extra: Dict) -> Tuple:
+        options = repr(sorted(extra.items()))
+        return (normalize_query(query), limit, repr(filters), str(self.search_type), user_id, options)
+
+    def _similar(self, key: Tuple, embedding: np.ndarray) -> Optional[_Entry]:
+        best, best_score = None, self.similarity_threshold
+        for other, entry in self._cache.items():
+            if other[1:] != key[1:] or entry.embedding is None:
+                continue
+            score = float(np.dot(embedding, entry.embedding))
+            if score >= best_score:
+                best, best_score = entry, score
+        return best
+
+    def _copies(self, documents: List[Document]) -> List[Document]:
+        copies = []
+        for document in documents:
+            document = copy.copy(document)
+            document.meta_data = dict(document.meta_data)
+            copies.append(document)
+        return copies
+
+    def _hit(self, entry: _Entry, started: float) -> List[Document]:
+        documents = self._copies(entry.documents)
+        self.stats["saved_s"] += max(entry.seconds - (time.perf_counter() - started), 0.0)
+        return documents
+
+    def _embed(self, query: str) -> Tuple[Any, Optional[np.ndarray]]:
+        raw = self._embedder.get_embedding(query)
+        vector = np.asarray(raw, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return raw, (vector / norm if norm else None)
+
+    def search(
+        self,
+        query: str,
+        limit: int = 5,
+        filters: Optional[Any] = None,
+        user_id: Optional[str] = None,
+        **kwargs,
+    ) -> List[Document]:
+        started = time.perf_counter()
+        self._check_version()
+        key = self._key(query, limit, filters, user_id, kwargs)
+        with self._cache_lock:
+            entry = self._cache.get(key)
+            if entry is not None:
+                self._cache.move_to_end(key)
+                self.stats["hits"] += 1
+                return self._hit(entry, started)
+            has_peers = self.similarity_threshold is not None and any(k[1:] == key[1:] for k in self._cache)
+
+        # Kept with the entry so that later similar queries can match it.
+        raw, embedding = self._embed(query) if self.similarity_threshold is not None else (None, None)
+        if has_peers and embedding is not None:
+            with self._cache_lock:
+                entry = self._similar(key, embedding)
+                if entry is not None:
+                    self.stats["hits"] += 1
+                    self.stats["similar_hits"] += 1
+                    return self._hit(entry, started)
+
+        self.stats["misses"] += 1
+        if self.index_manager is not None and not self.fts_index_exists:
+            self.index_manager.ensure_fts(self)
+        generation = self._generation
+        if user_id is not None:
+            kwargs["user_id"] = user_id  # only newer LanceDb.search versions take it
+        self._searching.embedder = _QueryEmbedder(self._embedder, query, raw) if raw is not None else None
+        try:
+            documents = super().search(query=query, limit=limit, filters=filters, **kwargs)
+        finally:
+            self._searching.embedder = None
+        entry = _Entry(documents=documents, seconds=time.perf_counter() - started, embedding=embedding)
+        with self._cache_lock:
+            # A write while searching may have made the result stale; do not cache it then.
+            if self._generation == generation:
+                self._cache[key] = entry
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return self._copies(documents)
+
+    def cache_summary(self) -> Dict[str, Any]:
+        return {**self.stats, "entries": len(self._cache), "hit_rate": self.hit_rate}
@@ -0,0 +1,303 @@
+"""
+sqlite_storage.py
+-----------------
+
+`PooledSqliteDb`: SqliteDb tuned for concurrent AgentOS traffic on one file.
+
+Examples 01-04 all keep sessions, runs, memories and knowledge contents in
+`tmp/agent_storage.db`. The stock `SqliteDb(db_file=...)` opens it in rollback
+journal mode: a writer locks out every reader, every commit waits for a full
+fsync, and a transaction that starts reading and then writes can fail at once
+with "database is locked" when another one got there first. `PooledSqliteDb`
+changes how the file is used, not what is stored in it:
+
+    - WAL journal with synchronous=NORMAL, a busy timeout, a bigger page
+      cache, memory-mapped reads and in-memory temp tables. Readers no longer
+      wait for writers, and commits only append to the WAL.
+    - a bounded connection pool shared by all threads; every thread (request
+      worker, tool thread, learning queue) checks out its own connection
+      through SqliteDb's thread-scoped sessions
+    - write methods start their transaction with BEGIN IMMEDIATE, so they
+      queue for the write lock up front (honouring the busy timeout) instead
+      of failing when upgrading a read lock
+    - group commit of sessions: `upsert_session`, called at the end of every
+      run to save the session and its runs, hands the session to one writer
+      thread and waits. The writer commits everything that arrived while it
+      was busy in a single transaction (the latest version per session id),
+      so N concurrent runs cost about one commit instead of N. Each session
+      is still written by SqliteDb's own `upsert_session`, in a savepoint of
+      that transaction, so its checks (e.g. that a session of one user is not
+      overwritten for another) still apply; `upsert_sessions` skips them.
+      Callers still return only once their session is committed, with what
+      the database returned (None if it refused the write). Batching needs
+      callers on several threads: agno's async runs (`arun`, AgentOS) call
+      the synchronous `upsert_session` on the event loop, where waiting for
+      the writer would only block the loop, so those calls write inline.
+      Asyncio code of our own can await `aupsert_session` instead, which
+      joins the group commit without blocking the loop.
+    - "database is locked"/"busy" errors that still get through are retried
+      with exponential backoff and jitter
+
+The database id stays the one `SqliteDb(db_file=...)` would get, so AgentOS
+sees the same database. Table layout is unchanged; the file can be opened
+with SqliteDb again at any time.
+
+See bench_storage.py for writes/s and commit latency under concurrent
+sessions.
+
+Usage:
+    agent_db = PooledSqliteDb(db_file="tmp/agent_storage.db")
+"""
+
+import asyncio
+import functools
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from agno.db.sqlite import SqliteDb
+from agno.utils.log import log_debug, log_warning
+from agno.utils.string import generate_id
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import QueuePool
+
+_intent = threading.local()  # .write: the current transaction will write; .direct: bypass group commit
+
+
+def tuned_engine(
+    db_file: str,
+    pool_size: int = 8,
+    busy_timeout_s: float = 5.0,
+    cache_mib: int = 32,
+    mmap_mib: int = 256,
+) -> Engine:
+    """SQLAlchemy engine for `db_file` in WAL mode, with a connection pool and BEGIN IMMEDIATE for writes."""
+    engine = create_engine(
+        f"sqlite:///{db_file}",
+        poolclass=QueuePool,
+        pool_size=pool_size,
+        max_overflow=pool_size,
+        pool_timeout=busy_timeout_s * 2,
+        connect_args={"check_same_thread": False, "timeout": busy_timeout_s},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _configure(dbapi_connection, _record):
+        # Transactions are begun in _begin below, not implicitly by the driver.
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        for pragma in (
+            "journal_mode=WAL",
+            "synchronous=NORMAL",
+            f"busy_timeout={int(busy_timeout_s * 1000)}",
+            f"cache_size=-{cache_mib * 1024}",
+            f"mmap_size={mmap_mib * 1024 * 1024}",
+            "temp_store=MEMORY",
+            "journal_size_limit=67108864",
+        ):
+            cursor.execute(f"PRAGMA {pragma}")
+        cursor.close()
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE" if getattr(_intent, "write", False) else "BEGIN")
+
+    return engine
+
+
+def _on_event_loop() -> bool:
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return False
+    return True
+
+
+def is_busy(error: BaseException) -> bool:
+    message = str(getattr(error, "orig", None) or error).lower()
+    return isinstance(error, (OperationalError, sqlite3.OperationalError)) and (
+        "locked" in message or "busy" in message
+    )
+
+
+def _retrying(method, write: bool):
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        previous = getattr(_intent, "write", False)
+        _intent.write = write or previous
+        try:
+            for attempt in range(self.max_retries + 1):
+                try:
+                    return method(self, *args, **kwargs)
+                except Exception as e:
+                    if attempt == self.max_retries or not is_busy(e):
+                        raise
+                    delay = min(self.retry_base_s * 2 ** attempt, 1.0) * (0.5 + random.random())
+                    self.stats["retries"] += 1
+                    log_debug(f"{method.__name__}: database busy, retrying in {delay * 1000:.0f} ms")
+                    time.sleep(delay)
+        finally:
+            _intent.write = previous
+
+    return wrapper
+
+
+def _writes(method):
+    return _retrying(method, write=True)
+
+
+def _reads(method):
+    return _retrying(method, write=False)
+
+
+# SqliteDb methods wrapped by PooledSqliteDb; those a given agno version lacks are skipped.
+_WRITE_METHODS = (
+    "upsert_sessions", "delete_session", "delete_sessions", "rename_session",
+    "upsert_user_memory", "upsert_memories", "delete_user_memory", "delete_user_memories", "clear_memories",
+    "calculate_metrics", "upsert_knowledge_content", "delete_knowledge_content", "create_eval_run",
+    "upsert_trace", "create_span", "create_spans", "upsert_cultural_knowledge", "upsert_learning",
+)
+_READ_METHODS = (
+    "get_session", "get_sessions", "get_user_memory", "get_user_memories",
+    "get_knowledge_content", "get_knowledge_contents",
+)
+
+
+class PooledSqliteDb(SqliteDb):
+    _upsert_session = _writes(SqliteDb.upsert_session)
+
+    def __init__(
+        self,
+        db_file: str = "agno.db",
+        pool_size: int = 8,
+        busy_timeout_s: float = 5.0,
+        group_commit: bool = True,
+        max_batch: int = 64,
+        max_retries: int = 6,
+        retry_base_s: float = 0.01,
+        id: Optional[str] = None,
+        **kwargs,
+    ):
+        db_path = Path(db_file).resolve()
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_retries = max_retries
+        self.retry_base_s = retry_base_s
+        self.max_batch = max_batch
+        # retries: busy errors retried; commits: group commits; grouped: sessions written by them.
+        self.stats = {"retries": 0, "commits": 0, "grouped": 0}
+        super().__init__(
+            db_engine=tuned_engine(str(db_path), pool_size=pool_size, busy_timeout_s=busy_timeout_s),
+            # The id SqliteDb(db_file=...) gets, so AgentOS sees the same database.
+            id=id or generate_id("sqlite:///agno.db"),
+            **kwargs,
+        )
+        self.db_file = str(db_path)
+        self._commits: Optional["queue.Queue[Optional[Tuple[Any, Future]]]"] = None  # None: stop
+        if group_commit:
+            self._commits = queue.Queue()
+            self._writer = threading.Thread(target=self._write_sessions, name="sqlite-group-commit", daemon=True)
+            self._writer.start()
+
+    def _group_commits(self) -> bool:
+        """Whether an upsert_session on this thread goes through the writer thread."""
+        return self._commits is not None and not getattr(_intent, "direct", False) and not _on_event_loop()
+
+    def upsert_session(self, session, deserialize: Optional[bool] = True):
+        if not self._group_commits():
+            return self._upsert_session(session, deserialize=deserialize)
+        future: Future = Future()
+        self._commits.put((session, future))
+        stored = future.result()
+        return stored if deserialize or stored is None else stored.to_dict()
+
+    async def aupsert_session(self, session, deserialize: Optional[bool] = True):
+        """upsert_session for asyncio callers: joins the group commit and awaits it without blocking the loop."""
+        if self._commits is None:
+            return await asyncio.get_running_loop().run_in_executor(
+                None, functools.partial(self.upsert_session, session, deserialize=deserialize)
+            )
+        future: Future = Future()
+        self._commits.put((session, future))
+        stored = await asyncio.wrap_future(future)
+        return stored if deserialize or stored is None else stored.to_dict()
+
+    @_writes
+    def _upsert_grouped(self, sessions: List[Any]) -> Dict[str, Any]:
+        """Upsert `sessions` in one transaction, each through SqliteDb.upsert_session; session id -> result."""
+        self._get_table(table_type="sessions", create_table_if_not_found=True)  # DDL outside the transaction
+        stored: Dict[str, Any] = {}
+        with self.db_engine.connect() as connection, connection.begin():
+            # upsert_session's own transactions become savepoints of this one.
+            self.Session.registry.set(Session(bind=connection, join_transaction_mode="create_savepoint"))
+            # This transaction holds the write lock; other connections opened meanwhile (schema checks) only read.
+            _intent.write = False
+            try:
+                for session in sessions:
+                    stored[session.session_id] = SqliteDb.upsert_session(self, session, deserialize=True)
+            finally:
+                _intent.write = True
+                self.Session.remove()
+        return stored
+
+    def _write_sessions(self) -> None:
+        _intent.direct = True  # nothing the writer calls may queue a session on itself
+        stopping = False
+        while not stopping:
+            batch = []
+            item = self._commits.get()
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= self.max_batch:
+                    break
+                try:
+                    item = self._commits.get_nowait()
+                except queue.Empty:
+                    break
+            stopping = item is None
+            if not batch:
+                continue
+            latest: Dict[str, Any] = {}
+            for session, _ in batch:
+                latest[session.session_id] = session  # later versions of a session replace earlier ones
+            try:
+                stored = self._upsert_grouped(list(latest.values()))
+            except BaseException as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.stats["commits"] += 1
+            self.stats["grouped"] += len(batch)
+            for session, future in batch:
+                future.set_result(stored[session.session_id])
+
+    def close(self) -> None:
+        if self._commits is not None and self._writer.is_alive():
+            # Sessions queued before this are written before the engine goes away.
+            self._commits.put(None)
+            self._writer.join()
+        super().close()
+
+    def checkpoint(self) -> List[int]:
+        """Fold the WAL back into the database file; returns (busy, wal pages, checkpointed pages)."""
+        with self.db_engine.connect() as connection:
+            try:
+                return list(connection.exec_driver_sql("PRAGMA wal_checkpoint(TRUNCATE)").fetchone())
+            except OperationalError as e:
+                log_warning(f"WAL checkpoint failed: {e}")
+                return []
+
+
+for _name in _WRITE_METHODS:
+    if hasattr(SqliteDb, _name):
+        setattr(PooledSqliteDb, _name, _writes(getattr(SqliteDb, _name)))
+for _name in _READ_METHODS:
+    if hasattr(SqliteDb, _name):
+        setattr(PooledSqliteDb, _name, _reads(getattr(SqliteDb, _name)))
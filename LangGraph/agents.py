@@ -1,17 +1,43 @@
-from dotenv import load_dotenv
+import argparse
+import os
+from functools import cache
 from typing import Annotated, Literal
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langchain_google_genai import ChatGoogleGenerativeAI
+from langchain_core.messages import RemoveMessage
+from langchain_core.runnables import RunnableLambda
 from pydantic import BaseModel, Field
 from typing_extensions import TypedDict
-from IPython.display import Image, display
+from classifier import CentroidClassifier
 
-load_dotenv()
+# The Gemini client, the classifiers and the compiled graph are all created
+# on first use rather than at import, so importing this module (for tests,
+# batch jobs or the server) stays cheap. `from agents import llm, graph`
+# still works through the module-level __getattr__ at the bottom.
+_llm = None
+_classifier_llm = None
 
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash"
-)
+def get_llm():
+    global _llm
+    if _llm is None:
+        from dotenv import load_dotenv
+        from langchain_google_genai import ChatGoogleGenerativeAI
+
+        load_dotenv()
+        _llm = ChatGoogleGenerativeAI(
+            model="gemini-2.5-flash"
+        )
+    return _llm
+
+def set_llm(model, classifier=None):
+    """Swap the chat model, e.g. for an offline stand-in.
+
+    `classifier` overrides the structured-output classifier; by default it is
+    rebuilt from `model` on next use.
+    """
+    global _llm, _classifier_llm
+    _llm = model
+    _classifier_llm = classifier
 
 class MessageClassifier(BaseModel):
     message_type: Literal["emotional", "logical"] = Field(
@@ -22,22 +48,61 @@ class MessageClassifier(BaseModel):
 class State(TypedDict):
     messages: Annotated[list, add_messages]
     message_type: str | None
+    next: str | None
+
+CLASSIFIER_PROMPT = """Classify the user message as either:
+            - 'emotional': if it asks for emotional support, therapy, deals with feeling or personal problems
+            - 'logical': if it asks for facts, information, logical analysis, or practical solutions"""
+
+# Built once and reused on every turn instead of being rebuilt per call.
+def get_classifier_llm():
+    global _classifier_llm
+    if _classifier_llm is None:
+        _classifier_llm = get_llm().with_structured_output(MessageClassifier)
+    return _classifier_llm
+
+@cache  # fitting and calibrating embeds every example, so do it once
+def get_local_classifier() -> CentroidClassifier:
+    return CentroidClassifier()
+
+def _classifier_messages(text: str) -> list[dict]:
+    return [
+        {"role":"system","content":CLASSIFIER_PROMPT},
+        {"role":"user","content":text}
+    ]
+
+def classify_with_llm(text: str, config=None) -> str:
+    return get_classifier_llm().invoke(_classifier_messages(text), config=config).message_type
+
+async def aclassify_with_llm(text: str, config=None) -> str:
+    result = await get_classifier_llm().ainvoke(_classifier_messages(text), config=config)
+    return result.message_type
+
+def route_message(text: str) -> tuple[str, bool]:
+    """Return (message_type, used_llm_fallback) for a single message."""
+    message_type = get_local_classifier().classify(text)
+    if message_type is not None:
+        return message_type, False
+    return classify_with_llm(text), True
 
 def classify_message(state: State):
+    # Batch runs pre-classify messages in bulk and pass the label in.
+    if state.get("message_type"):
+        return {"message_type":state["message_type"]}
+
     last_message = state["messages"][-1]
-    classifier_llm = llm.with_structured_output(MessageClassifier)
+    message_type, _ = route_message(last_message.content)
+    return {"message_type":message_type}
 
-    result = classifier_llm.invoke([
-        {
-            "role":"system",
-            "content":"""Classify the user message as either:
-            - 'emotional': if it asks for emotional support, therapy, deals with feeling or personal problems
-            - 'logical': if it asks for facts, information, logical analysis, or practical solutions"""
-        },
-        {"role":"user","content":last_message.content}
-    ])
+async def aclassify_message(state: State):
+    if state.get("message_type"):
+        return {"message_type":state["message_type"]}
 
-    return {"message_type":result.message_type}
+    text = state["messages"][-1].content
+    message_type = get_local_classifier().classify(text)
+    if message_type is None:
+        message_type = await aclassify_with_llm(text)
+    return {"message_type":message_type}
 
 def router(state: State):
     message_type = state.get("message_type","logical")
@@ -46,66 +111,174 @@ def router(state: State):
     return {"next":"logical"}
 
 
-def therapist_agent(state: State):
-        last_message = state["messages"][-1]
-        messages = [
-        {"role": "system",
-         "content": """You are a compassionate therapist. Focus on the emotional aspects of the user's message.
+THERAPIST_PROMPT = """You are a compassionate therapist. Focus on the emotional aspects of the user's message.
                         Show empathy, validate their feelings, and help them process their emotions.
                         Ask thoughtful questions to help them explore their feelings more deeply.
                         Avoid giving logical solutions unless explicitly asked."""
-         },
-        {
-            "role": "user",
-            "content": last_message.content
-        }
+
+LOGICAL_PROMPT = """You are a purely logical assistant. Focus only on facts and information.
+            Provide clear, concise answers based on logic and evidence.
+            Do not address emotions or provide emotional support.
+            Be direct and straightforward in your responses."""
+
+RESPONDER_PROMPTS = {"therapist": THERAPIST_PROMPT, "logical": LOGICAL_PROMPT}
+
+def responder_messages(node: str, text: str) -> list[dict]:
+    return [
+        {"role": "system", "content": RESPONDER_PROMPTS[node]},
+        {"role": "user", "content": text}
     ]
-    
-        reply = llm.invoke(messages)
-        return {"messages": [{"role": "assistant", "content": reply.content}]}
+
+
+def therapist_agent(state: State):
+    last_message = state["messages"][-1]
+    reply = get_llm().invoke(responder_messages("therapist", last_message.content))
+    return {"messages": [{"role": "assistant", "content": reply.content}]}
 
 
 def logical_agent(state: State):
     last_message = state["messages"][-1]
+    reply = get_llm().invoke(responder_messages("logical", last_message.content))
+    return {"messages": [{"role": "assistant", "content": reply.content}]}
 
-    messages = [
-        {"role": "system",
-         "content": """You are a purely logical assistant. Focus only on facts and information.
-            Provide clear, concise answers based on logic and evidence.
-            Do not address emotions or provide emotional support.
-            Be direct and straightforward in your responses."""
-         },
-        {
-            "role": "user",
-            "content": last_message.content
-        }
-    ]
-    reply = llm.invoke(messages)
+
+# Async twins of the model-calling nodes. Under ainvoke/astream they keep the
+# model calls on the event loop instead of tying up one executor thread per
+# in-flight turn.
+async def atherapist_agent(state: State):
+    last_message = state["messages"][-1]
+    reply = await get_llm().ainvoke(responder_messages("therapist", last_message.content))
+    return {"messages": [{"role": "assistant", "content": reply.content}]}
+
+
+async def alogical_agent(state: State):
+    last_message = state["messages"][-1]
+    reply = await get_llm().ainvoke(responder_messages("logical", last_message.content))
     return {"messages": [{"role": "assistant", "content": reply.content}]}
 
-graph_builder = StateGraph(State)
+def _node(func, afunc):
+    return RunnableLambda(func, afunc=afunc, name=func.__name__)
+
+def make_history_trimmer(history_window: int):
+    """Node that drops everything but the last `history_window` messages."""
+    def trim_history(state: State):
+        overflow = len(state["messages"]) - history_window
+        if overflow <= 0:
+            return {}
+        return {"messages": [RemoveMessage(id=m.id) for m in state["messages"][:overflow]]}
+    return trim_history
+
+def build_graph(checkpointer=None, history_window: int | None = None,
+                speculative: str | None = None, metrics=None):
+    """Compile the router graph.
+
+    `speculative` ("both" or "likely") swaps the classifier -> router ->
+    responder chain for a single node that starts the responders while the
+    message is still being classified; see speculative.py.
+
+    `metrics` (an instrumentation.GraphMetrics) records per-node timing and
+    token usage; without it the nodes are not wrapped at all.
+    """
+    graph_builder = StateGraph(State)
+    if metrics is not None:
+        metrics.instrument(graph_builder)
+
+    if speculative:
+        from speculative import SpeculativeResponder
+
+        graph_builder.add_node("speculative", SpeculativeResponder(speculative).as_node())
+        graph_builder.add_edge(START, "speculative")
+        final_nodes = ["speculative"]
+    else:
+        graph_builder.add_node("classifier", _node(classify_message, aclassify_message))
+        graph_builder.add_node("router", router)
+        graph_builder.add_node("therapist", _node(therapist_agent, atherapist_agent))
+        graph_builder.add_node("logical", _node(logical_agent, alogical_agent))
+
+        graph_builder.add_edge(START, "classifier")
+        graph_builder.add_edge("classifier", "router")
+
+        graph_builder.add_conditional_edges(
+            "router",
+            lambda state: state.get("next"),
+            {"therapist": "therapist", "logical": "logical"}
+        )
+        final_nodes = ["therapist", "logical"]
+
+    if history_window:
+        graph_builder.add_node("trim_history", make_history_trimmer(history_window))
+        for node in final_nodes:
+            graph_builder.add_edge(node, "trim_history")
+        graph_builder.add_edge("trim_history", END)
+    else:
+        for node in final_nodes:
+            graph_builder.add_edge(node, END)
+
+    graph = graph_builder.compile(checkpointer=checkpointer)
+    return metrics.attach(graph) if metrics is not None else graph
+
+
+@cache
+def get_graph():
+    """The default compiled graph, built once per process."""
+    return build_graph()
+
+DEFAULT_HISTORY_WINDOW = 20
+
+def open_checkpointer(db_path: str, keep_checkpoints: int | None = None):
+    """SQLite checkpointer backed by a local file, keyed by thread id.
+
+    Only the newest `keep_checkpoints` checkpoints of each thread are kept
+    (see checkpoints.py); pass 0 to keep them all, e.g. for time travel.
+    """
+    import sqlite3
+    from checkpoints import DEFAULT_KEEP_CHECKPOINTS, PruningSqliteSaver
+    from langgraph.checkpoint.sqlite import SqliteSaver
 
-graph_builder.add_node("classifier", classify_message)
-graph_builder.add_node("router", router)
-graph_builder.add_node("therapist", therapist_agent)
-graph_builder.add_node("logical", logical_agent)
+    os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+    conn = sqlite3.connect(db_path, check_same_thread=False)
+    if keep_checkpoints is None:
+        keep_checkpoints = DEFAULT_KEEP_CHECKPOINTS
+    if keep_checkpoints == 0:
+        return SqliteSaver(conn)
+    return PruningSqliteSaver(conn, keep=keep_checkpoints)
 
-graph_builder.add_edge(START, "classifier")
-graph_builder.add_edge("classifier", "router")
+def build_persistent_graph(db_path: str, history_window: int = DEFAULT_HISTORY_WINDOW,
+                           speculative: str | None = None, metrics=None,
+                           keep_checkpoints: int | None = None):
+    return build_graph(checkpointer=open_checkpointer(db_path, keep_checkpoints),
+                       history_window=history_window, speculative=speculative, metrics=metrics)
 
-graph_builder.add_conditional_edges(
-    "router",
-    lambda state: state.get("next"),
-    {"therapist": "therapist", "logical": "logical"}
-)
- 
-graph_builder.add_edge("therapist", END)
-graph_builder.add_edge("logical", END)
+def print_turn(graph, inputs, config=None, stream: bool = False, show_timing: bool = False):
+    """Run one turn and print the reply, streaming tokens if asked to."""
+    if not stream:
+        state = graph.invoke(inputs, config=config)
+        if state.get("messages") and len(state["messages"]) > 0:
+            last_message = state["messages"][-1]
+            print(f"Assistant: {last_message.content}")
+        return state
 
+    from streaming import stream_reply
 
-graph = graph_builder.compile()
+    print("Assistant: ", end="", flush=True)
+    result = stream_reply(graph, inputs, config=config)
+    print()
+    if show_timing:
+        print(f"[{result.stats}]")
+    return result.state
 
-def run_chatbot():
+def run_chatbot(thread_id: str | None = None, db_path: str = "tmp/checkpoints.sqlite",
+                history_window: int = DEFAULT_HISTORY_WINDOW, stream: bool = False,
+                show_timing: bool = False, speculative: str | None = None, metrics=None,
+                keep_checkpoints: int | None = None):
+    if thread_id is not None:
+        return run_persistent_chatbot(thread_id, db_path, history_window, stream, show_timing,
+                                      speculative, metrics, keep_checkpoints)
+
+    if speculative or metrics is not None:
+        chat_graph = build_graph(speculative=speculative, metrics=metrics)
+    else:
+        chat_graph = get_graph()
     state = {"messages": [], "message_type": None}
 
     while True:
@@ -117,12 +290,82 @@ def run_chatbot():
         state["messages"] = state.get("messages", []) + [
             {"role": "user", "content": user_input}
         ]
+        state["message_type"] = None
 
-        state = graph.invoke(state)
+        state = print_turn(chat_graph, state, stream=stream, show_timing=show_timing)
 
-        if state.get("messages") and len(state["messages"]) > 0:
-            last_message = state["messages"][-1]
-            print(f"Assistant: {last_message.content}")
+def run_persistent_chatbot(thread_id: str, db_path: str, history_window: int,
+                           stream: bool = False, show_timing: bool = False,
+                           speculative: str | None = None, metrics=None,
+                           keep_checkpoints: int | None = None):
+    """Chat loop where the history lives in the checkpointer, not in Python.
+
+    Each turn sends only the new user message; the graph loads the (windowed)
+    thread state from SQLite itself, so a conversation can also be resumed
+    later with the same thread id.
+    """
+    persistent_graph = build_persistent_graph(db_path, history_window, speculative, metrics,
+                                              keep_checkpoints)
+    config = {"configurable": {"thread_id": thread_id}}
+
+    while True:
+        user_input = input("Message: ")
+        if user_input == "exit":
+            print("Bye")
+            break
+
+        print_turn(
+            persistent_graph,
+            {"messages": [{"role": "user", "content": user_input}], "message_type": None},
+            config=config,
+            stream=stream,
+            show_timing=show_timing,
+        )
+
+def __getattr__(name):
+    lazy = {
+        "llm": get_llm,
+        "classifier_llm": get_classifier_llm,
+        "local_classifier": get_local_classifier,
+        "graph": get_graph,
+    }
+    if name in lazy:
+        return lazy[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
-    run_chatbot()   
+    parser = argparse.ArgumentParser(description="Emotional/logical router chatbot")
+    parser.add_argument("--thread-id", help="persist the conversation under this thread id")
+    parser.add_argument("--db", default="tmp/checkpoints.sqlite", help="checkpoint database file")
+    parser.add_argument("--history-window", type=int, default=DEFAULT_HISTORY_WINDOW,
+                        help="messages kept in the persisted thread state")
+    parser.add_argument("--keep-checkpoints", type=int,
+                        help="checkpoints kept per thread (default 10, 0 keeps all)")
+    parser.add_argument("--stream", action="store_true", help="print reply tokens as they arrive")
+    parser.add_argument("--show-timing", action="store_true",
+                        help="print time-to-first-token after each streamed reply")
+    parser.add_argument("--speculative", choices=["both", "likely"],
+                        help="start responders while the message is still being classified")
+    parser.add_argument("--metrics", metavar="JSONL",
+                        help="record per-node timing and tokens, appending samples to this file")
+    parser.add_argument("--metrics-prom", metavar="PATH",
+                        help="with --metrics, write a Prometheus text snapshot here on exit")
+    args = parser.parse_args()
+
+    metrics = None
+    if args.metrics:
+        from instrumentation import GraphMetrics
+        os.makedirs(os.path.dirname(args.metrics) or ".", exist_ok=True)
+        metrics = GraphMetrics(jsonl_path=args.metrics)
+
+    run_chatbot(args.thread_id, args.db, args.history_window, args.stream, args.show_timing,
+                args.speculative, metrics, args.keep_checkpoints)
+    if args.speculative:
+        from speculative import speculation_stats
+        print(speculation_stats)
+    if metrics is not None:
+        print(metrics.summary())
+        if args.metrics_prom:
+            with open(args.metrics_prom, "w") as f:
+                f.write(metrics.prometheus())
+        metrics.close()
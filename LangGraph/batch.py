@@ -0,0 +1,225 @@
+"""Run many independent conversations through the router graph.
+
+Input is a JSONL file with one conversation per line:
+
+    {"id": "c1", "messages": [{"role": "user", "content": "..."}]}
+
+(a plain {"id": ..., "message": "..."} line is accepted too; a line with
+neither, or one that is not a JSON object, is reported as an error result and skipped). The last user
+message of every conversation is classified up front: the local
+pre-classifier answers the easy ones and the rest are packed into as few
+structured-output LLM requests as possible. The labels are then handed to the
+graph, so `classify_message` never calls the model again, and conversations
+run with bounded concurrency. Results are written as JSONL in completion
+order, as soon as each conversation finishes.
+
+    python batch.py conversations.jsonl -o results.jsonl --max-concurrency 16
+    python batch.py conversations.jsonl --classify-only
+"""
+
+import argparse
+import json
+import sys
+from functools import cache
+from typing import Iterable, Iterator, Literal
+
+from langchain_core.runnables import RunnableLambda
+from pydantic import BaseModel, Field
+
+from agents import CLASSIFIER_PROMPT, classify_with_llm, get_graph, get_llm, get_local_classifier
+
+
+class LabeledMessage(BaseModel):
+    index: int = Field(..., description="The number of the message in the list.")
+    message_type: Literal["emotional", "logical"]
+
+
+class BatchClassification(BaseModel):
+    labels: list[LabeledMessage] = Field(
+        ...,
+        description="One label for every numbered message, in any order."
+    )
+
+
+@cache
+def get_batch_classifier_llm():
+    return get_llm().with_structured_output(BatchClassification)
+
+
+def get_classifier_fallback():
+    """Per-message classification, for the messages of a failed batch request."""
+    return RunnableLambda(classify_with_llm)
+
+
+def load_conversations(path: str) -> list[dict]:
+    """Read the input file. Unusable lines come back as {"id", "error"} rows."""
+    conversations = []
+    with open(path, encoding="utf-8") as f:
+        for line_no, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except json.JSONDecodeError as e:
+                conversations.append({"id": line_no, "error": f"line {line_no}: invalid JSON ({e})"})
+                continue
+            if not isinstance(row, dict):
+                conversations.append({"id": line_no, "error": f"line {line_no}: not a JSON object"})
+                continue
+            row.setdefault("id", line_no)
+            if "messages" not in row:
+                if "message" not in row:
+                    row["error"] = f"line {line_no}: no 'messages' or 'message' field"
+                else:
+                    row["messages"] = [{"role": "user", "content": row.pop("message")}]
+            conversations.append(row)
+    return conversations
+
+
+def _last_user_text(conversation: dict) -> str:
+    for message in reversed(conversation["messages"]):
+        if message.get("role") == "user":
+            return message["content"]
+    raise ValueError(f"conversation {conversation['id']!r} has no user message")
+
+
+def _chunks(items: list, size: int) -> Iterator[list]:
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def _batch_prompt(texts: list[str]) -> list[dict]:
+    numbered = "\n".join(f"{i}. {json.dumps(text)}" for i, text in enumerate(texts))
+    return [
+        {"role": "system", "content": CLASSIFIER_PROMPT
+            + "\nYou will receive a numbered list of messages. Label every one of them."},
+        {"role": "user", "content": numbered},
+    ]
+
+
+def classify_batch(
+    texts: list[str],
+    chunk_size: int = 50,
+    max_concurrency: int = 4,
+) -> tuple[list[str], int]:
+    """Classify many messages with as few LLM requests as possible.
+
+    Returns the labels in input order and the number of LLM requests made.
+    """
+    local_classifier = get_local_classifier()
+    labels: list[str | None] = [local_classifier.classify(text) for text in texts]
+    pending = [i for i, label in enumerate(labels) if label is None]
+    if not pending:
+        return labels, 0
+
+    chunks = list(_chunks(pending, chunk_size))
+    prompts = [_batch_prompt([texts[i] for i in chunk]) for chunk in chunks]
+    results = get_batch_classifier_llm().batch(
+        prompts, config={"max_concurrency": max_concurrency}, return_exceptions=True
+    )
+    requests = len(chunks)
+
+    failed = []
+    for chunk, result in zip(chunks, results):
+        if isinstance(result, Exception) or not isinstance(result, BatchClassification):
+            # A failed or unparseable request only costs its own chunk.
+            print(f"batched classification of {len(chunk)} messages failed: {result!r}", file=sys.stderr)
+            failed.extend(chunk)
+            continue
+        for item in result.labels:
+            if 0 <= item.index < len(chunk):
+                labels[chunk[item.index]] = item.message_type
+        # The model occasionally skips an entry; those go per message too.
+        failed.extend(i for i in chunk if labels[i] is None)
+
+    if failed:
+        fallback = get_classifier_fallback().batch(
+            [texts[i] for i in failed], config={"max_concurrency": max_concurrency}, return_exceptions=True
+        )
+        requests += len(failed)
+        for i, label in zip(failed, fallback):
+            if not isinstance(label, Exception):
+                labels[i] = label
+
+    # Anything still unlabeled (a failed fallback request) falls back to the
+    # graph's own classifier node.
+    return labels, requests
+
+
+def run_batch(
+    conversations: list[dict],
+    max_concurrency: int = 8,
+    chunk_size: int = 50,
+    classify_only: bool = False,
+) -> Iterator[dict]:
+    """Yield one result per conversation, in completion order."""
+    for conversation in conversations:
+        if "error" not in conversation and not any(
+            m.get("role") == "user" for m in conversation["messages"]
+        ):
+            conversation["error"] = f"conversation {conversation['id']!r} has no user message"
+    for conversation in conversations:
+        if "error" in conversation:
+            yield {"id": conversation["id"], "error": conversation["error"]}
+    conversations = [c for c in conversations if "error" not in c]
+
+    texts = [_last_user_text(c) for c in conversations]
+    labels, requests = classify_batch(texts, chunk_size, max_concurrency)
+    print(
+        f"classified {len(texts)} messages with {requests} LLM request(s)",
+        file=sys.stderr,
+    )
+
+    if classify_only:
+        for conversation, label in zip(conversations, labels):
+            yield {"id": conversation["id"], "message_type": label}
+        return
+
+    inputs = [
+        {"messages": c["messages"], "message_type": label}
+        for c, label in zip(conversations, labels)
+    ]
+    for index, output in get_graph().batch_as_completed(
+        inputs,
+        config={"max_concurrency": max_concurrency},
+        return_exceptions=True,
+    ):
+        conversation_id = conversations[index]["id"]
+        if isinstance(output, Exception):
+            yield {"id": conversation_id, "error": repr(output)}
+            continue
+        yield {
+            "id": conversation_id,
+            "message_type": output.get("message_type"),
+            "reply": output["messages"][-1].content,
+        }
+
+
+def write_results(results: Iterable[dict], out) -> None:
+    for result in results:
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", help="JSONL file with one conversation per line")
+    parser.add_argument("-o", "--output", help="write results here instead of stdout")
+    parser.add_argument("--max-concurrency", type=int, default=8)
+    parser.add_argument("--chunk-size", type=int, default=50,
+                        help="messages per batched classification request")
+    parser.add_argument("--classify-only", action="store_true",
+                        help="only label the messages, do not run the responders")
+    args = parser.parse_args()
+
+    results = run_batch(
+        load_conversations(args.input),
+        max_concurrency=args.max_concurrency,
+        chunk_size=args.chunk_size,
+        classify_only=args.classify_only,
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as out:
+            write_results(results, out)
+    else:
+        write_results(results, sys.stdout)
@@ -0,0 +1,192 @@
+"""Offline overhead, throughput and memory benchmark for the chatbot graphs.
+
+Swaps the Gemini client for `FakeChatModel` and drives each graph with a
+mix of messages: seed messages, which the local pre-classifier answers, and
+held-out ones it is not confident about, which go to the LLM classifier (and,
+in the speculative graph, start the speculative branches).
+`--fallback-share` sets the share of held-out messages. Reported:
+
+- turn_ms:     median wall time per invoke
+- overhead_ms: median wall time minus the time some model call was in
+               progress, i.e. what LangGraph and our nodes cost on top of the
+               model. Concurrent calls (speculative branches) are counted
+               once, not summed.
+- runs_per_s:  throughput with `--concurrency` concurrent ainvoke() calls
+- peak_kib:    peak traced Python heap during the runs
+- fallbacks:   turns classified by the LLM classifier
+
+Graphs: "main" (the single-node chatbot in main.py), "router" (agents.py)
+and "speculative" (agents.py with speculative responders). With the default
+zero latency the numbers are pure framework cost; add `--latency` and
+`--tokens-per-s` to see how overhead compares with a realistic model.
+
+    python bench_graphs.py
+    python bench_graphs.py router speculative --turns 200 --latency 0.2 --json
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import tracemalloc
+
+from pydantic import PrivateAttr
+
+import agents
+import main
+from classifier import SEED_EXAMPLES
+from fake_llm import FakeChatModel
+
+GRAPHS = ("main", "router", "speculative")
+
+# Messages the local pre-classifier is not confident about, so they fall back
+# to the LLM classifier. Keep them out of SEED_EXAMPLES.
+HELD_OUT_EXAMPLES = [
+    ("My landlord won't return my deposit, what can I do?", "logical"),
+    ("I keep procrastinating on my thesis", "emotional"),
+    ("Is it normal to cry at work?", "emotional"),
+    ("Tell me something nice", "emotional"),
+    ("What should I say to my sister after our argument?", "emotional"),
+    ("I can't decide between two laptops", "logical"),
+    ("Everything is fine I guess", "emotional"),
+    ("Plan a three day trip to Rome", "logical"),
+    ("Is a 401k better than an IRA?", "logical"),
+    ("ok thanks", "logical"),
+]
+LABELS = dict(SEED_EXAMPLES + HELD_OUT_EXAMPLES)
+
+
+class BenchModel(FakeChatModel):
+    """FakeChatModel that records when its synthetic latency runs, and its classifications."""
+
+    fallbacks: int = 0
+    recording: bool = True
+    _busy: list = PrivateAttr(default_factory=list)
+
+    def _sleep(self, seconds: float) -> None:
+        start = time.perf_counter()
+        super()._sleep(seconds)
+        if self.recording:
+            self._busy.append((start, time.perf_counter()))
+
+    async def _asleep(self, seconds: float) -> None:
+        start = time.perf_counter()
+        await super()._asleep(seconds)
+        if self.recording:
+            self._busy.append((start, time.perf_counter()))
+
+    def busy_s(self, since: float) -> float:
+        """Time since `since` during which at least one model call was sleeping."""
+        total, end = 0.0, since
+        for start, stop in sorted(self._busy):
+            start = max(start, end)
+            if stop > start:
+                total += stop - start
+                end = stop
+        self._busy = [interval for interval in self._busy if interval[1] > since]
+        return total
+
+    def classify(self, messages) -> dict:
+        # The LLM classifier fallback answers with the true label of the bench message.
+        self.fallbacks += 1
+        return {"message_type": LABELS.get(messages[-1].content, "logical")}
+
+
+def make_model(latency_s: float, tokens_per_s: float | None) -> BenchModel:
+    model = BenchModel(
+        script=["Thanks for sharing. Here is a short, considered reply."],
+        latency_s=latency_s,
+        tokens_per_s=tokens_per_s,
+    )
+    model.structured = {"MessageClassifier": model.classify}
+    return model
+
+
+def build(name: str, model: FakeChatModel):
+    if name == "main":
+        main.get_llm = lambda: model
+        return main.get_graph()
+    agents.set_llm(model)
+    return agents.build_graph(speculative="both" if name == "speculative" else None)
+
+
+def _inputs(turn: int, fallback_share: float) -> dict:
+    # Held-out messages are spread evenly over the turns.
+    if int((turn + 1) * fallback_share) > int(turn * fallback_share):
+        text = HELD_OUT_EXAMPLES[int(turn * fallback_share) % len(HELD_OUT_EXAMPLES)][0]
+    else:
+        text = SEED_EXAMPLES[turn % len(SEED_EXAMPLES)][0]
+    return {"messages": [{"role": "user", "content": text}]}
+
+
+def bench_graph(name: str, turns: int, concurrency: int,
+                latency_s: float, tokens_per_s: float | None, fallback_share: float = 0.5) -> dict:
+    model = make_model(latency_s, tokens_per_s)
+    graph = build(name, model)
+
+    tracemalloc.start()
+    turn_ms, overhead_ms = [], []
+    for turn in range(turns):
+        start = time.perf_counter()
+        graph.invoke(_inputs(turn, fallback_share))
+        wall = time.perf_counter() - start
+        turn_ms.append(wall * 1000)
+        overhead_ms.append((wall - model.busy_s(start)) * 1000)
+    fallbacks = model.fallbacks
+    model.recording = False
+
+    async def run_concurrently():
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def one(turn):
+            async with semaphore:
+                await graph.ainvoke(_inputs(turn, fallback_share))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(turn) for turn in range(turns)))
+        return turns / (time.perf_counter() - start)
+
+    runs_per_s = asyncio.run(run_concurrently())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "graph": name,
+        "turns": turns,
+        "turn_ms": round(statistics.median(turn_ms), 3),
+        "overhead_ms": round(statistics.median(overhead_ms), 3),
+        "runs_per_s": round(runs_per_s, 1),
+        "peak_kib": round(peak / 1024),
+        "model_calls": model.calls,
+        "fallbacks": fallbacks,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline graph overhead benchmark")
+    parser.add_argument("graphs", nargs="*", default=list(GRAPHS), help=f"any of {GRAPHS}")
+    parser.add_argument("--turns", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=16,
+                        help="concurrent ainvoke() calls for runs_per_s")
+    parser.add_argument("--latency", type=float, default=0.0,
+                        help="synthetic seconds before the first token")
+    parser.add_argument("--tokens-per-s", type=float, default=None,
+                        help="synthetic output token rate")
+    parser.add_argument("--fallback-share", type=float, default=0.5,
+                        help="share of turns with held-out messages that need the LLM classifier")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per graph")
+    args = parser.parse_args()
+
+    if not args.json:
+        print(f"{'graph':<12} {'turn_ms':>9} {'overhead_ms':>11} {'runs/s':>9} {'peak_kib':>9} {'calls':>6} "
+              f"{'fallbacks':>9}")
+    for name in args.graphs:
+        result = bench_graph(name, args.turns, args.concurrency, args.latency, args.tokens_per_s,
+                             args.fallback_share)
+        if args.json:
+            print(json.dumps(result))
+        else:
+            print(f"{name:<12} {result['turn_ms']:>9.3f} {result['overhead_ms']:>11.3f} "
+                  f"{result['runs_per_s']:>9.1f} {result['peak_kib']:>9} {result['model_calls']:>6} "
+                  f"{result['fallbacks']:>9}")
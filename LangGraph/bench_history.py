@@ -0,0 +1,95 @@
+"""Per-turn latency and memory over a long conversation.
+
+Drives the router graph for N turns (1,000 by default) in two modes:
+
+- resend:     the original run_chatbot loop, which grows state["messages"]
+              in Python and passes the whole list back every turn
+- checkpoint: the SQLite checkpointer mode, which sends only the new message
+              and keeps a bounded history window per thread (and the newest
+              --keep-checkpoints checkpoints; 0 keeps them all)
+
+The model is replaced by an offline stand-in, so the numbers are pure
+framework and state-handling cost. Latency and traced Python heap are
+reported per block of 100 turns; in checkpoint mode both should stay flat,
+and so should the size of the checkpoint database.
+
+    python bench_history.py --turns 1000 --history-window 20
+"""
+
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import tracemalloc
+
+import agents
+from classifier import SEED_EXAMPLES
+from fake_llm import FakeChatModel
+
+
+def use_offline_model():
+    agents.set_llm(FakeChatModel(script=["Noted. Tell me more."]))
+
+
+def run_resend(turns: int):
+    graph = agents.build_graph()
+    state = {"messages": [], "message_type": None}
+    for turn in range(turns):
+        text = SEED_EXAMPLES[turn % len(SEED_EXAMPLES)][0]
+        start = time.perf_counter()
+        state["messages"] = state.get("messages", []) + [{"role": "user", "content": text}]
+        state["message_type"] = None
+        state = graph.invoke(state)
+        yield time.perf_counter() - start
+
+
+def run_checkpoint(turns: int, db_path: str, history_window: int, keep_checkpoints: int | None = None):
+    graph = agents.build_persistent_graph(db_path, history_window, keep_checkpoints=keep_checkpoints)
+    config = {"configurable": {"thread_id": "bench"}}
+    for turn in range(turns):
+        text = SEED_EXAMPLES[turn % len(SEED_EXAMPLES)][0]
+        start = time.perf_counter()
+        graph.invoke(
+            {"messages": [{"role": "user", "content": text}], "message_type": None},
+            config=config,
+        )
+        yield time.perf_counter() - start
+
+
+def report(name: str, latencies, block: int = 100):
+    print(f"\n{name}")
+    print(f"{'turns':>11} {'mean ms':>9} {'p99 ms':>9} {'heap KiB':>10}")
+    window = []
+    for turn, seconds in enumerate(latencies, 1):
+        window.append(seconds * 1000)
+        if turn % block == 0:
+            heap, _ = tracemalloc.get_traced_memory()
+            p99 = statistics.quantiles(window, n=100)[98] if len(window) > 1 else window[0]
+            print(f"{turn - block + 1:>5}-{turn:<5} {statistics.fmean(window):>9.2f} "
+                  f"{p99:>9.2f} {heap / 1024:>10.0f}")
+            window = []
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Long-conversation state benchmark")
+    parser.add_argument("--turns", type=int, default=1000)
+    parser.add_argument("--history-window", type=int, default=agents.DEFAULT_HISTORY_WINDOW)
+    parser.add_argument("--keep-checkpoints", type=int, help="checkpoints kept per thread (0 keeps all)")
+    parser.add_argument("--mode", choices=["resend", "checkpoint", "both"], default="both")
+    args = parser.parse_args()
+
+    use_offline_model()
+    tracemalloc.start()
+
+    if args.mode in ("resend", "both"):
+        report("resend (full state every turn)", run_resend(args.turns))
+
+    if args.mode in ("checkpoint", "both"):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "checkpoints.sqlite")
+            report(
+                f"checkpoint (window={args.history_window})",
+                run_checkpoint(args.turns, db_path, args.history_window, args.keep_checkpoints),
+            )
+            print(f"checkpoint db size: {os.path.getsize(db_path) / 1024:.0f} KiB")
@@ -0,0 +1,109 @@
+"""Import-time benchmark for the LangGraph modules.
+
+Runs `python -X importtime -c "import <module>"` in fresh interpreters and
+reports the module's cumulative import time (median over several runs)
+together with the heaviest imports by self time, so import-time regressions
+are easy to spot and track. `--graph` also times building the compiled graph
+after import, i.e. what a CLI invocation pays before the first prompt.
+
+    python bench_import.py agents main batch server
+    python bench_import.py agents --json >> import_times.jsonl
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+HERE = Path(__file__).resolve().parent
+
+
+def _parse_importtime(stderr: str) -> list[tuple[str, int, int, int]]:
+    """Return (module, depth, self_us, cumulative_us) rows from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        fields = line[len("import time:"):].split("|")
+        if len(fields) != 3:
+            continue
+        self_us, cumulative_us, name = fields
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def measure_import(module: str, build_graph: bool = False) -> dict:
+    code = f"import {module}"
+    if build_graph:
+        code += (
+            f"; import time; t = time.perf_counter(); {module}.get_graph();"
+            " print(time.perf_counter() - t)"
+        )
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=HERE,
+        capture_output=True,
+        text=True,
+    )
+    wall_s = time.perf_counter() - start
+    if proc.returncode != 0:
+        raise RuntimeError(f"importing {module} failed:\n{proc.stderr[-2000:]}")
+
+    rows = _parse_importtime(proc.stderr)
+    total_us = next(
+        (cumulative for name, depth, _, cumulative in rows if name == module and depth == 0),
+        0,
+    )
+    result = {"module": module, "import_ms": total_us / 1000, "process_ms": wall_s * 1000, "rows": rows}
+    if build_graph:
+        result["graph_ms"] = float(proc.stdout.strip().splitlines()[-1]) * 1000
+    return result
+
+
+def benchmark(module: str, runs: int, build_graph: bool) -> dict:
+    results = [measure_import(module, build_graph) for _ in range(runs)]
+    summary = {
+        "module": module,
+        "runs": runs,
+        "import_ms": statistics.median(r["import_ms"] for r in results),
+        "process_ms": statistics.median(r["process_ms"] for r in results),
+    }
+    if build_graph:
+        summary["graph_ms"] = statistics.median(r["graph_ms"] for r in results)
+    heaviest = sorted(results[-1]["rows"], key=lambda row: row[2], reverse=True)[:15]
+    summary["heaviest"] = [{"module": name, "self_ms": self_us / 1000} for name, _, self_us, _ in heaviest]
+    return summary
+
+
+def print_report(summary: dict) -> None:
+    line = (
+        f"{summary['module']}: import {summary['import_ms']:.1f}ms "
+        f"(process {summary['process_ms']:.1f}ms"
+    )
+    if "graph_ms" in summary:
+        line += f", graph build {summary['graph_ms']:.1f}ms"
+    print(line + f", median of {summary['runs']})")
+    for row in summary["heaviest"]:
+        print(f"    {row['self_ms']:>8.1f}ms  {row['module']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import-time benchmark")
+    parser.add_argument("modules", nargs="*", default=["agents", "main"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--graph", action="store_true",
+                        help="also time get_graph() after the import")
+    parser.add_argument("--json", action="store_true", help="print one JSON object per module")
+    args = parser.parse_args()
+
+    for module in args.modules:
+        summary = benchmark(module, args.runs, args.graph)
+        if args.json:
+            print(json.dumps(summary))
+        else:
+            print_report(summary)
@@ -0,0 +1,120 @@
+"""Checkpointers that keep only the recent checkpoints of each thread.
+
+LangGraph writes a checkpoint after every step of every turn and the stock
+savers keep all of them, so a thread's storage grows with its length even
+though the history window bounds the messages in its latest state. Resuming
+a thread only needs its latest checkpoint; older ones are only used for
+time travel (`graph.get_state_history`, replaying from a past checkpoint).
+
+`PruningSqliteSaver` deletes all but the newest `keep` checkpoints of a
+thread, and their pending writes, each time it saves one. SQLite reuses the
+freed pages, so the file stops growing once every thread has reached `keep`.
+`PruningAsyncSqliteSaver` does the same for the async saver, and
+`PruningInMemorySaver` for the in-memory one, where it also drops the channel
+values that no kept checkpoint refers to any more.
+"""
+
+from collections import defaultdict
+
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+DEFAULT_KEEP_CHECKPOINTS = 10
+
+# Checkpoint ids are time-ordered (uuid6), which is also the order list() uses.
+_OLDEST_KEPT = (
+    "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+    "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?"
+)
+_DELETE_OLDER = [
+    f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?"
+    for table in ("checkpoints", "writes")
+]
+
+
+def _check_keep(keep: int) -> int:
+    if keep < 1:
+        raise ValueError("keep must be at least 1")
+    return keep
+
+
+class PruningSqliteSaver(SqliteSaver):
+    def __init__(self, conn, *args, keep: int = DEFAULT_KEEP_CHECKPOINTS, **kwargs):
+        super().__init__(conn, *args, **kwargs)
+        self.keep = _check_keep(keep)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        self.prune(saved["configurable"]["thread_id"], saved["configurable"]["checkpoint_ns"])
+        return saved
+
+    def prune(self, thread_id: str, checkpoint_ns: str = "") -> None:
+        """Drop the checkpoints of one thread older than its newest `keep`."""
+        with self.cursor() as cur:
+            cur.execute(_OLDEST_KEPT, (str(thread_id), checkpoint_ns, self.keep - 1))
+            row = cur.fetchone()
+            if row is None:
+                return
+            for query in _DELETE_OLDER:
+                cur.execute(query, (str(thread_id), checkpoint_ns, row[0]))
+
+
+class PruningAsyncSqliteSaver(AsyncSqliteSaver):
+    keep = DEFAULT_KEEP_CHECKPOINTS  # from_conn_string() only passes the connection
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        saved = await super().aput(config, checkpoint, metadata, new_versions)
+        await self.aprune(saved["configurable"]["thread_id"], saved["configurable"]["checkpoint_ns"])
+        return saved
+
+    async def aprune(self, thread_id: str, checkpoint_ns: str = "") -> None:
+        async with self.lock, self.conn.cursor() as cur:
+            await cur.execute(_OLDEST_KEPT, (str(thread_id), checkpoint_ns, self.keep - 1))
+            row = await cur.fetchone()
+            if row is None:
+                return
+            for query in _DELETE_OLDER:
+                await cur.execute(query, (str(thread_id), checkpoint_ns, row[0]))
+            await self.conn.commit()
+
+
+class PruningInMemorySaver(InMemorySaver):
+    def __init__(self, *args, keep: int = DEFAULT_KEEP_CHECKPOINTS, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.keep = _check_keep(keep)
+        # (thread_id, checkpoint_ns) -> {checkpoint_id: channel_versions}
+        self._versions: dict = defaultdict(dict)
+        # (thread_id, checkpoint_ns) -> {(channel, version)} stored in self.blobs
+        self._blob_keys: dict = defaultdict(set)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        saved = super().put(config, checkpoint, metadata, new_versions)
+        thread_id = saved["configurable"]["thread_id"]
+        checkpoint_ns = saved["configurable"]["checkpoint_ns"]
+        versions = self._versions[(thread_id, checkpoint_ns)]
+        versions[checkpoint["id"]] = dict(checkpoint["channel_versions"])
+        self._blob_keys[(thread_id, checkpoint_ns)].update(new_versions.items())
+        if len(versions) > self.keep:
+            self.prune(thread_id, checkpoint_ns)
+        return saved
+
+    def prune(self, thread_id: str, checkpoint_ns: str = "") -> None:
+        """Drop the checkpoints of one thread older than its newest `keep`, and their values."""
+        versions = self._versions[(thread_id, checkpoint_ns)]
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        for checkpoint_id in sorted(checkpoints)[:-self.keep]:
+            del checkpoints[checkpoint_id]
+            versions.pop(checkpoint_id, None)
+            self.writes.pop((thread_id, checkpoint_ns, checkpoint_id), None)
+        live = {(channel, version) for kept in versions.values() for channel, version in kept.items()}
+        blob_keys = self._blob_keys[(thread_id, checkpoint_ns)]
+        for channel, version in blob_keys - live:
+            self.blobs.pop((thread_id, checkpoint_ns, channel, version), None)
+        blob_keys &= live
+
+    def delete_thread(self, thread_id: str) -> None:
+        super().delete_thread(thread_id)
+        for index in (self._versions, self._blob_keys):
+            for key in [k for k in index if k[0] == thread_id]:
+                del index[key]
@@ -0,0 +1,286 @@
+"""Local pre-classifier for the emotional/logical router.
+
+`classify_message` in agents.py asks Gemini to label every turn. Most
+messages are easy to route, so this module puts a cheap nearest-centroid
+classifier in front of the LLM: it embeds the message locally, compares it
+with one centroid per label and only answers when it is confident. Anything
+below the threshold returns None and the caller falls back to the
+structured-output LLM.
+
+Unless one is given, the threshold is calibrated on held-out examples
+(`CALIBRATION_EXAMPLES`): it is set just above the confidence of the most
+confident mistake there. With the default `HashingEmbedder` that leaves only the
+clear-cut messages to the fast path; a real embedder separates the labels
+better and answers more of them.
+
+The embedder is pluggable. Anything with an `embed_query(text)` method works,
+so a LangChain `Embeddings` instance (e.g. a small sentence-transformer) can be
+dropped in. The default `HashingEmbedder` needs no model download at all.
+
+Run `python classifier.py labeled.jsonl` to evaluate the full routing stage
+against a labeled set (one {"text": ..., "label": ...} object per line).
+"""
+
+import hashlib
+import json
+import math
+import re
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, Iterable, Protocol, Sequence
+
+# Small labeled seed set used to build the centroids. Extend it (or pass your
+# own examples) when the evaluator shows a high fallback rate.
+SEED_EXAMPLES = [
+    ("I feel so lonely since my partner left", "emotional"),
+    ("I'm really anxious about my exam tomorrow and can't sleep", "emotional"),
+    ("My mom passed away last month and I can't stop crying", "emotional"),
+    ("I feel like nobody understands me", "emotional"),
+    ("I'm so stressed at work that I want to quit", "emotional"),
+    ("Why do I always feel worthless?", "emotional"),
+    ("I had a fight with my best friend and I feel terrible", "emotional"),
+    ("I'm scared that I'm going to fail again", "emotional"),
+    ("I've been feeling depressed and unmotivated lately", "emotional"),
+    ("I'm heartbroken and don't know how to move on", "emotional"),
+    ("I feel overwhelmed by everything going on in my life", "emotional"),
+    ("I'm angry at myself for the mistakes I made", "emotional"),
+    ("Can you help me deal with my grief?", "emotional"),
+    ("I feel guilty all the time and it's exhausting", "emotional"),
+    ("I'm so happy but also nervous about the wedding", "emotional"),
+    ("I don't feel like myself anymore", "emotional"),
+    ("What is the capital of Australia?", "logical"),
+    ("How do I reverse a list in Python?", "logical"),
+    ("Explain how photosynthesis works", "logical"),
+    ("What is the difference between TCP and UDP?", "logical"),
+    ("Calculate 15% of 240", "logical"),
+    ("How many planets are in the solar system?", "logical"),
+    ("What are the steps to change a car tire?", "logical"),
+    ("Summarize the causes of World War I", "logical"),
+    ("Which is faster, quicksort or mergesort?", "logical"),
+    ("How does compound interest work?", "logical"),
+    ("Give me a recipe for pancakes", "logical"),
+    ("What year did the Berlin Wall fall?", "logical"),
+    ("Convert 100 degrees Fahrenheit to Celsius", "logical"),
+    ("What are the pros and cons of renting versus buying a house?", "logical"),
+    ("How do vaccines train the immune system?", "logical"),
+    ("Write a SQL query that counts rows per day", "logical"),
+]
+
+# Held-out labeled messages, not used for the centroids, that set the
+# confidence threshold. Many lean on words of the other label ("I feel...",
+# "stressed", "grief"): a lexical embedder is confidently wrong about those,
+# and they must still reach the LLM.
+CALIBRATION_EXAMPLES = [
+    ("Why do I feel tired after eating?", "logical"),
+    ("I feel like I should learn Rust, which book is best?", "logical"),
+    ("I feel the car shakes when I brake, what's wrong?", "logical"),
+    ("What causes anxiety attacks physiologically?", "logical"),
+    ("How long does grief counseling usually take to schedule?", "logical"),
+    ("I'm stressed about choosing a database, Postgres or MySQL?", "logical"),
+    ("What is the boiling point of water at altitude?", "logical"),
+    ("How do I sort a dictionary by value in Python?", "logical"),
+    ("Explain the difference between a Roth IRA and a traditional IRA", "logical"),
+    ("What's the time complexity of binary search?", "logical"),
+    ("Recommend a good book about the Roman Empire", "logical"),
+    ("How do I fix a leaking faucet?", "logical"),
+    ("What is the population of Canada?", "logical"),
+    ("Translate 'good morning' into Spanish", "logical"),
+    ("How many calories are in a banana?", "logical"),
+    ("What is the derivative of x squared?", "logical"),
+    ("Write a bash loop over all files in a folder", "logical"),
+    ("Compare electric and gas cars on running costs", "logical"),
+    ("I feel lost since I moved to a new city and have no friends", "emotional"),
+    ("I'm terrified of losing my job and I can't stop worrying", "emotional"),
+    ("My dog died yesterday and the house feels empty", "emotional"),
+    ("I hate myself for what I said to her", "emotional"),
+    ("I'm so lonely on weekends", "emotional"),
+    ("I can't stop crying and I don't know why", "emotional"),
+    ("My parents are divorcing and I feel like it's my fault", "emotional"),
+    ("I feel anxious every time my phone rings", "emotional"),
+    ("Nobody at school talks to me and it hurts", "emotional"),
+    ("I'm exhausted from pretending everything is okay", "emotional"),
+    ("I feel so ashamed about failing my driving test", "emotional"),
+    ("My boyfriend cheated on me and I'm devastated", "emotional"),
+    ("I'm nervous about my first therapy session", "emotional"),
+    ("I feel empty even when good things happen", "emotional"),
+]
+
+
+class Embedder(Protocol):
+    def embed_query(self, text: str) -> Sequence[float]: ...
+
+
+class HashingEmbedder:
+    """Dependency-free embedder: hashed word and character n-gram counts.
+
+    Vectors are L2-normalised so a dot product is a cosine similarity.
+    """
+
+    def __init__(self, dimensions: int = 1024, ngram_range: tuple[int, int] = (3, 5)):
+        self.dimensions = dimensions
+        self.ngram_range = ngram_range
+
+    def _features(self, text: str) -> Iterable[str]:
+        text = text.lower()
+        for word in re.findall(r"[a-z0-9']+", text):
+            yield "w:" + word
+        padded = " " + re.sub(r"\s+", " ", text) + " "
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(padded) - n + 1):
+                yield padded[i:i + n]
+
+    def embed_query(self, text: str) -> list[float]:
+        vector = [0.0] * self.dimensions
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+            bucket = int.from_bytes(digest[:4], "little") % self.dimensions
+            sign = 1.0 if digest[4] & 1 else -1.0
+            vector[bucket] += sign
+        return _normalise(vector)
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return [self.embed_query(text) for text in texts]
+
+
+def _normalise(vector: Sequence[float]) -> list[float]:
+    norm = math.sqrt(sum(v * v for v in vector))
+    if norm == 0.0:
+        return list(vector)
+    return [v / norm for v in vector]
+
+
+def _dot(a: Sequence[float], b: Sequence[float]) -> float:
+    return sum(x * y for x, y in zip(a, b))
+
+
+@dataclass
+class Prediction:
+    label: str
+    confidence: float
+
+
+class CentroidClassifier:
+    """Nearest-centroid classifier over message embeddings.
+
+    Confidence is a temperature-scaled softmax over the centroid
+    similarities; `classify` returns None when it falls below `threshold`
+    (by default calibrated on `calibration`, see `calibrate`).
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder | None = None,
+        examples: Iterable[tuple[str, str]] = SEED_EXAMPLES,
+        threshold: float | None = None,
+        temperature: float = 0.1,
+        calibration: Iterable[tuple[str, str]] = CALIBRATION_EXAMPLES,
+    ):
+        self.embedder = embedder or HashingEmbedder()
+        self.temperature = temperature
+        self.centroids = self._fit(examples)
+        self.threshold = threshold if threshold is not None else self.calibrate(calibration)
+
+    def _fit(self, examples: Iterable[tuple[str, str]]) -> dict[str, list[float]]:
+        sums: dict[str, list[float]] = {}
+        for text, label in examples:
+            vector = _normalise(self.embedder.embed_query(text))
+            if label not in sums:
+                sums[label] = [0.0] * len(vector)
+            sums[label] = [s + v for s, v in zip(sums[label], vector)]
+        if len(sums) < 2:
+            raise ValueError("CentroidClassifier needs examples for at least two labels")
+        return {label: _normalise(total) for label, total in sums.items()}
+
+    def predict(self, text: str) -> Prediction:
+        vector = _normalise(self.embedder.embed_query(text))
+        scores = {label: _dot(vector, c) for label, c in self.centroids.items()}
+        best = max(scores.values())
+        weights = {label: math.exp((s - best) / self.temperature) for label, s in scores.items()}
+        total = sum(weights.values())
+        label = max(weights, key=weights.get)
+        return Prediction(label=label, confidence=weights[label] / total)
+
+    def calibrate(self, labeled: Iterable[tuple[str, str]], margin: float = 0.01) -> float:
+        """Threshold just above the most confident mistake on `labeled`, which must not be training examples.
+
+        Above 1.0 (every message falls back) if a mistake is that confident.
+        """
+        mistakes = [p.confidence for text, label in labeled if (p := self.predict(text)).label != label]
+        return max(mistakes, default=0.5) + margin
+
+    def classify(self, text: str) -> str | None:
+        prediction = self.predict(text)
+        if prediction.confidence < self.threshold:
+            return None
+        return prediction.label
+
+
+@dataclass
+class EvalReport:
+    total: int
+    accuracy: float
+    fallback_rate: float
+    p50_ms: float
+    p99_ms: float
+
+    def __str__(self):
+        return (
+            f"examples={self.total} accuracy={self.accuracy:.3f} "
+            f"fallback_rate={self.fallback_rate:.3f} "
+            f"p50={self.p50_ms:.2f}ms p99={self.p99_ms:.2f}ms"
+        )
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def evaluate(
+    route: Callable[[str], tuple[str, bool]],
+    labeled: Iterable[tuple[str, str]],
+) -> EvalReport:
+    """Score a routing function on (text, label) pairs.
+
+    `route` returns (message_type, used_fallback) for a message, which is
+    exactly what `agents.route_message` does.
+    """
+    correct = fallbacks = total = 0
+    latencies = []
+    for text, label in labeled:
+        start = time.perf_counter()
+        predicted, used_fallback = route(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+        total += 1
+        correct += predicted == label
+        fallbacks += used_fallback
+    if total == 0:
+        raise ValueError("labeled set is empty")
+    return EvalReport(
+        total=total,
+        accuracy=correct / total,
+        fallback_rate=fallbacks / total,
+        p50_ms=_percentile(latencies, 50),
+        p99_ms=_percentile(latencies, 99),
+    )
+
+
+def load_labeled(path: str) -> list[tuple[str, str]]:
+    with open(path, encoding="utf-8") as f:
+        rows = [json.loads(line) for line in f if line.strip()]
+    return [(row["text"], row["label"]) for row in rows]
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("usage: python classifier.py labeled.jsonl")
+        sys.exit(1)
+
+    from agents import route_message
+
+    print(evaluate(route_message, load_labeled(sys.argv[1])))
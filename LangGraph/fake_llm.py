@@ -0,0 +1,202 @@
+"""Deterministic offline stand-in for ChatGoogleGenerativeAI.
+
+`FakeChatModel` is a real LangChain chat model, so it works everywhere the
+Gemini client does: plain invoke/ainvoke, token streaming,
+`with_structured_output` and `bind_tools`. Replies come from a script (or a
+callback) instead of the network, and latency is synthetic and configurable,
+which makes it possible to benchmark the graph and orchestration code on its
+own.
+
+    from fake_llm import FakeChatModel
+    agents.set_llm(FakeChatModel(
+        script=["Hello!", {"tool_calls": [{"name": "lookup", "args": {"q": "x"}}]}],
+        structured={"MessageClassifier": {"message_type": "emotional"}},
+        latency_s=0.3,
+        tokens_per_s=80,
+    ))
+
+Script entries are used in order and cycle. Each one is a string, an
+AIMessage, or a dict with "content" and/or "tool_calls". `structured` maps a
+schema class name to the data (or a callable taking the messages) returned by
+`with_structured_output`; unknown schemas get the first allowed value of
+every field. Structured output goes through the stock tool-calling path, so
+it is a normal model call with callbacks and usage metadata.
+"""
+
+import asyncio
+import json
+import re
+import time
+import types
+import typing
+from typing import Any, AsyncIterator, Callable, Iterator
+from uuid import uuid4
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.utils.function_calling import convert_to_openai_tool
+from pydantic import BaseModel, Field, PrivateAttr
+
+
+def _tokens(text: str) -> list[str]:
+    return re.findall(r"\S+\s*", text) or ([text] if text else [])
+
+
+def _count_tokens(messages: list[BaseMessage]) -> int:
+    return sum(len(_tokens(m.content if isinstance(m.content, str) else str(m.content)))
+               for m in messages)
+
+
+def _default_value(annotation):
+    origin = typing.get_origin(annotation)
+    if origin is typing.Literal:
+        return typing.get_args(annotation)[0]
+    if origin in (list, tuple, set):
+        return []
+    if origin is dict:
+        return {}
+    if origin in (typing.Union, types.UnionType):
+        args = [a for a in typing.get_args(annotation) if a is not type(None)]
+        return _default_value(args[0]) if args else None
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return default_data(annotation)
+    return {str: "", int: 0, float: 0.0, bool: False}.get(annotation)
+
+
+def default_data(schema: type[BaseModel]) -> dict:
+    """Placeholder data that validates against `schema`."""
+    return {name: _default_value(field.annotation) for name, field in schema.model_fields.items()}
+
+
+class FakeChatModel(BaseChatModel):
+    script: list[Any] = Field(default_factory=lambda: ["This is a scripted reply."])
+    respond: Callable[[list[BaseMessage]], Any] | None = None
+    structured: dict[str, Any] = Field(default_factory=dict)
+    latency_s: float = 0.0
+    tokens_per_s: float | None = None
+
+    # Totals across all calls, for benchmarks.
+    calls: int = 0
+    model_time_s: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+
+    _cursor: int = PrivateAttr(default=0)
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _next_message(self, messages: list[BaseMessage], structured_schema=None) -> AIMessage:
+        if structured_schema is not None:
+            name, data = self._structured_data(structured_schema, messages)
+            item = {"tool_calls": [{"name": name, "args": data}]}
+        elif self.respond is not None:
+            item = self.respond(messages)
+        else:
+            item = self.script[self._cursor % len(self.script)]
+            self._cursor += 1
+
+        if isinstance(item, AIMessage):
+            message = item.model_copy()
+        elif isinstance(item, dict):
+            tool_calls = [
+                {
+                    "name": call["name"],
+                    "args": call.get("args", {}),
+                    "id": call.get("id") or f"call_{uuid4().hex[:12]}",
+                    "type": "tool_call",
+                }
+                for call in item.get("tool_calls", [])
+            ]
+            message = AIMessage(content=item.get("content", ""), tool_calls=tool_calls)
+        else:
+            message = AIMessage(content=str(item))
+
+        input_tokens = _count_tokens(messages)
+        if structured_schema is not None:
+            output_tokens = len(_tokens(json.dumps(message.tool_calls[0]["args"])))
+        else:
+            output_tokens = len(_tokens(message.content)) + 8 * len(message.tool_calls)
+        message.usage_metadata = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        self.calls += 1
+        self.input_tokens += input_tokens
+        self.output_tokens += output_tokens
+        return message
+
+    def _token_delay(self) -> float:
+        return 1.0 / self.tokens_per_s if self.tokens_per_s else 0.0
+
+    def _total_delay(self, output_tokens: int) -> float:
+        return self.latency_s + output_tokens * self._token_delay()
+
+    def _sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+        self.model_time_s += seconds
+
+    async def _asleep(self, seconds: float) -> None:
+        if seconds > 0:
+            await asyncio.sleep(seconds)
+        self.model_time_s += seconds
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._next_message(messages, kwargs.get("structured_schema"))
+        self._sleep(self._total_delay(message.usage_metadata["output_tokens"]))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        message = self._next_message(messages, kwargs.get("structured_schema"))
+        await self._asleep(self._total_delay(message.usage_metadata["output_tokens"]))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _chunks(self, message: AIMessage) -> list[AIMessageChunk]:
+        chunks = [AIMessageChunk(content=token) for token in _tokens(message.content)]
+        last = AIMessageChunk(
+            content="",
+            tool_call_chunks=[
+                {"name": c["name"], "args": json.dumps(c["args"]), "id": c["id"], "index": i}
+                for i, c in enumerate(message.tool_calls)
+            ],
+            usage_metadata=message.usage_metadata,
+        )
+        return chunks + [last]
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        message = self._next_message(messages, kwargs.get("structured_schema"))
+        self._sleep(self.latency_s)
+        for chunk in self._chunks(message):
+            if chunk.content:
+                self._sleep(self._token_delay())
+            yield ChatGenerationChunk(message=chunk)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        message = self._next_message(messages, kwargs.get("structured_schema"))
+        await self._asleep(self.latency_s)
+        for chunk in self._chunks(message):
+            if chunk.content:
+                await self._asleep(self._token_delay())
+            yield ChatGenerationChunk(message=chunk)
+
+    def bind_tools(self, tools, **kwargs):
+        # Tool calls come from the script, so binding only has to be accepted.
+        # `with_structured_output` binds its schema through here; that call is
+        # answered from `structured` instead of the script.
+        structured = kwargs.get("ls_structured_output_format")
+        if structured:
+            kwargs["structured_schema"] = structured["schema"]
+        return self.bind(**kwargs)
+
+    def _structured_data(self, schema, messages: list[BaseMessage]) -> tuple[str, Any]:
+        name = convert_to_openai_tool(schema)["function"]["name"]
+        data = self.structured.get(name)
+        if callable(data):
+            data = data(messages)
+        if data is None and isinstance(schema, type) and issubclass(schema, BaseModel):
+            data = default_data(schema)
+        return name, data
@@ -0,0 +1,367 @@
+"""Per-node timing and token instrumentation for the router graph.
+
+`GraphMetrics.instrument(graph_builder)` makes every node added through
+`graph_builder.add_node` record, per execution:
+
+- wall_s:         time spent in the node
+- model_s:        time spent in chat model calls made by the node
+- input_tokens / output_tokens: usage reported by those model calls
+- state_messages / state_chars: size of the message history the node saw
+
+`GraphMetrics.attach(compiled_graph)` additionally times whole runs, so the
+time LangGraph spends between nodes (the runtime overhead) shows up as
+run wall time minus node wall time.
+
+    metrics = GraphMetrics(jsonl_path="tmp/node_metrics.jsonl")
+    graph = agents.build_graph(metrics=metrics)
+    ...
+    print(metrics.prometheus())
+
+Samples are appended to the JSON lines file as they are recorded, and
+`prometheus()` renders cumulative counters and a wall-time histogram per
+node in the Prometheus text format. Graphs built without metrics are not
+wrapped at all, and a wrapped graph whose metrics are disabled pays one
+attribute check per node.
+"""
+
+import json
+import threading
+import time
+from collections import defaultdict, deque
+from dataclasses import asdict, dataclass, field
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.runnables import Runnable, RunnableLambda
+from langchain_core.runnables.config import var_child_runnable_config
+from langchain_core.runnables.utils import accepts_config
+
+WALL_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+@dataclass
+class NodeSample:
+    node: str
+    started_at: float
+    wall_s: float
+    model_s: float = 0.0
+    model_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    state_messages: int = 0
+    state_chars: int = 0
+    error: str | None = None
+
+
+@dataclass
+class RunSample:
+    started_at: float
+    wall_s: float
+    node_wall_s: float
+
+    @property
+    def overhead_s(self) -> float:
+        return max(0.0, self.wall_s - self.node_wall_s)
+
+
+@dataclass
+class _Totals:
+    count: int = 0
+    errors: int = 0
+    wall_s: float = 0.0
+    model_s: float = 0.0
+    model_calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    state_messages: int = 0
+    buckets: list[int] = field(default_factory=lambda: [0] * len(WALL_BUCKETS))
+
+
+def _state_size(state) -> tuple[int, int]:
+    messages = state.get("messages") if isinstance(state, dict) else None
+    if not messages:
+        return 0, 0
+    chars = 0
+    for message in messages:
+        content = message.get("content") if isinstance(message, dict) else getattr(message, "content", "")
+        chars += len(content) if isinstance(content, str) else len(str(content))
+    return len(messages), chars
+
+
+def _usage(response) -> tuple[int, int]:
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                return usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    usage = (response.llm_output or {}).get("token_usage") or {}
+    return usage.get("prompt_tokens", 0), usage.get("completion_tokens", 0)
+
+
+class _ModelUsage(BaseCallbackHandler):
+    """Collects model time and tokens for the calls made inside one node."""
+
+    run_inline = True
+
+    def __init__(self, sample: NodeSample):
+        self.sample = sample
+        self._starts: dict[UUID, float] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_start(self, serialized, prompts, *, run_id, **kwargs):
+        self._starts[run_id] = time.perf_counter()
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            self.sample.model_s += time.perf_counter() - start
+        input_tokens, output_tokens = _usage(response)
+        self.sample.model_calls += 1
+        self.sample.input_tokens += input_tokens
+        self.sample.output_tokens += output_tokens
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        start = self._starts.pop(run_id, None)
+        if start is not None:
+            self.sample.model_s += time.perf_counter() - start
+
+
+class _RunTimer(BaseCallbackHandler):
+    """Times root graph runs and the node runs directly under them."""
+
+    run_inline = True
+
+    def __init__(self, metrics: "GraphMetrics"):
+        self.metrics = metrics
+        self._runs: dict[UUID, list[float]] = {}
+        self._nodes: dict[UUID, tuple[UUID, float]] = {}
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        if not self.metrics.enabled:
+            return
+        if parent_run_id is None:
+            self._runs[run_id] = [time.time(), time.perf_counter(), 0.0]
+        elif parent_run_id in self._runs:
+            self._nodes[run_id] = (parent_run_id, time.perf_counter())
+
+    def _end(self, run_id):
+        node = self._nodes.pop(run_id, None)
+        if node is not None:
+            parent, start = node
+            if parent in self._runs:
+                self._runs[parent][2] += time.perf_counter() - start
+            return
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            started_at, start, node_wall_s = run
+            self.metrics.record_run(RunSample(started_at, time.perf_counter() - start, node_wall_s))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+
+def _with_handler(config, handler):
+    callbacks = config.get("callbacks")
+    if callbacks is None:
+        callbacks = [handler]
+    elif isinstance(callbacks, list):
+        callbacks = [*callbacks, handler]
+    else:
+        callbacks = callbacks.copy()
+        callbacks.add_handler(handler, inherit=True)
+    return {**config, "callbacks": callbacks}
+
+
+class GraphMetrics:
+    def __init__(self, enabled: bool = True, jsonl_path: str | None = None, keep: int = 10_000):
+        self.enabled = enabled
+        self.jsonl_path = jsonl_path
+        self.samples: deque[NodeSample] = deque(maxlen=keep)
+        self.runs: deque[RunSample] = deque(maxlen=keep)
+        self._totals: dict[str, _Totals] = defaultdict(_Totals)
+        self._run_totals = [0, 0.0, 0.0]  # runs, wall_s, overhead_s
+        self._lock = threading.Lock()
+        self._jsonl = None
+
+    def instrument(self, graph_builder):
+        """Wrap every node subsequently added to `graph_builder`."""
+        add_node = graph_builder.add_node
+
+        def instrumented_add_node(node, action=None, **kwargs):
+            if action is None:
+                # add_node(func) form: the node is named after the function.
+                node, action = getattr(node, "name", None) or node.__name__, node
+            return add_node(node, self.wrap(node, action), **kwargs)
+
+        graph_builder.add_node = instrumented_add_node
+        return graph_builder
+
+    def attach(self, graph):
+        """Return `graph` with whole-run timing added (a copy; LangGraph's with_config)."""
+        return graph.with_config(callbacks=[_RunTimer(self)])
+
+    def wrap(self, name: str, action):
+        # Wrap the node's own callables rather than nesting its runnable, so
+        # the wrapper does not add a traced run of its own.
+        if isinstance(action, RunnableLambda):
+            func, afunc = getattr(action, "func", None), getattr(action, "afunc", None)
+        elif isinstance(action, Runnable):
+            func, afunc = action.invoke, action.ainvoke
+        else:
+            func, afunc = action, None
+        func_config = func is not None and accepts_config(func)
+        afunc_config = afunc is not None and accepts_config(afunc)
+
+        def start(state, config):
+            messages, chars = _state_size(state)
+            sample = NodeSample(name, time.time(), 0.0, state_messages=messages, state_chars=chars)
+            config = _with_handler(config, _ModelUsage(sample))
+            # Model calls inside the node pick their callbacks up from here.
+            return sample, config, var_child_runnable_config.set(config)
+
+        def finish(sample, token, begin):
+            var_child_runnable_config.reset(token)
+            sample.wall_s = time.perf_counter() - begin
+            self.record(sample)
+
+        def run(state, config):
+            if not self.enabled:
+                return func(state, config) if func_config else func(state)
+            sample, config, token = start(state, config)
+            begin = time.perf_counter()
+            try:
+                return func(state, config) if func_config else func(state)
+            except BaseException as e:
+                sample.error = type(e).__name__
+                raise
+            finally:
+                finish(sample, token, begin)
+
+        async def arun(state, config):
+            if not self.enabled:
+                return await (afunc(state, config) if afunc_config else afunc(state))
+            sample, config, token = start(state, config)
+            begin = time.perf_counter()
+            try:
+                return await (afunc(state, config) if afunc_config else afunc(state))
+            except BaseException as e:
+                sample.error = type(e).__name__
+                raise
+            finally:
+                finish(sample, token, begin)
+
+        if not isinstance(action, Runnable):
+            # Plain functions stay plain, so LangGraph runs them the way it
+            # would have run the original.
+            return run
+        return RunnableLambda(run if func is not None else arun,
+                              afunc=arun if afunc is not None else None, name=name)
+
+    def record(self, sample: NodeSample) -> None:
+        with self._lock:
+            self.samples.append(sample)
+            totals = self._totals[sample.node]
+            totals.count += 1
+            totals.errors += sample.error is not None
+            totals.wall_s += sample.wall_s
+            totals.model_s += sample.model_s
+            totals.model_calls += sample.model_calls
+            totals.input_tokens += sample.input_tokens
+            totals.output_tokens += sample.output_tokens
+            totals.state_messages = sample.state_messages
+            for i, bound in enumerate(WALL_BUCKETS):
+                if sample.wall_s <= bound:
+                    totals.buckets[i] += 1
+            self._write({"type": "node", **asdict(sample)})
+
+    def record_run(self, run: RunSample) -> None:
+        with self._lock:
+            self.runs.append(run)
+            self._run_totals[0] += 1
+            self._run_totals[1] += run.wall_s
+            self._run_totals[2] += run.overhead_s
+            self._write({"type": "run", **asdict(run), "overhead_s": run.overhead_s})
+
+    def _write(self, record: dict) -> None:
+        if self.jsonl_path is None:
+            return
+        if self._jsonl is None:
+            self._jsonl = open(self.jsonl_path, "a", encoding="utf-8")
+        self._jsonl.write(json.dumps(record) + "\n")
+        self._jsonl.flush()
+
+    def write_jsonl(self, path: str) -> int:
+        """Dump the retained samples to `path`; returns the number of lines."""
+        with self._lock, open(path, "w", encoding="utf-8") as f:
+            for sample in self.samples:
+                f.write(json.dumps({"type": "node", **asdict(sample)}) + "\n")
+            for run in self.runs:
+                f.write(json.dumps({"type": "run", **asdict(run), "overhead_s": run.overhead_s}) + "\n")
+            return len(self.samples) + len(self.runs)
+
+    def prometheus(self, prefix: str = "langgraph") -> str:
+        """Cumulative per-node counters in the Prometheus text exposition format."""
+        with self._lock:
+            totals = {node: _Totals(**asdict(t)) for node, t in self._totals.items()}
+            runs, run_wall_s, overhead_s = self._run_totals
+
+        lines = []
+
+        def metric(name, kind, help_text, values):
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            lines.append(f"# TYPE {prefix}_{name} {kind}")
+            for node, value in values:
+                labels = f'{{node="{node}"}}' if node is not None else ""
+                lines.append(f"{prefix}_{name}{labels} {value}")
+
+        def per_node(attr):
+            return [(node, getattr(t, attr)) for node, t in sorted(totals.items())]
+
+        metric("node_calls_total", "counter", "Node executions.", per_node("count"))
+        metric("node_errors_total", "counter", "Node executions that raised.", per_node("errors"))
+        metric("node_model_seconds_total", "counter", "Time spent in model calls.", per_node("model_s"))
+        metric("node_model_calls_total", "counter", "Model calls made by the node.", per_node("model_calls"))
+        metric("node_input_tokens_total", "counter", "Model input tokens.", per_node("input_tokens"))
+        metric("node_output_tokens_total", "counter", "Model output tokens.", per_node("output_tokens"))
+        metric("node_state_messages", "gauge", "Messages in the state at the last execution.",
+               per_node("state_messages"))
+
+        lines.append(f"# HELP {prefix}_node_wall_seconds Wall time per node execution.")
+        lines.append(f"# TYPE {prefix}_node_wall_seconds histogram")
+        for node, t in sorted(totals.items()):
+            for bound, count in zip(WALL_BUCKETS, t.buckets):
+                lines.append(f'{prefix}_node_wall_seconds_bucket{{node="{node}",le="{bound}"}} {count}')
+            lines.append(f'{prefix}_node_wall_seconds_bucket{{node="{node}",le="+Inf"}} {t.count}')
+            lines.append(f'{prefix}_node_wall_seconds_sum{{node="{node}"}} {t.wall_s}')
+            lines.append(f'{prefix}_node_wall_seconds_count{{node="{node}"}} {t.count}')
+
+        metric("runs_total", "counter", "Graph runs.", [(None, runs)])
+        metric("run_seconds_total", "counter", "Graph run wall time.", [(None, run_wall_s)])
+        metric("run_overhead_seconds_total", "counter",
+               "Run wall time not spent inside any node.", [(None, overhead_s)])
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """Human-readable per-node table of means."""
+        with self._lock:
+            rows = sorted(self._totals.items())
+            runs, run_wall_s, overhead_s = self._run_totals
+        out = [f"{'node':<14} {'calls':>6} {'wall ms':>9} {'model ms':>9} {'in tok':>7} {'out tok':>8}"]
+        for node, t in rows:
+            n = max(t.count, 1)
+            out.append(f"{node:<14} {t.count:>6} {t.wall_s / n * 1000:>9.2f} {t.model_s / n * 1000:>9.2f} "
+                       f"{t.input_tokens / n:>7.0f} {t.output_tokens / n:>8.0f}")
+        if runs:
+            out.append(f"runs: {runs}, mean {run_wall_s / runs * 1000:.2f}ms, "
+                       f"graph overhead {overhead_s / runs * 1000:.2f}ms/run")
+        return "\n".join(out)
+
+    def close(self) -> None:
+        if self._jsonl is not None:
+            self._jsonl.close()
+            self._jsonl = None
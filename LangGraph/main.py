@@ -1,40 +1,54 @@
-from dotenv import load_dotenv
-from typing import Annotated, Literal
+import sys
+from functools import cache
+from typing import Annotated
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
-from langchain_google_genai import ChatGoogleGenerativeAI
-from pydantic import BaseModel, Field
 from typing_extensions import TypedDict
-from IPython.display import Image, display
+from streaming import stream_reply
 
-load_dotenv()
-
-llm = ChatGoogleGenerativeAI(
-    model="gemini-2.5-flash"
-)
 
 class State(TypedDict):
     messages: Annotated[list, add_messages]
 
-graph_builder = StateGraph(State)
+
+@cache
+def get_llm():
+    from dotenv import load_dotenv
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    load_dotenv()
+    return ChatGoogleGenerativeAI(
+        model="gemini-2.5-flash"
+    )
+
 
 def chatbot(state: State):
-    return {"messages":[llm.invoke(state["messages"])]}
+    return {"messages":[get_llm().invoke(state["messages"])]}
+
+
+@cache
+def get_graph():
+    graph_builder = StateGraph(State)
 
+    graph_builder.add_node("chatbot", chatbot)
 
-graph_builder.add_node("chatbot", chatbot)
+    graph_builder.add_edge(START, "chatbot")
+    graph_builder.add_edge("chatbot", END)
 
-graph_builder.add_edge(START, "chatbot")
-graph_builder.add_edge("chatbot", END)
+    return graph_builder.compile()
 
-graph = graph_builder.compile()
 
-user_input = input("Enter a message: ")
-state = graph.invoke({"messages":[{"role":"user", "content": user_input}]})
+if __name__ == "__main__":
+    graph = get_graph()
 
-print(state["messages"][-1].content)
+    user_input = input("Enter a message: ")
+    result = stream_reply(graph, {"messages":[{"role":"user", "content": user_input}]}, nodes=("chatbot",))
+    print()
+    print(f"[{result.stats}]")
 
-try:
-    print(graph.get_graph().draw_ascii())
-except Exception as e:
-    print(e)
+    # Drawing pulls in grandalf, so only do it when asked: python main.py --draw
+    if "--draw" in sys.argv[1:]:
+        try:
+            print(graph.get_graph().draw_ascii())
+        except Exception as e:
+            print(e)
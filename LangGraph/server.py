@@ -0,0 +1,328 @@
+"""Asyncio chat service for the router graph.
+
+Serves many concurrent chat sessions from one process against a single
+compiled graph. Every session is a checkpointer thread, so sessions never
+see each other's state, and all of them share the one model client created
+in agents.py (and its HTTP connection pool).
+
+Load is controlled in two layers: at most `max_concurrency` turns run at a
+time, and at most `max_pending` turns may be waiting or running. Past that,
+requests are rejected with an "overloaded" error straight away instead of
+queueing without bound. On SIGINT/SIGTERM the server stops accepting
+connections, lets in-flight turns finish within a grace period and then
+cancels whatever is left.
+
+The wire protocol is JSON lines over TCP. Each request is
+
+    {"session_id": "alice", "message": "hi", "stream": true}
+
+and is answered with zero or more {"session_id", "token"} lines (when
+streaming) followed by one {"session_id", "reply", "done": true, "ttft_s"}
+line, or an {"session_id", "error"} line; a request that cannot be served
+(missing fields, a failed model call) is also answered with an error line
+and the connection stays open. {"session_id": ..., "end": true} drops a
+session's state. When started with --metrics, {"metrics": true} is answered
+with {"metrics": <Prometheus text snapshot>}.
+
+Session state is bounded: each session keeps only its newest
+--keep-checkpoints checkpoints (checkpoints.py), and sessions idle for
+--session-ttl seconds are dropped (by default after an hour in memory, never
+with --db).
+
+    python server.py --port 8765 --max-concurrency 200
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import signal
+import weakref
+from typing import AsyncIterator
+
+import agents
+from streaming import StreamStats, astream_tokens
+
+
+class Overloaded(Exception):
+    pass
+
+
+class ShuttingDown(Exception):
+    pass
+
+
+class BadRequest(Exception):
+    pass
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_SESSION_TTL_S = 3600.0
+
+
+class ChatServer:
+    def __init__(self, graph, checkpointer, max_concurrency: int = 100, max_pending: int = 1000,
+                 metrics=None, session_ttl_s: float | None = None):
+        self.graph = graph
+        self.checkpointer = checkpointer
+        self.metrics = metrics
+        self.max_pending = max_pending
+        self.session_ttl_s = session_ttl_s
+        self._slots = asyncio.Semaphore(max_concurrency)
+        self._session_locks: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+        self._last_used: dict[str, float] = {}
+        self._pending = 0
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._closing = False
+        self._turns: set[asyncio.Task] = set()
+        self._server: asyncio.Server | None = None
+
+    def _session_lock(self, session_id: str) -> asyncio.Lock:
+        lock = self._session_locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._session_locks[session_id] = lock
+        return lock
+
+    async def chat(self, session_id: str, message: str,
+                   stats: StreamStats | None = None) -> AsyncIterator[str]:
+        """Run one turn for a session and yield reply tokens as they arrive."""
+        if self._closing:
+            raise ShuttingDown()
+        if self._pending >= self.max_pending:
+            raise Overloaded()
+
+        self._pending += 1
+        self._idle.clear()
+        self._touch(session_id)
+        task = asyncio.current_task()
+        self._turns.add(task)
+        try:
+            # Turns of one session are serialised so they cannot interleave
+            # their checkpoint writes; different sessions only share the slots.
+            async with self._session_lock(session_id), self._slots:
+                async for token in astream_tokens(
+                    self.graph,
+                    {"messages": [{"role": "user", "content": message}], "message_type": None},
+                    config={"configurable": {"thread_id": session_id}},
+                    stats=stats,
+                ):
+                    yield token
+        finally:
+            self._pending -= 1
+            self._turns.discard(task)
+            self._touch(session_id)
+            if self._pending == 0:
+                self._idle.set()
+
+    def _touch(self, session_id: str) -> None:
+        # Idle times are only needed (and only kept) when sessions expire.
+        if self.session_ttl_s:
+            self._last_used[session_id] = asyncio.get_running_loop().time()
+
+    async def end_session(self, session_id: str) -> None:
+        # Waits for a running turn, so its checkpoint write cannot land after
+        # the delete and its bookkeeping cannot revive the session.
+        async with self._session_lock(session_id):
+            self._last_used.pop(session_id, None)
+            await self.checkpointer.adelete_thread(session_id)
+
+    async def expire_sessions(self) -> int:
+        """Drop the state of sessions idle for longer than `session_ttl_s`."""
+        if not self.session_ttl_s:
+            return 0
+        cutoff = asyncio.get_running_loop().time() - self.session_ttl_s
+        expired = 0
+        for session_id, last_used in list(self._last_used.items()):
+            lock = self._session_locks.get(session_id)
+            if last_used > cutoff or (lock is not None and lock.locked()):
+                continue
+            await self.end_session(session_id)
+            expired += 1
+        return expired
+
+    async def _expire_periodically(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.session_ttl_s, 60.0))
+            try:
+                await self.expire_sessions()
+            except Exception:
+                logger.exception("expiring idle sessions failed")
+
+    async def _handle_request(self, request: dict, writer: asyncio.StreamWriter) -> None:
+        if not isinstance(request, dict):
+            raise BadRequest("request must be a JSON object")
+        if request.get("metrics"):
+            text = self.metrics.prometheus() if self.metrics is not None else ""
+            await self._send(writer, {"metrics": text})
+            return
+        session_id = request.get("session_id")
+        if not session_id or not isinstance(session_id, str):
+            raise BadRequest("session_id is required")
+        if request.get("end"):
+            await self.end_session(session_id)
+            await self._send(writer, {"session_id": session_id, "done": True})
+            return
+        message = request.get("message")
+        if not isinstance(message, str) or not message.strip():
+            raise BadRequest("message is required")
+
+        stream = request.get("stream", False)
+        stats = StreamStats()
+        parts = []
+        async for token in self.chat(session_id, message, stats):
+            parts.append(token)
+            if stream:
+                await self._send(writer, {"session_id": session_id, "token": token})
+        await self._send(writer, {
+            "session_id": session_id,
+            "reply": "".join(parts),
+            "done": True,
+            "ttft_s": stats.ttft_s,
+        })
+
+    @staticmethod
+    def _error(request, error: Exception) -> dict:
+        if isinstance(error, Overloaded):
+            text = "overloaded"
+        elif isinstance(error, ShuttingDown):
+            text = "shutting down"
+        elif isinstance(error, BadRequest):
+            text = str(error)
+        else:
+            logger.exception("request failed")
+            text = f"internal error: {type(error).__name__}"
+        session_id = request.get("session_id") if isinstance(request, dict) else None
+        return {"session_id": session_id, "error": text} if session_id else {"error": text}
+
+    async def _send(self, writer: asyncio.StreamWriter, payload: dict) -> None:
+        writer.write((json.dumps(payload) + "\n").encode())
+        # drain() is where a slow client pushes back on us.
+        await writer.drain()
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except json.JSONDecodeError:
+                    await self._send(writer, {"error": "invalid json"})
+                    continue
+                try:
+                    await self._handle_request(request, writer)
+                except (ConnectionResetError, BrokenPipeError):
+                    raise
+                except Exception as e:
+                    await self._send(writer, self._error(request, e))
+        except (ConnectionResetError, BrokenPipeError):
+            pass
+        finally:
+            writer.close()
+            with contextlib.suppress(Exception):
+                await writer.wait_closed()
+
+    async def serve(self, host: str, port: int) -> None:
+        self._server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"serving on {host}:{port}")
+        expiry = asyncio.create_task(self._expire_periodically()) if self.session_ttl_s else None
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            if expiry is not None:
+                expiry.cancel()
+
+    async def shutdown(self, grace_s: float = 30.0) -> None:
+        self._closing = True
+        if self._server is not None:
+            self._server.close()
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout=grace_s)
+        except asyncio.TimeoutError:
+            for task in list(self._turns):
+                task.cancel()
+        if self._server is not None and hasattr(self._server, "close_clients"):
+            # Python 3.13+: also drop idle client connections.
+            self._server.close_clients()
+
+
+@contextlib.asynccontextmanager
+async def open_async_checkpointer(db_path: str | None, keep_checkpoints: int | None = None):
+    """Checkpointer for the server; keep_checkpoints=0 keeps every checkpoint."""
+    from langgraph.checkpoint.memory import InMemorySaver
+    from langgraph.checkpoint.sqlite.aio import AsyncSqliteSaver
+
+    from checkpoints import DEFAULT_KEEP_CHECKPOINTS, PruningAsyncSqliteSaver, PruningInMemorySaver
+
+    if keep_checkpoints is None:
+        keep_checkpoints = DEFAULT_KEEP_CHECKPOINTS
+    if db_path is None:
+        yield PruningInMemorySaver(keep=keep_checkpoints) if keep_checkpoints else InMemorySaver()
+        return
+    saver_class = PruningAsyncSqliteSaver if keep_checkpoints else AsyncSqliteSaver
+    async with saver_class.from_conn_string(db_path) as saver:
+        if keep_checkpoints:
+            saver.keep = keep_checkpoints
+        yield saver
+
+
+async def main(args) -> None:
+    metrics = None
+    if args.metrics:
+        from instrumentation import GraphMetrics
+        metrics = GraphMetrics(jsonl_path=args.metrics_jsonl)
+
+    session_ttl_s = args.session_ttl
+    if session_ttl_s is None and args.db is None:
+        session_ttl_s = DEFAULT_MEMORY_SESSION_TTL_S
+
+    async with open_async_checkpointer(args.db, args.keep_checkpoints) as checkpointer:
+        graph = agents.build_graph(
+            checkpointer=checkpointer,
+            history_window=args.history_window,
+            speculative=args.speculative,
+            metrics=metrics,
+        )
+        server = ChatServer(graph, checkpointer, args.max_concurrency, args.max_pending, metrics,
+                            session_ttl_s=session_ttl_s)
+
+        serve_task = asyncio.create_task(server.serve(args.host, args.port))
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+
+        await stop.wait()
+        print("shutting down")
+        await server.shutdown(args.grace)
+        serve_task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await serve_task
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Async multi-session chat server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--max-concurrency", type=int, default=100,
+                        help="turns running at the same time")
+    parser.add_argument("--max-pending", type=int, default=1000,
+                        help="turns running or waiting before requests are rejected")
+    parser.add_argument("--db", help="SQLite file for session state (default: in memory)")
+    parser.add_argument("--history-window", type=int, default=agents.DEFAULT_HISTORY_WINDOW)
+    parser.add_argument("--keep-checkpoints", type=int,
+                        help="checkpoints kept per session (default 10, 0 keeps all)")
+    parser.add_argument("--session-ttl", type=float,
+                        help="drop sessions idle this many seconds (default: 3600 in memory, never with --db; 0 disables)")
+    parser.add_argument("--speculative", choices=["both", "likely"])
+    parser.add_argument("--grace", type=float, default=30.0,
+                        help="seconds to let in-flight turns finish on shutdown")
+    parser.add_argument("--metrics", action="store_true",
+                        help="record per-node timing and tokens, served on {\"metrics\": true}")
+    parser.add_argument("--metrics-jsonl", metavar="PATH",
+                        help="with --metrics, also append every sample to this file")
+    asyncio.run(main(parser.parse_args()))
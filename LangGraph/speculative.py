@@ -0,0 +1,260 @@
+"""Speculative execution of the responder nodes.
+
+The regular graph runs classifier -> router -> therapist|logical, so a turn
+that needs the LLM classifier pays for two model latencies back to back.
+`SpeculativeResponder` collapses that chain into one node that starts the
+responder(s) at the same time as the classification call and cancels the
+losing branch as soon as the route is known.
+
+Modes:
+
+- "both":   start both responders; the winner is always already running.
+- "likely": start only the responder the history says is likelier; on a
+            miss the right one is started after classification.
+
+When the local pre-classifier is confident there is nothing to hide, so the
+chosen responder simply runs on its own, with the run's callbacks. Branches
+started before the route is known run silently; the winner is then tied to
+the run's callbacks, which get the tokens it has produced so far followed by
+the rest as they arrive, so token streaming and usage capture see one normal
+model call. Cancelled branches are never reported. `speculation_stats` keeps
+track of latency saved against tokens wasted on cancelled branches, to tune
+the mode.
+"""
+
+import asyncio
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from langchain_core.messages import AIMessage, convert_to_messages
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, LLMResult
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+from langchain_core.runnables.config import get_async_callback_manager_for_config
+from langgraph.constants import TAG_NOSTREAM
+
+import agents
+
+ROUTES = {"emotional": "therapist", "logical": "logical"}
+
+# Speculative branches start with no callbacks, so a cancelled one never
+# leaks tokens or usage into the run; see _Branch.promote.
+_SILENT = {"callbacks": []}
+
+
+def _estimate_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class BranchUsage:
+    input_tokens: int = 0
+    output_tokens: int = 0
+    duration_s: float = 0.0
+
+
+@dataclass
+class SpeculationStats:
+    turns: int = 0
+    local_turns: int = 0
+    hits: int = 0
+    misses: int = 0
+    latency_saved_s: float = 0.0
+    wasted_input_tokens: int = 0
+    wasted_output_tokens: int = 0
+    routes: Counter = field(default_factory=Counter)
+
+    def likeliest(self) -> str:
+        if not self.routes:
+            return "logical"
+        return max(self.routes, key=self.routes.get)
+
+    def as_dict(self) -> dict:
+        speculated = self.hits + self.misses
+        return {
+            "turns": self.turns,
+            "local_turns": self.local_turns,
+            "hit_rate": self.hits / speculated if speculated else 0.0,
+            "latency_saved_s": round(self.latency_saved_s, 3),
+            "wasted_input_tokens": self.wasted_input_tokens,
+            "wasted_output_tokens": self.wasted_output_tokens,
+        }
+
+    def __str__(self):
+        return " ".join(f"{k}={v}" for k, v in self.as_dict().items())
+
+
+speculation_stats = SpeculationStats()
+
+
+def _output_tokens(message) -> int:
+    if message is None:
+        return 0
+    usage = getattr(message, "usage_metadata", None)
+    if usage and usage.get("output_tokens"):
+        return usage["output_tokens"]
+    return _estimate_tokens(message.content) if message.content else 0
+
+
+def _reply_message(reply) -> AIMessage:
+    # Same id as the streamed chunks, so the graph's message stream does not
+    # emit the node's returned message a second time.
+    if reply is None:
+        return AIMessage(content="")
+    return AIMessage(content=reply.content, id=reply.id, usage_metadata=reply.usage_metadata,
+                     response_metadata=reply.response_metadata)
+
+
+async def _respond(node: str, text: str, usage: BranchUsage, config: RunnableConfig | None = None) -> AIMessage:
+    """Stream one responder call with `config`, keeping usage current even if cancelled."""
+    messages = agents.responder_messages(node, text)
+    usage.input_tokens = sum(_estimate_tokens(m["content"]) for m in messages)
+    start = time.perf_counter()
+    reply = None
+    try:
+        async for chunk in agents.get_llm().astream(messages, config=config):
+            reply = chunk if reply is None else reply + chunk
+        return _reply_message(reply)
+    finally:
+        usage.duration_s = time.perf_counter() - start
+        usage.output_tokens = _output_tokens(reply)
+
+
+class _Branch:
+    """A responder call started before the route is known.
+
+    It streams without callbacks into `chunks`. `promote` makes it the run's
+    model call: the run's callbacks get a chat model start, the chunks so far
+    and then every new one, and the end (or error) of the call.
+    """
+
+    def __init__(self, node: str, text: str):
+        self.node = node
+        self.messages = agents.responder_messages(node, text)
+        self.usage = BranchUsage(input_tokens=sum(_estimate_tokens(m["content"]) for m in self.messages))
+        self.chunks = []
+        self._run_manager = None
+        self.task = asyncio.create_task(self._stream())
+
+    async def _emit(self, chunk) -> None:
+        await self._run_manager.on_llm_new_token(chunk.text, chunk=ChatGenerationChunk(message=chunk))
+
+    async def _end(self, message: AIMessage) -> None:
+        await self._run_manager.on_llm_end(LLMResult(generations=[[ChatGeneration(message=message)]]))
+
+    async def _stream(self) -> AIMessage:
+        start = time.perf_counter()
+        reply = None
+        try:
+            async for chunk in agents.get_llm().astream(self.messages, config=_SILENT):
+                reply = chunk if reply is None else reply + chunk
+                self.chunks.append(chunk)
+                if self._run_manager is not None:
+                    await self._emit(chunk)
+            message = _reply_message(reply)
+            if self._run_manager is not None:
+                await self._end(message)
+            return message
+        except BaseException as e:
+            if self._run_manager is not None:
+                await self._run_manager.on_llm_error(e)
+            raise
+        finally:
+            self.usage.duration_s = time.perf_counter() - start
+            self.usage.output_tokens = _output_tokens(reply)
+
+    async def promote(self, config: RunnableConfig) -> AIMessage:
+        """Report this branch to `config`'s callbacks and return its reply."""
+        llm = agents.get_llm()
+        callback_manager = get_async_callback_manager_for_config(config)
+        run_manager = (await callback_manager.on_chat_model_start(
+            {"name": type(llm).__name__}, [convert_to_messages(self.messages)], name=type(llm).__name__
+        ))[0]
+        # Catch up on what the branch streamed before it won; chunks may keep
+        # arriving meanwhile, so hand over only once none are left.
+        replayed = 0
+        while replayed < len(self.chunks):
+            chunk = self.chunks[replayed]
+            replayed += 1
+            await run_manager.on_llm_new_token(chunk.text, chunk=ChatGenerationChunk(message=chunk))
+        self._run_manager = run_manager
+        if not self.task.done():
+            return await self.task  # _stream reports the rest, the end and any error
+        try:
+            message = self.task.result()
+        except BaseException as e:
+            await run_manager.on_llm_error(e)
+            raise
+        await self._end(message)
+        return message
+
+
+class SpeculativeResponder:
+    def __init__(self, mode: str = "both", stats: SpeculationStats | None = None):
+        if mode not in ("both", "likely"):
+            raise ValueError(f"unknown speculation mode: {mode!r}")
+        self.mode = mode
+        self.stats = stats if stats is not None else speculation_stats
+
+    async def arun(self, state: dict, config: RunnableConfig | None = None) -> dict:
+        text = state["messages"][-1].content
+        start = time.perf_counter()
+        self.stats.turns += 1
+
+        message_type = agents.get_local_classifier().classify(text)
+        if message_type is not None:
+            self.stats.local_turns += 1
+            self.stats.routes[ROUTES[message_type]] += 1
+            reply = await _respond(ROUTES[message_type], text, BranchUsage(), config)
+            return {"message_type": message_type, "messages": [reply]}
+
+        nodes = list(ROUTES.values()) if self.mode == "both" else [self.stats.likeliest()]
+        branches = {node: _Branch(node, text) for node in nodes}
+        winner = None
+        try:
+            classify_start = time.perf_counter()
+            # Reported to the run's callbacks (usage), but kept out of its token stream.
+            classify_config = {**(config or {}), "tags": [*((config or {}).get("tags") or []), TAG_NOSTREAM]}
+            message_type = await agents.aclassify_with_llm(text, config=classify_config)
+            classify_s = time.perf_counter() - classify_start
+            winner = ROUTES.get(message_type) if message_type else None
+        finally:
+            for node, branch in branches.items():
+                if node != winner:
+                    branch.task.cancel()
+
+        for node, branch in branches.items():
+            if node == winner:
+                continue
+            await asyncio.gather(branch.task, return_exceptions=True)
+            self.stats.wasted_input_tokens += branch.usage.input_tokens
+            self.stats.wasted_output_tokens += branch.usage.output_tokens
+
+        if winner in branches:
+            usage = branches[winner].usage
+            reply = await branches[winner].promote(config or {})
+            self.stats.hits += 1
+        else:
+            usage = BranchUsage()
+            reply = await _respond(winner, text, usage, config)
+            self.stats.misses += 1
+
+        # Sequential cost would have been classification followed by the
+        # winner's full call; whatever the overlap shaved off is the saving.
+        self.stats.latency_saved_s += classify_s + usage.duration_s - (time.perf_counter() - start)
+        self.stats.routes[winner] += 1
+        return {"message_type": message_type, "messages": [reply]}
+
+    def run(self, state: dict, config: RunnableConfig | None = None) -> dict:
+        try:
+            asyncio.get_running_loop()
+        except RuntimeError:
+            return asyncio.run(self.arun(state, config))
+        # Sync invoke from inside an event loop (e.g. a notebook): the
+        # branches need a loop of their own, so give them a worker thread.
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            return pool.submit(asyncio.run, self.arun(state, config)).result()
+
+    def as_node(self) -> RunnableLambda:
+        return RunnableLambda(self.run, afunc=self.arun, name="speculative")
@@ -0,0 +1,114 @@
+"""Token streaming for the LangGraph chatbots.
+
+Instead of blocking on `graph.invoke` and printing the whole reply at the
+end, these helpers drive the graph's streaming API with
+stream_mode="messages" and forward the tokens produced inside the responder
+nodes as they arrive. Tokens from other nodes (such as the classifier's
+structured-output call) are filtered out.
+
+`stream_reply` writes to a file object (stdout by default) for the CLIs;
+`astream_tokens` is an async generator for server use. Both record
+time-to-first-token in a `StreamStats`.
+"""
+
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator, Iterable, TextIO
+
+RESPONDER_NODES = ("therapist", "logical", "speculative")
+
+
+@dataclass
+class StreamStats:
+    ttft_s: float | None = None
+    total_s: float = 0.0
+    chunks: int = 0
+    _start: float = field(default_factory=time.perf_counter, repr=False)
+
+    def record(self) -> None:
+        if self.ttft_s is None:
+            self.ttft_s = time.perf_counter() - self._start
+        self.chunks += 1
+
+    def finish(self) -> None:
+        self.total_s = time.perf_counter() - self._start
+
+    def __str__(self):
+        ttft = f"{self.ttft_s:.3f}s" if self.ttft_s is not None else "n/a"
+        return f"ttft={ttft} total={self.total_s:.3f}s chunks={self.chunks}"
+
+
+@dataclass
+class StreamResult:
+    text: str
+    state: dict[str, Any] | None
+    stats: StreamStats
+
+
+def _token_text(chunk) -> str:
+    content = chunk.content
+    if isinstance(content, str):
+        return content
+    return "".join(
+        part.get("text", "") if isinstance(part, dict) else str(part)
+        for part in content
+    )
+
+
+def _responder_token(chunk, metadata: dict, nodes: Iterable[str]) -> str:
+    if metadata.get("langgraph_node") not in nodes:
+        return ""
+    return _token_text(chunk)
+
+
+def stream_reply(
+    graph,
+    inputs: dict,
+    config: dict | None = None,
+    nodes: Iterable[str] = RESPONDER_NODES,
+    out: TextIO | None = sys.stdout,
+) -> StreamResult:
+    """Run one turn, writing responder tokens to `out` as they are produced.
+
+    Returns the full reply text, the final graph state and the timing stats.
+    """
+    stats = StreamStats()
+    parts = []
+    state = None
+    for mode, payload in graph.stream(inputs, config=config, stream_mode=["messages", "values"]):
+        if mode == "values":
+            state = payload
+            continue
+        text = _responder_token(*payload, nodes)
+        if not text:
+            continue
+        stats.record()
+        parts.append(text)
+        if out is not None:
+            out.write(text)
+            out.flush()
+    stats.finish()
+    return StreamResult(text="".join(parts), state=state, stats=stats)
+
+
+async def astream_tokens(
+    graph,
+    inputs: dict,
+    config: dict | None = None,
+    nodes: Iterable[str] = RESPONDER_NODES,
+    stats: StreamStats | None = None,
+) -> AsyncIterator[str]:
+    """Async generator over responder tokens for one turn.
+
+    Pass a `StreamStats` to get time-to-first-token once the generator is
+    exhausted.
+    """
+    stats = stats if stats is not None else StreamStats()
+    async for chunk, metadata in graph.astream(inputs, config=config, stream_mode="messages"):
+        text = _responder_token(chunk, metadata, nodes)
+        if not text:
+            continue
+        stats.record()
+        yield text
+    stats.finish()